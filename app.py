@@ -1,18 +1,117 @@
-import requests
-from concurrent.futures import ThreadPoolExecutor
+import hmac
+import queue
+import threading
+import json
 import time
-from scipy.stats import norm
-from scipy.optimize import curve_fit
-import math
-from flask import Flask, jsonify, request
+import os
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from flask_compress import Compress
 import numpy as np
-from svi_no_arbitrage import SVINoArbitrage
+from chain_store import ChainStore
+from svi_cache import SVIFitCache
+import svi_fits
+import svi_parameterizations
+import ssvi
+from svi_pipeline import SVIFitPipeline
+from stream import UpdateBroadcaster
+from http_client import AsyncHTTPClient
+from market_stream import MarketStream
+from response_cache import ResponseCache
+from shared_chain import SharedChainReader, SharedChainWriter
+from history import HistoryReader, HistoryRecorder
+from replay import ReplaySource
+import metrics
+import serialization
+from profiling import RequestProfiler, SamplingProfiler
+import black_scholes
+import implied_vol
 from apscheduler.schedulers.background import BackgroundScheduler
 import logging
+GREEKS = ('delta', 'gamma', 'vega', 'theta', 'rho')
+# Status names indexed by implied_vol status code
+IV_STATUS_NAMES = np.array([implied_vol.STATUS_NAMES[code] for code in sorted(implied_vol.STATUS_NAMES)])
+# Total variance may decrease by this much between expiries before it counts as calendar arbitrage
+CALENDAR_TOLERANCE = 1e-8
+# Surface-level parameterizations, calibrated across all expiries of an asset at once
+SURFACE_PARAMETERIZATION_TYPES = ('ssvi', 'essvi')
+# Per-endpoint request timeouts in seconds; exchangeInfo is by far the largest payload
+ENDPOINT_TIMEOUTS = {'info': 15, 'mark': 5, 'spot': 3}
+DEFAULT_TIMEOUT = 5
+# Seconds between SSE keep-alive comments on an idle stream
+STREAM_KEEPALIVE_SECONDS = 15
+# Cached GET responses may be stored but must be revalidated with their ETag on every use,
+# since the chain can move at any refresh
+RESPONSE_CACHE_CONTROL = 'public, no-cache'
+PARAMETERIZATION_TYPES = svi_fits.PARAMETERIZATION_TYPES + SURFACE_PARAMETERIZATION_TYPES
+MARKET_DATA_ROLES = ('standalone', 'poller', 'reader')
+# Seconds between reader checks of the shared segment, and how long a reader waits for the first snapshot
+SHARED_CHAIN_POLL_SECONDS = 0.25
+SHARED_CHAIN_STARTUP_TIMEOUT = 60
+# Minutes between exchangeInfo refreshes that pick up new listings and retire delisted options
+EXCHANGE_INFO_REFRESH_MINUTES = 15
+# Range of history queries without a 'from' bound
+HISTORY_DEFAULT_RANGE_MS = 24 * 60 * 60 * 1000
+# Admin token a request must send in X-Profile-Token to be profiled; profiling is off if unset
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+# Seconds between stack samples of the refresh jobs, and between stack dumps
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+PROFILE_DUMP_SECONDS = 60
+BATCH_QUERY_TYPES = ('option_chain', 'svi_curve')
+# Largest number of sub-queries one /api/batch request may carry
+BATCH_MAX_QUERIES = 200
+# Largest number of log-moneyness points and of maturities on one /api/ssvi_surface grid
+SSVI_MAX_GRID_POINTS = 500
+
+
+def greeks_block(pricing):
+    """
+    Split vectorized Greeks into one dict per option
+    :param pricing: Output of black_scholes.price_and_greeks, or any dict of the Greek arrays
+    :return: List of {'delta': ..., 'gamma': ..., 'vega': ..., 'theta': ..., 'rho': ...}
+    """
+    columns = [pricing[name].tolist() for name in GREEKS]
+    return [dict(zip(GREEKS, values)) for values in zip(*columns)]
+
+
+def parse_flag(value):
+    """
+    Interpret a query string or JSON flag as a boolean
+    """
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
 class Binance:
-    def __init__(self, proxy=None):
+    def __init__(self, proxy=None, svi_cache_size=2048, fit_workers=None, ingestion=None, role=None,
+                 shared_path=None, history_dir=None, source=None, sample_dir=None, slice_weighting=None):
+        """
+        :param proxy: Optional HTTP(S) proxy URL
+        :param svi_cache_size: Maximum number of cached SVI fits
+        :param fit_workers: Worker processes for background SVI fits after each refresh, 0 disables
+            them. Defaults to the SVI_FIT_WORKERS environment variable, or one per CPU if unset
+            (none for a poller).
+        :param ingestion: 'rest' to poll mark and spot snapshots every 5 seconds, or 'websocket' to
+            follow the exchange streams. Defaults to the MARKET_INGESTION environment variable, or 'rest'.
+        :param role: 'standalone' to ingest market data in this process, 'poller' to also publish every
+            snapshot to the shared segment, or 'reader' to follow a poller's segment without contacting
+            the exchange. Defaults to the MARKET_DATA_ROLE environment variable, or 'standalone'.
+        :param shared_path: Shared segment file. Defaults to the SHARED_CHAIN_PATH environment variable,
+            or shared_chain.default_segment_path().
+        :param history_dir: Directory chain snapshots and background SVI fits are recorded under.
+            Defaults to the HISTORY_DIR environment variable; recording is off if neither is set.
+            Readers only query it; the poller (or a standalone process) records.
+        :param source: Where exchange responses come from: an object with AsyncHTTPClient's fetch and
+            fetch_all, e.g. replay.ReplaySource. Defaults to replaying the MARKET_REPLAY_DIR fixtures
+            if that environment variable is set, or to a live AsyncHTTPClient.
+        :param sample_dir: Directory the sampling profiler writes folded stack dumps of the refresh
+            jobs to. Defaults to the PROFILE_REFRESH_DIR environment variable; sampling is off if
+            neither is set.
+        :param slice_weighting: How the points of a slice are weighted in SVI fits, 'equal' or 'vega'
+            (see svi_fits.slice_weights). Defaults to the SVI_SLICE_WEIGHTING environment variable,
+            or 'equal'.
+        """
         self.derivatives_base_endpoint = "https://eapi.binance.com"
         self.spot_base_endpoint = "https://api.binance.com"
         self.endpoints = {
@@ -25,61 +124,142 @@ class Binance:
             "spot": self.spot_base_endpoint+"/api/v3/ticker/price",
         }
 
-        self.proxies = {
-            "http": proxy,
-            "https": proxy
-        }
+        self.proxy = proxy
 
         self.market_info = {}
-        self.option_markets = {}
+        # Current immutable ChainStore snapshot. Refreshes build the next one off to the side
+        # and swap the reference under _update_lock; readers never lock, they just take
+        # self.chain once per request and work on that snapshot.
+        self.chain = None
+        self._update_lock = threading.Lock()
+        self.svi_cache = SVIFitCache(svi_cache_size)
+        self.role = role or os.getenv("MARKET_DATA_ROLE", "standalone")
+        if self.role not in MARKET_DATA_ROLES:
+            raise ValueError("Invalid market data role. Use 'standalone', 'poller' or 'reader'.")
+        shared_path = shared_path or os.getenv("SHARED_CHAIN_PATH")
+        self.slice_weighting = slice_weighting or os.getenv("SVI_SLICE_WEIGHTING", "equal")
+        if self.slice_weighting not in svi_fits.SLICE_WEIGHTINGS:
+            raise ValueError("Invalid slice weighting. Use 'equal' or 'vega'.")
+        if fit_workers is None and os.getenv("SVI_FIT_WORKERS"):
+            fit_workers = int(os.getenv("SVI_FIT_WORKERS"))
+        if fit_workers is None and self.role == 'poller':
+            # Nothing serves requests from the poller, so its fits would never be read
+            fit_workers = 0
+        self.broadcaster = UpdateBroadcaster()
+        self.fit_pipeline = None
+        if fit_workers != 0:
+            self.fit_pipeline = SVIFitPipeline(self.svi_cache, fit_workers, on_complete=self.publish_fits,
+                                               slice_weighting=self.slice_weighting)
         self.spot_prices = {}
         self.underlyings = {}
         self.expiry_dates = {}
         self.options_info = {}
         self.option_card_data = {}
-        self.cur_time = time.time() * 1000
         self.last_exchange_update = None
         self.last_options_update = None
         self.last_spot_update = None
-        self.session = requests.Session()
+        history_dir = history_dir or os.getenv("HISTORY_DIR")
+        self.history = None
+        self.history_reader = HistoryReader(history_dir) if history_dir else None
         self.scheduler = BackgroundScheduler()
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            future_exchange = executor.submit(self.get_exchange_info)
-            future_spot = executor.submit(self.get_spot_markets) 
-            future_options = executor.submit(self.get_options_info)
-            
-            # Wait for all to complete
-            exchange_result = future_exchange.result()
-            spot_result = future_spot.result()
-            options_result = future_options.result()
+        sample_dir = sample_dir or os.getenv("PROFILE_REFRESH_DIR")
+        self.sampler = None
+        if sample_dir:
+            self.sampler = SamplingProfiler(sample_dir, PROFILE_SAMPLE_INTERVAL, PROFILE_DUMP_SECONDS)
+        self.market_stream = None
+        self.shared_writer = None
+        self.shared_reader = None
+        if self.role == 'reader':
+            self.http = None
+            self.ingestion = None
+            self.shared_reader = SharedChainReader(shared_path)
+            self.wait_for_shared_chain(SHARED_CHAIN_STARTUP_TIMEOUT)
+            self.start_fit_pipeline()
+            self.scheduler.add_job(self.sampled(self.sync_shared_chain), "interval",
+                                   seconds=SHARED_CHAIN_POLL_SECONDS)
+            self.scheduler.start()
+            return
+        if source is None and os.getenv("MARKET_REPLAY_DIR"):
+            source = ReplaySource.from_directory(os.getenv("MARKET_REPLAY_DIR"))
+        self.http = source or AsyncHTTPClient(proxy)
+        self.ingestion = ingestion or os.getenv("MARKET_INGESTION", "rest")
+        if self.ingestion not in ('rest', 'websocket'):
+            raise ValueError("Invalid ingestion mode. Use 'rest' or 'websocket'.")
+        if self.role == 'poller':
+            self.shared_writer = SharedChainWriter(shared_path)
+        if history_dir:
+            self.history = HistoryRecorder(history_dir)
+        # exchangeInfo and marks concurrently; spot needs the underlyings from exchangeInfo
+        exchange_info, options_info = self.http.fetch_all([self.request_args('info'), self.request_args('mark')])
+        self.set_exchange_info(exchange_info)
+        self.set_options_info(options_info)
+        self.get_spot_markets()
         self.parse_options()
         self.parse_iv_info()
-        self.scheduler.add_job(self.refresh_spot_options,"interval", seconds=5)
+        self.publish_updates()
+        if self.ingestion == 'websocket':
+            self.market_stream = MarketStream(self)
+            self.market_stream.start()
+        else:
+            self.scheduler.add_job(self.sampled(self.refresh_spot_options), "interval", seconds=5)
+        self.scheduler.add_job(self.sampled(self.refresh_exchange_info), "interval",
+                               minutes=EXCHANGE_INFO_REFRESH_MINUTES)
         self.scheduler.start()
     
+    def sampled(self, job):
+        """
+        Wrap a scheduler job so the sampling profiler, if enabled, records its stacks
+        """
+        if self.sampler is None:
+            return job
+        return self.sampler.wrap(job)
+
+    def request_args(self, endpoint, params=None):
+        """
+        Build the (url, params, timeout) tuple for an endpoint request
+        :param endpoint: Key of self.endpoints
+        :param params: Optional query parameters
+        """
+        return self.endpoints[endpoint], params, ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
+    def spot_request_args(self):
+        """
+        Spot ticker request scoped to the underlyings of the listed options. The unscoped
+        ticker returns every spot symbol on the exchange.
+        """
+        symbols = sorted({symbol['underlying'] for symbol in self.market_info.get('optionSymbols', [])})
+        if not symbols:
+            return self.request_args('spot')
+        return self.request_args('spot', {'symbols': json.dumps(symbols, separators=(',', ':'))})
+
     def get_spot_markets(self):
         """
         Get spot markets
         :return: Spot markets
         """
-        response = self.session.get(self.endpoints['spot'], proxies=self.proxies)
-        data = response.json()
+        return self.set_spot_markets(self.http.fetch(*self.spot_request_args()))
+
+    def set_spot_markets(self, data):
+        spot_prices = {}
         for item in data:
             symbol = item['symbol']
             price = float(item['price'])
-            self.spot_prices[symbol] = price
+            spot_prices[symbol] = price
+        with self._update_lock:
+            self.spot_prices = {**self.spot_prices, **spot_prices}
         self.last_spot_update = int(round(time.time() * 1000))
         return self.spot_prices
 
     def get_options_info(self):
         """
-        Get mark price for a symbol
-        :param symbol: Symbol to get mark price for
-        :return: Mark price
+        Get mark prices for every option
+        :return: Mark entries
         """
-        response = self.session.get(self.endpoints['mark'], proxies=self.proxies)
+        return self.set_options_info(self.http.fetch(*self.request_args('mark')))
+
+    def set_options_info(self, data):
         self.last_options_update = int(round(time.time() * 1000))
-        self.options_info = response.json()
+        self.options_info = data
         return self.options_info
 
     def parse_options(self):
@@ -88,36 +268,10 @@ class Binance:
         :return: Option symbols
         """
         info = self.market_info
-
-        for symbol in info['optionSymbols']:
-            expiry_timestamp, underlying, strike_price = symbol['expiryDate'], symbol['underlying'], symbol['strikePrice']
-            asset, expiry, strike, side = symbol['symbol'].split('-')
-            time_diff_ms = expiry_timestamp - self.cur_time
-            days_to_expiry = time_diff_ms / (1000 * 60 * 60 * 24)
-            self.underlyings[asset] = underlying
-            if asset not in self.option_markets:
-                self.option_markets[asset] = {}
-            if expiry not in self.option_markets[asset]:
-                self.option_markets[asset][expiry] = {'C': [], 'P': []}
-            self.option_markets[asset][expiry][side].append({
-                "symbol": symbol['symbol'],
-                "side": side,
-                "strikePrice": float(strike_price),
-                "expiry": expiry_timestamp,
-                "time_to_expiry_ms": expiry_timestamp - self.cur_time,
-                "days_to_expiry": (expiry_timestamp - self.cur_time) / (1000 * 60 * 60 * 24),
-                "time_to_expiry": days_to_expiry/365.25,
-                "underlying": underlying,
-            })
-            if asset not in self.expiry_dates:
-                self.expiry_dates[asset] = set()
-            self.expiry_dates[asset].add((expiry, expiry_timestamp))
-        for asset in self.option_markets:
-            for expiry in self.option_markets[asset]:
-                self.option_markets[asset][expiry]['C'] = sorted(self.option_markets[asset][expiry]['C'], key=lambda x: x['strikePrice'])
-                self.option_markets[asset][expiry]['P'] = sorted(self.option_markets[asset][expiry]['P'], key=lambda x: x['strikePrice'])
-            self.expiry_dates[asset] = sorted(self.expiry_dates[asset], key=lambda x: x[1])
-        return self.underlyings, self.option_markets
+        self.chain = ChainStore(info['optionSymbols'], time.time() * 1000)
+        self.underlyings = self.chain.underlyings
+        self.expiry_dates = self.chain.expiry_dates
+        return self.underlyings, self.chain
 
     def get_exchange_info(self):
         """
@@ -125,9 +279,12 @@ class Binance:
         :return: Market info
         """
         if len(self.market_info) == 0:
-            response = self.session.get(self.endpoints['info'], proxies=self.proxies)
+            return self.set_exchange_info(self.http.fetch(*self.request_args('info')))
+        self.last_exchange_update = self.market_info["serverTime"]
+        return self.market_info
 
-            self.market_info = response.json()
+    def set_exchange_info(self, data):
+        self.market_info = data
         self.last_exchange_update = self.market_info["serverTime"]
         return self.market_info
     
@@ -137,74 +294,32 @@ class Binance:
         :param endpoint: Endpoint to get
         :return: Endpoint
         """
-        response = self.session.get(self.endpoints[endpoint], params=params, proxies=self.proxies)
-        return response.json()
+        return self.http.fetch(*self.request_args(endpoint, params))
     
     def parse_iv_info(self):
-        mark_info = self.options_info
-        for data in mark_info:
-            symbol = data['symbol']
-            mark_price = float(data['markPrice'])
-            mark_iv = float(data['markIV'])
-            risk_free_rate = float(data['riskFreeInterest'])
-            asset, expiry, strike, side = symbol.split('-')
-            idx = self.find_mark_index(asset, expiry, float(strike), side)
-            if idx is not None:
-                option = self.option_markets[asset][expiry][side][idx]
-                underlying = option['underlying']
-                strike_price = option['strikePrice']
-                spot_price = self.spot_prices[underlying]
-                spot_price, strike_price = map(float, (spot_price, strike_price))
-                time_to_expiry = float(option['time_to_expiry'])
-                implied_volatility = float(mark_iv)
-                total_implied_variance = float(implied_volatility)**2 * time_to_expiry
-                forward_price = spot_price * math.exp(risk_free_rate * time_to_expiry)
-                mark_data = {
-                    'mark_price': mark_price,
-                    'mark_iv': mark_iv,
-                    'risk_free_rate': risk_free_rate,
-                    'log_moneyness': math.log(forward_price/strike_price),
-                    'moneyness': forward_price/strike_price,
-                    'total_implied_variance': total_implied_variance,
-                    'forward_price': forward_price,
-                }
-                self.option_markets[asset][expiry][side][idx].update(mark_data)
-                self.option_markets[asset][expiry]['timeToExpiry'] = time_to_expiry 
-                self.option_markets[asset][expiry]['forwardPrice'] = forward_price 
-                self.option_markets[asset][expiry]['riskFreeRate'] = risk_free_rate 
-                
-    
+        """
+        Join the latest mark prices and spot prices into a new chain snapshot and publish it
+        """
+        with metrics.REFRESH_STAGE_SECONDS.labels('parse').time(), self._update_lock:
+            self.chain = self.chain.with_marks(self.options_info, self.spot_prices)
 
-    def find_mark_index(self, asset, expiry, strike, side):
+    def apply_mark_updates(self, symbols, mark_price, mark_iv, spot_prices=None):
         """
-        Find mark index
-        :param asset: Asset to find mark index for
-        :param expiry: Expiry to find mark index for
-        :param strike: Strike to find mark index for
-        :param side: Side to find mark index for
-        :return: Mark index
+        Publish a new chain snapshot with incremental mark (and spot) updates
+        :param symbols: Option symbols of the batch
+        :param mark_price: Mark prices, aligned with symbols
+        :param mark_iv: Mark implied volatilities, aligned with symbols
+        :param spot_prices: Optional mapping of updated underlying spot prices
+        :return: True if the chain changed; a batch repeating the current marks leaves the
+            snapshot (and the caches keyed on its version) as it is
         """
-        if asset not in self.option_markets:
-            return None
-        if expiry not in self.option_markets[asset]:
-            return None
-        if side not in self.option_markets[asset][expiry]:
-            return None
-        options_list = self.option_markets[asset][expiry][side]
-        if not options_list:
-            return None
-        l,r = 0, len(self.option_markets[asset][expiry][side]) - 1
-        target = strike
-        while l <= r:
-            mid = (l + r) // 2
-            mid_strike = options_list[mid]['strikePrice']
-            if mid_strike == target:
-                return mid
-            elif mid_strike < target:
-                l = mid + 1
-            else:
-                r = mid - 1
-        return None
+        with metrics.REFRESH_STAGE_SECONDS.labels('parse').time(), self._update_lock:
+            if spot_prices:
+                self.spot_prices = {**self.spot_prices, **spot_prices}
+            chain = self.chain
+            self.chain = chain.with_mark_updates(symbols, mark_price, mark_iv, self.spot_prices)
+            return self.chain is not chain
+
     def filter_options(self, asset=None, expiry=None, side=None):
         """
         Filter options
@@ -213,16 +328,14 @@ class Binance:
         :param side: Side to filter options for
         :return: Filtered options
         """
-        if asset not in self.option_markets:
-            return self.option_markets
+        slices = self.chain.slices
+        if asset not in slices:
+            return slices
         if expiry is None:
-            return self.option_markets[asset]
+            return slices[asset]
         if side is None:
-            return self.option_markets[asset][expiry]
-        return self.option_markets[asset][expiry][side]
-    
-
-
+            return slices[asset][expiry]
+        return slices[asset][expiry][side]
 
     def calculate_option_price(self, S, K, T, r, sigma, option_type='C'):
         """
@@ -236,267 +349,600 @@ class Binance:
         :return: Option price as float
         """
         S, K, T, r, sigma = map(float, (S, K, T, r, sigma))
-        sqrtT = math.sqrt(T)
-        d1 = (math.log(S/K) + (r + 0.5 * sigma**2) * T) / (sigma * sqrtT)
-        d2 = d1 - sigma * sqrtT
-
-        if option_type == 'C':
-            return S * norm.cdf(d1) - K * math.exp(-r * T) * norm.cdf(d2)
-        elif option_type == 'P':
-            return K * math.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
-        else:
-            raise ValueError("Invalid option type. Use 'C' for call and 'P' for put.")
-        
-        return price
+        return float(black_scholes.price(S, K, T, r, sigma, option_type))
             
-    def get_option_chain(self, asset, expiry, side):
+    def get_option_chain(self, asset, expiry, side, greeks=False, chain=None, columnar=False):
         """
         Display option chain
         :param asset: Asset to display option chain for
         :param expiry: Expiry to display option chain for
         :param side: Side to display option chain for
+        :param greeks: Include a Greeks block for each option
+        :param chain: Chain snapshot to read, defaults to the current one
+        :param columnar: Give each side as a dict of columns (option_chain_columns) instead of a list of rows
         :return: Option chain
         """
-        if asset not in self.option_markets:
-            return None
-        if expiry not in self.option_markets[asset]:
-            return None
-        if side not in self.option_markets[asset][expiry] and side != 'A':
+        if chain is None:
+            chain = self.chain
+        if chain.locate(asset, expiry, side) is None:
             return None
+        option_chain = self.option_chain_columns if columnar else self.option_chain
         res = {}
         if side == 'A':
-            call_options = self.option_chain(asset, expiry, 'C')
-            put_options = self.option_chain(asset, expiry, 'P')
+            call_options = option_chain(asset, expiry, 'C', greeks, chain)
+            put_options = option_chain(asset, expiry, 'P', greeks, chain)
             res = {'C': call_options, 'P': put_options}
         else:
-            chain = self.option_chain(asset, expiry, side)
-            res = {side: chain}
+            options = option_chain(asset, expiry, side, greeks, chain)
+            res = {side: options}
         res['lastOptionUpdate'] = self.last_options_update
         res['lastExchangeUpdate'] = self.last_exchange_update
         res['asset'] = asset
         res['expiry'] = expiry
-        res['timeToExpiry'] = self.option_markets[asset][expiry]['timeToExpiry']
-        res['forwardPrice'] = self.option_markets[asset][expiry]['forwardPrice']
-        res['riskFreeRate'] = self.option_markets[asset][expiry]['riskFreeRate']
-        res['spotPrice'] = self.spot_prices[self.underlyings[asset]]
+        res['timeToExpiry'], res['forwardPrice'], res['riskFreeRate'] = chain.expiry_info(asset, expiry)
+        res['spotPrice'] = chain.spot_prices[self.underlyings[asset]]
+        res['version'] = chain.version
         return res
     
-    def option_chain(self, asset, expiry, side):
+    def option_chain_columns(self, asset, expiry, side, greeks=False, chain=None):
+        """
+        Option chain of one side as columns
+        :param greeks: Include a 'greeks' group of delta, gamma, vega, theta and rho columns
+        :param chain: Chain snapshot to read, defaults to the current one
+        :return: dict of field name to NumPy array, keyed like the rows of option_chain
+        """
+        if chain is None:
+            chain = self.chain
+        rows = chain.locate(asset, expiry, side)
+        strike_price = chain.strike_price[rows]
+        spot_price = np.full(strike_price.shape, float(chain.spot_prices[self.underlyings[asset]]))
+        time_to_expiry = chain.time_to_expiry[rows]
+        risk_free_rate = chain.risk_free_rate[rows]
+        mark_iv = chain.mark_iv[rows]
+        pricing = black_scholes.price_and_greeks(spot_price, strike_price, time_to_expiry, risk_free_rate, mark_iv, side)
+        columns = {
+            'symbol': chain.symbols[rows],
+            'strikePrice': strike_price,
+            'markPrice': chain.mark_price[rows],
+            'impliedVolatility': mark_iv,
+            'riskFreeRate': risk_free_rate,
+            'timeToExpiry': time_to_expiry,
+            'daysToExpiry': chain.days_to_expiry[rows],
+            'moneyness': chain.moneyness[rows],
+            'logMoneyness': chain.log_moneyness[rows],
+            'spotPrice': spot_price,
+            'bsmPrice': pricing['price'],
+            'forwardPrice': chain.forward_price[rows],
+            'solvedImpliedVolatility': chain.solved_iv[rows],
+            'ivStatus': IV_STATUS_NAMES[chain.iv_status[rows]],
+        }
+        if greeks:
+            columns['greeks'] = {name: pricing[name] for name in GREEKS}
+        return columns
+
+    def option_chain(self, asset, expiry, side, greeks=False, chain=None):
         """
         Display option chain
         :param asset: Asset to display option chain for
         :param expiry: Expiry to display option chain for
         :param side: Side to display option chain for
+        :param greeks: Include a Greeks block for each option
+        :param chain: Chain snapshot to read, defaults to the current one
         :return: Option chain
         """
-        options_list = self.option_markets[asset][expiry][side]
-        res = []
-        for option in options_list:
-            symbol = option['symbol']
-            mark_price = option['mark_price']
-            mark_iv = option['mark_iv']
-            risk_free_rate = option['risk_free_rate']
-            strike_price = option['strikePrice']
-            time_to_expiry = option['time_to_expiry']
-            days_to_expiry = option['days_to_expiry']
-            moneyness = option['moneyness']
-            log_moneyness = option['log_moneyness']
-            side = option['side']
-            spot_price = float(self.spot_prices[option['underlying']])
-            bsm_price = self.calculate_option_price(spot_price, strike_price, time_to_expiry, risk_free_rate, mark_iv, side)
-            forward_price = option['forward_price']
-            append_data = {
-                'symbol': symbol,
-                'strikePrice': strike_price,
-                'markPrice': mark_price,
-                'impliedVolatility': mark_iv,
-                'riskFreeRate': risk_free_rate,
-                'timeToExpiry': time_to_expiry,
-                'daysToExpiry': days_to_expiry,
-                'moneyness': moneyness,
-                'logMoneyness': log_moneyness,
-                'spotPrice': spot_price,
-                'bsmPrice': bsm_price,
-                'forwardPrice': forward_price,
-            }
-            res.append(append_data)
+        columns = self.option_chain_columns(asset, expiry, side, greeks, chain)
+        greeks_columns = columns.pop('greeks', None)
+        solved_iv = columns['solvedImpliedVolatility']
+        columns['solvedImpliedVolatility'] = np.where(np.isnan(solved_iv), None, solved_iv)
+        keys = list(columns)
+        res = [dict(zip(keys, values)) for values in zip(*(column.tolist() for column in columns.values()))]
+        if greeks_columns is not None:
+            for option, option_greeks in zip(res, greeks_block(greeks_columns)):
+                option['greeks'] = option_greeks
         return res
     
-    def moneyness_array(self, asset, expiry, side):
-        if asset not in self.option_markets:
-            return None
-        if expiry not in self.option_markets[asset]:
-            return None
-        if side not in 'CPA':
+    def moneyness_array(self, asset, expiry, side, chain=None):
+        """
+        Log-moneyness and total variance points of a slice, as SVI fits see them: side 'A'
+        has one out-of-the-money option per strike (see ChainStore.otm_rows)
+        :return: (k, w) arrays, or None if the slice does not exist
+        """
+        if side not in ('C', 'P', 'A'):
             return None
-        if side == 'A':
-            call_options = self.option_markets[asset][expiry]['C']
-            put_options = self.option_markets[asset][expiry]['P']
-            options_list = call_options + put_options
-        else:
-            options_list = self.option_markets[asset][expiry][side]
-        k = np.array([float(option['log_moneyness']) for option in options_list])
-        total_implied_variances = np.array([float(option['total_implied_variance']) for option in options_list])
-        return k, total_implied_variances
+        if chain is None:
+            chain = self.chain
+        return chain.svi_slice(asset, expiry, side)
+
+    def fit_inputs(self, asset, expiry, side, chain=None):
+        """
+        Points of a slice and their fit weights under the configured slice weighting
+        :return: (k, w, weights) with weights None for equal weights
+        """
+        k, total_implied_variances = self.moneyness_array(asset, expiry, side, chain)
+        return k, total_implied_variances, svi_fits.slice_weights(self.slice_weighting, k, total_implied_variances)
     
     def raw_svi(self, k, a, b, rho, m, sigma):
         """
         k = log moneyness
         returns: total implied variance (implied vol**2)*time to expiry
         """
-        return a + b * (rho * (k - m) + np.sqrt((k - m)**2 + sigma**2))
+        return svi_fits.raw_svi(k, a, b, rho, m, sigma)
     
     def natural_svi(self, k, delta, mu, rho, omega, zeta):
-        return delta + (omega/2) * (1 + (zeta*rho*(k - mu)) + np.sqrt((zeta*(k-mu) + rho) ** 2 + (1 - rho**2)))
+        return svi_fits.natural_svi(k, delta, mu, rho, omega, zeta)
     
 
 
-    def raw_svi_parameterization(self, asset, expiry, side):
+    def raw_svi_parameterization(self, asset, expiry, side, initial_guess=None):
         """
         Using svi_model function, we try to find the best-fit parameters a, b, rho, m, sigma that minimizes the difference between the model's calculated total implied variance and the actual total implied variance from the option chain.
         each option in the option chain comes pre-calculated with its own total implied variance.
+        :param initial_guess: Optional starting parameters, e.g. the previous fit of this slice
         """
-        k, total_implied_variances = self.moneyness_array(asset, expiry, side)
-        
-        fitter = SVINoArbitrage()
-        params = fitter.constrained_svi_fit(k, total_implied_variances)
-
-        is_valid, message = self.validate_no_arbitrage(asset, expiry, side, params)
-        if not is_valid:
-            return None
-    
-        return params
-    
-    def natural_svi_parameterization(self, asset, expiry, side):
-        k, total_implied_variances = self.moneyness_array(asset, expiry, side)
-        # Initial guess for the parameters delta, mu, rho, omega, zeta
-        # initial_guess = [total_implied_variances.mean(), k.mean(), 0.0, 0.5, 0.1]
-        # Bounds for the parameters delta, mu, rho, omega, zeta
-        # delta: all real numbers, mu: all real numbers, rho: [-1, 1], omega >= 0, zeta > 0
-        bounds = ([-np.inf, -np.inf, -0.999, 0, 0.001], 
-                  [np.inf, np.inf, 0.999, np.inf, np.inf])
-        
-        initial_guesses = [
-        [total_implied_variances.mean(), k.mean(), 0.0, 0.5, 0.1],
-        [np.median(total_implied_variances), 0.0, 0.0, 0.3, 0.1],
-        [total_implied_variances[len(total_implied_variances)//2], k.mean(), -0.3, 0.8, 0.2],
-        ]
+        k, total_implied_variances, weights = self.fit_inputs(asset, expiry, side)
+        return svi_fits.fit_raw(k, total_implied_variances, initial_guess, weights=weights)
     
-        for guess in initial_guesses:
-            try:
-                params, _ = curve_fit(self.natural_svi, k, total_implied_variances, p0=guess, bounds=bounds, maxfev=10000)
-                predicted = self.natural_svi(k, *params)
-                if np.all(predicted > 0): 
-                    return params
-            except:
-                continue
-        
-        return None 
+    def quasi_explicit_svi_parameterization(self, asset, expiry, side, initial_guess=None):
+        """
+        Raw SVI parameters a, b, rho, m, sigma fitted with the quasi-explicit method: the linear
+        part (a, b, rho) is solved in closed form and only (m, sigma) are searched.
+        :param initial_guess: Optional raw SVI starting parameters, e.g. the previous fit of this slice
+        """
+        k, total_implied_variances, weights = self.fit_inputs(asset, expiry, side)
+        return svi_fits.fit_quasi_explicit(k, total_implied_variances, initial_guess, weights)
+
+    def natural_svi_parameterization(self, asset, expiry, side, initial_guess=None):
+        k, total_implied_variances, weights = self.fit_inputs(asset, expiry, side)
+        return svi_fits.fit_natural(k, total_implied_variances, initial_guess, weights)
     
     def validate_no_arbitrage(self, asset, expiry, side, params):
         """
         Validate that SVI parameters satisfy no-arbitrage conditions.
         """
-        a, b, rho, m, sigma = params
-        
-        # Check basic constraints
-        if b < 0:
-            return False, "b must be non-negative"
-        if abs(rho) >= 1:
-            return False, "|rho| must be < 1"
-        if sigma <= 0:
-            return False, "sigma must be positive"
-        
-        # Check b(1 + |rho|) <= 4
-        if b * (1 + abs(rho)) > 4:
-            return False, "b(1 + |rho|) > 4 violates no-arbitrage"
-        
-        # Check minimum variance
-        w_min = a + b * sigma * np.sqrt(1 - rho**2)
-        if w_min < 0:
-            return False, "Minimum total variance is negative"
-        
-        # Check butterfly arbitrage at sample points
         k_data, _ = self.moneyness_array(asset, expiry, side)
-        k_test = np.linspace(np.min(k_data) - 1, np.max(k_data) + 1, 50)
-        
-        for k in k_test:
-            w = a + b * (rho * (k - m) + np.sqrt((k - m)**2 + sigma**2))
-            if w < 0:
-                return False, f"Negative total variance at k={k}"
+        return svi_fits.validate_no_arbitrage(params, k_data)
         
-        return True, "No arbitrage violations detected"
-        
-    def svi_jw_parameterization(self, asset, expiry, side):
-        a, b, rho, m, sigma = self.raw_svi_parameterization(asset, expiry, side)
-        # Convert raw SVI parameters to JW parameters
-        t = self.option_markets[asset][expiry]['C'][0]['time_to_expiry'] if side == 'C' else self.option_markets[asset][expiry]['P'][0]['time_to_expiry']
-        svi_params = self.raw_to_svi_jw(a, b, rho, m, sigma, t)
-        return svi_params['vt'], svi_params['psit'], svi_params['pt'], svi_params['ct'], svi_params['vt_min']
+    def svi_jw_parameterization(self, asset, expiry, side, initial_guess=None):
+        """
+        SVI-JW parameters v (ATM variance), psi (ATM skew), p and c (put and call wing slopes)
+        and v_tilde (minimum variance), per year.
+        :param initial_guess: Optional previous SVI-JW fit of this slice, refined in SVI-JW space
+        """
+        chain = self.chain
+        k, total_implied_variances, weights = self.fit_inputs(asset, expiry, side, chain)
+        time_to_expiry, _, _ = chain.expiry_info(asset, expiry)
+        return svi_fits.fit_jw(k, total_implied_variances, time_to_expiry, initial_guess, weights)
     
-    def get_svi_curve_points(self, asset, expiry, side, parameterization_type='raw'):
+    def svi_params(self, asset, expiry, side, parameterization_type='raw', chain=None):
+        """
+        Get fitted SVI parameters for a slice, reusing the cached fit while the chain
+        data version is unchanged and warm-starting from the previous fit otherwise.
+        For 'ssvi' and 'essvi' these are the raw SVI parameters of the calibrated
+        surface at the slice's maturity.
+        :param parameterization_type: 'raw', 'quasi_explicit', 'natural', 'jw', 'ssvi' or 'essvi'
+        :param chain: Chain snapshot to fit, defaults to the current one
+        :return: Fitted parameters, or None if the fit failed
+        """
+        if chain is None:
+            chain = self.chain
+        if parameterization_type in SURFACE_PARAMETERIZATION_TYPES:
+            surface = self.ssvi_surface(asset, side, parameterization_type == 'essvi', chain)
+            if surface is None:
+                return None
+            time_to_expiry, _, _ = chain.expiry_info(asset, expiry)
+            return surface.raw_params(time_to_expiry)
+        version = chain.version
+        hit, params = self.svi_cache.get(asset, expiry, side, parameterization_type, version)
+        if hit:
+            return params
+        initial_guess = self.svi_cache.warm_start(asset, expiry, side, parameterization_type)
+        k, total_implied_variances, weights = self.fit_inputs(asset, expiry, side, chain)
+        time_to_expiry, _, _ = chain.expiry_info(asset, expiry)
+        params, report = svi_fits.fit_slice_report(
+            parameterization_type, k, total_implied_variances, initial_guess, time_to_expiry, weights)
+        metrics.record_fit(asset, expiry, parameterization_type, report)
+        self.svi_cache.put(asset, expiry, side, parameterization_type, version, params)
+        return params
+
+    def svi_params_batch(self, keys, chain=None):
+        """
+        Fitted SVI parameters of many slices, each fitted at most once. Cached fits are
+        reused, each slice's (k, w) arrays are taken once for all its parameterizations, and
+        the remaining fits run in parallel on the fit pipeline's worker pool (one after the
+        other if background fitting is disabled).
+        :param keys: (asset, expiry, side, parameterization_type) tuples of existing slices
+        :param chain: Chain snapshot to fit, defaults to the current one
+        :return: dict of key to params, None where the fit failed
+        """
+        if chain is None:
+            chain = self.chain
+        version = chain.version
+        results = {}
+        slices = {}
+        jobs = {}
+        for key in dict.fromkeys(keys):
+            asset, expiry, side, parameterization_type = key
+            if parameterization_type not in svi_fits.PARAMETERIZATION_TYPES:
+                # Surfaces are calibrated once per asset and side, and cached like slices
+                results[key] = self.svi_params(asset, expiry, side, parameterization_type, chain)
+                continue
+            hit, params = self.svi_cache.get(asset, expiry, side, parameterization_type, version)
+            if hit:
+                results[key] = params
+                continue
+            if (asset, expiry, side) not in slices:
+                slices[(asset, expiry, side)] = self.fit_inputs(asset, expiry, side, chain)
+            k, total_implied_variances, weights = slices[(asset, expiry, side)]
+            time_to_expiry, _, _ = chain.expiry_info(asset, expiry)
+            jobs[key] = (parameterization_type, k, total_implied_variances, self.svi_cache.warm_start(*key),
+                         time_to_expiry, weights)
+        if self.fit_pipeline is not None and len(jobs) > 1:
+            fitted = self.fit_pipeline.fit(jobs)
+        else:
+            fitted = {key: svi_fits.fit_slice_report(*job) for key, job in jobs.items()}
+        for (asset, expiry, side, parameterization_type), (params, report) in fitted.items():
+            metrics.record_fit(asset, expiry, parameterization_type, report)
+        fitted = {key: params for key, (params, _) in fitted.items()}
+        self.svi_cache.put_many(version, fitted)
+        results.update(fitted)
+        return results
+
+    def batch(self, queries, columnar=False, chain=None):
+        """
+        Answer many option_chain and svi_curve queries against one snapshot. Identical
+        queries are answered once and every slice is fitted at most once (see svi_params_batch).
+        :param queries: List of dicts with a 'type' of 'option_chain' or 'svi_curve', 'asset',
+            'expiry', 'side' (default 'A'), 'greeks' and, for curves, 'parameterization_type'
+        :param columnar: Give chains and curve points as dicts of columns
+        :param chain: Chain snapshot to read, defaults to the current one
+        :return: One {'status': 200, 'data': ...} or {'status': <code>, 'error': ...} per query
+        """
+        if chain is None:
+            chain = self.chain
+        parsed = []
+        for query in queries:
+            if not isinstance(query, dict):
+                parsed.append({'status': 400, 'error': 'Each query must be an object'})
+                continue
+            kind = query.get('type')
+            asset, expiry, side = query.get('asset'), query.get('expiry'), query.get('side', 'A')
+            parameterization_type = query.get('parameterization_type', 'raw') if kind == 'svi_curve' else None
+            if kind not in BATCH_QUERY_TYPES:
+                parsed.append({'status': 400, 'error': f"Unknown query type {kind!r}. Use 'option_chain' or 'svi_curve'."})
+            elif not all(isinstance(value, str) for value in (asset, expiry, side)):
+                parsed.append({'status': 400, 'error': "'asset', 'expiry' and 'side' must be strings"})
+            elif chain.locate(asset, expiry, side) is None:
+                parsed.append({'status': 404, 'error': f'Unknown slice {asset}-{expiry}-{side}'})
+            elif kind == 'svi_curve' and parameterization_type not in PARAMETERIZATION_TYPES:
+                parsed.append({'status': 400, 'error': "Invalid parameterization type. Use 'raw', 'quasi_explicit', 'natural', 'jw', 'ssvi' or 'essvi'."})
+            else:
+                parsed.append((kind, asset, expiry, side, parameterization_type, parse_flag(query.get('greeks', False))))
+
+        fit_keys = [key[1:5] for key in parsed if isinstance(key, tuple) and key[0] == 'svi_curve']
+        try:
+            fitted = self.svi_params_batch(fit_keys, chain)
+        except Exception as e:
+            app.logger.error(f"Batch SVI fits failed: {e}")
+            fitted = {}
+        answers = {}
+        results = []
+        for key in parsed:
+            if isinstance(key, dict):
+                results.append(key)
+                continue
+            if key not in answers:
+                answers[key] = self.batch_answer(key, fitted, columnar, chain)
+            results.append(answers[key])
+        return results
+
+    def batch_answer(self, key, fitted, columnar, chain):
+        """
+        Answer one validated batch query
+        :param key: (type, asset, expiry, side, parameterization_type, greeks)
+        :param fitted: Output of svi_params_batch
+        """
+        kind, asset, expiry, side, parameterization_type, greeks = key
+        try:
+            if kind == 'option_chain':
+                return {'status': 200, 'data': self.get_option_chain(asset, expiry, side, greeks, chain, columnar)}
+            params = fitted.get((asset, expiry, side, parameterization_type))
+            if params is None:
+                return {'status': 400, 'error': 'SVI parameterization failed - insufficient or invalid data'}
+            curve = self.svi_curve_columns if columnar else self.svi_curve
+            points = curve(asset, expiry, side, parameterization_type, params, greeks, chain)
+            return {'status': 200, 'data': {'points': points, 'params': params.tolist(),
+                                            'parameterization_type': parameterization_type}}
+        except Exception as e:
+            app.logger.error(f"Batch query {'-'.join(map(str, key))} failed: {e}")
+            return {'status': 500, 'error': 'Failed to answer query'}
+
+    def ssvi_surface(self, asset, side='A', extended=False, chain=None):
+        """
+        Calibrate an SSVI (or eSSVI) surface to every expiry of an asset, cached per data
+        version and warm-started from the previous calibration.
+        :param extended: Calibrate eSSVI instead of SSVI
+        :param chain: Chain snapshot to calibrate to, defaults to the current one
+        :return: ssvi.SSVISurface, or None if the calibration failed
+        """
+        if chain is None:
+            chain = self.chain
+        parameterization_type = 'essvi' if extended else 'ssvi'
+        version = chain.version
+        hit, surface = self.svi_cache.get(asset, None, side, parameterization_type, version)
+        if hit:
+            return surface
+        previous = self.svi_cache.warm_start(asset, None, side, parameterization_type)
+        k_slices, w_slices, expiry_times = [], [], []
+        for expiry, _ in chain.expiry_dates.get(asset, []):
+            rows = chain.locate(asset, expiry, side)
+            if rows is None or rows.stop <= rows.start:
+                continue
+            k, total_implied_variances = chain.svi_slice(asset, expiry, side)
+            if len(k) == 0:
+                continue
+            k_slices.append(k)
+            w_slices.append(total_implied_variances)
+            expiry_times.append(chain.time_to_expiry[rows.start])
+        surface = ssvi.fit_ssvi(k_slices, w_slices, expiry_times, extended,
+                                previous.params if previous is not None else None)
+        self.svi_cache.put(asset, None, side, parameterization_type, version, surface)
+        return surface
+
+    def get_ssvi_surface(self, asset, side='A', extended=False, n_k=50, n_t=50, t_min=None, t_max=None):
+        """
+        Calibrated SSVI/eSSVI parameters plus implied volatilities on a dense (T, k) grid
+        :param n_k: Number of log-moneyness points, spanning the quoted range
+        :param n_t: Number of maturities
+        :param t_min: Shortest maturity in years, defaults to the first listed expiry
+        :param t_max: Longest maturity in years, defaults to the last listed expiry
+        :return: Surface dict, or None if the calibration failed
+        """
+        chain = self.chain
+        surface = self.ssvi_surface(asset, side, extended, chain)
+        if surface is None:
+            return None
+        # Span the points the surface was fitted to; empty slices contribute none
+        slices = [chain.svi_slice(asset, expiry, side) for expiry, _ in chain.expiry_dates.get(asset, [])]
+        k_all = np.concatenate([np.empty(0)] + [k for k, _ in filter(None, slices)])
+        k_all = k_all[np.isfinite(k_all)]
+        if k_all.size == 0:
+            return None
+        k_grid = np.linspace(k_all.min(), k_all.max(), n_k)
+        t_grid = np.linspace(surface.expiry_times[0] if t_min is None else t_min,
+                             surface.expiry_times[-1] if t_max is None else t_max, n_t)
+        implied_vols = surface.implied_volatility(k_grid[None, :], t_grid[:, None])
+        res = surface.to_dict()
+        res['version'] = chain.version
+        res['asset'] = asset
+        res['side'] = side
+        res['logMoneyness'] = k_grid.tolist()
+        res['timeToExpiry'] = t_grid.tolist()
+        res['impliedVolatility'] = implied_vols.tolist()
+        return res
+
+    def sequential_svi_params(self, asset, expiry, side, previous_params=None, k_bound=None, chain=None):
+        """
+        Raw SVI fit of a slice constrained to lie on or above the previous expiry's
+        total variance, so consecutive slices cannot cross.
+        Cached per data version and bound.
+        :param previous_params: Raw SVI parameters of the previous expiry, or None for the first slice
+        :param k_bound: Log-moneyness points where the bound is enforced, defaults to the slice's range
+        :param chain: Chain snapshot to fit, defaults to the current one
+        :return: Fitted parameters, or None if the fit failed
+        """
+        if chain is None:
+            chain = self.chain
+        # The fit depends on the bound as well as the data, so both key the cached entry.
+        # Warm starts are still shared across bounds.
+        bound_key = None
+        if previous_params is not None:
+            bound_key = (np.asarray(previous_params, dtype=np.float64).tobytes(),
+                         None if k_bound is None else np.asarray(k_bound, dtype=np.float64).tobytes())
+        version = (chain.version, bound_key)
+        hit, params = self.svi_cache.get(asset, expiry, side, 'raw_sequential', version)
+        if hit:
+            return params
+        initial_guess = self.svi_cache.warm_start(asset, expiry, side, 'raw_sequential')
+        k, total_implied_variances, weights = self.fit_inputs(asset, expiry, side, chain)
+        lower_bound = None
+        if previous_params is not None:
+            if k_bound is None:
+                k_bound = np.linspace(k.min() - 0.5, k.max() + 0.5, 50)
+            lower_bound = (k_bound, self.raw_svi(k_bound, *previous_params))
+        params, report = svi_fits.fit_raw_report(k, total_implied_variances, initial_guess, lower_bound, weights)
+        metrics.record_fit(asset, expiry, 'raw_sequential', report)
+        self.svi_cache.put(asset, expiry, side, 'raw_sequential', version, params)
+        return params
+
+    def get_svi_curve_points(self, asset, expiry, side, parameterization_type='raw', greeks=False, chain=None,
+                             columnar=False):
         """
         Get SVI curve points for a given asset, expiry, and side.
         :param asset: Asset to get SVI curve points for
         :param expiry: Expiry to get SVI curve points for
         :param side: Side to get SVI curve points for
+        :param greeks: Include call and put Greeks for each point
+        :param chain: Chain snapshot to fit, defaults to the current one
+        :param columnar: Give the points as a dict of columns (svi_curve_columns) instead of a list
         :return: SVI curve points
         """
-        if parameterization_type not in ['raw', 'natural']:
-            raise ValueError("Invalid parameterization type. Use 'raw' or 'natural'.")
-        if parameterization_type == 'natural':
-            params = self.natural_svi_parameterization(asset, expiry, side)
-            if params is None:
+        if parameterization_type not in PARAMETERIZATION_TYPES:
+            raise ValueError("Invalid parameterization type. Use 'raw', 'quasi_explicit', 'natural', 'jw', 'ssvi' or 'essvi'.")
+        if chain is None:
+            chain = self.chain
+        params = self.svi_params(asset, expiry, side, parameterization_type, chain)
+        if params is None:
+            if parameterization_type == 'natural':
                 app.logger.error(f"Natural SVI parameterization failed for {asset}-{expiry}-{side}")
-                return None
-            delta, mu, rho, omega, zeta = params
-        elif parameterization_type == 'raw':
-            params = self.raw_svi_parameterization(asset, expiry, side)
-            if params is None:
-                app.logger.error(f"Raw SVI parameterization failed for {asset}-{expiry}-{side}")
-                return None
-            a, b, rho, m, sigma = params
-        
-        k = []
-        if side == 'A':
-            call_options = self.option_markets[asset][expiry]['C']
-            put_options = self.option_markets[asset][expiry]['P']
-            options_list = call_options + put_options
-            k = [float(option['log_moneyness']) for option in call_options + put_options]
-        else:
-            options_list = self.option_markets[asset][expiry][side]
-            k = [float(option['log_moneyness']) for option in options_list]
+            elif parameterization_type == 'jw':
+                app.logger.error(f"SVI-JW parameterization failed for {asset}-{expiry}-{side}")
+            else:
+                app.logger.error(f"Raw SVI parameterization ({parameterization_type}) failed for {asset}-{expiry}-{side}")
+            return None
+        curve = self.svi_curve_columns if columnar else self.svi_curve
+        return (curve(asset, expiry, side, parameterization_type, params, greeks, chain), params.tolist())
 
-        x_points = np.linspace(min(k)-0.1, max(k)+0.1, 100)  # Adjust range as needed
+    def svi_curve_columns(self, asset, expiry, side, parameterization_type, params, greeks=False, chain=None):
+        """
+        Evaluate fitted SVI parameters over the slice's log-moneyness range
+        :param params: Fitted parameters of the given parameterization type
+        :param greeks: Include 'callGreeks' and 'putGreeks' groups of Greek columns
+        :param chain: Chain snapshot the parameters were fitted to, defaults to the current one
+        :return: dict of field name to NumPy array, keyed like the points of svi_curve
+        """
+        if chain is None:
+            chain = self.chain
+        k, _ = chain.svi_slice(asset, expiry, side)
+
+        x_points = np.linspace(k.min()-0.1, k.max()+0.1, 100)  # Adjust range as needed
+        time_to_expiry, forward_price, risk_free_rate = chain.expiry_info(asset, expiry)
         if parameterization_type == 'natural':
-            svi_values = self.natural_svi(x_points, delta, mu, rho, omega, zeta)
-        elif parameterization_type == 'raw':
-            svi_values = self.raw_svi(x_points, a, b, rho, m, sigma)
-        points = []
-        time_to_expiry = self.option_markets[asset][expiry]['C'][0]['time_to_expiry'] if side == 'C' else self.option_markets[asset][expiry]['P'][0]['time_to_expiry']
-        forward_price = self.option_markets[asset][expiry]['C'][0]['forward_price'] if side == 'C' else self.option_markets[asset][expiry]['P'][0]['forward_price']
+            svi_values = self.natural_svi(x_points, *params)
+        elif parameterization_type == 'jw':
+            svi_values = self.raw_svi(x_points, *svi_parameterizations.jw_to_raw(params, time_to_expiry))
+        else:
+            svi_values = self.raw_svi(x_points, *params)
         implied_vols = np.sqrt(svi_values / time_to_expiry)  # Convert total implied variance to implied volatility
-        spot_price = float(self.spot_prices[self.underlyings[asset]])
-        risk_free_rate = self.option_markets[asset][expiry]['C'][0]['risk_free_rate'] if side == 'C' else self.option_markets[asset][expiry]['P'][0]['risk_free_rate']
-        for k_val, iv in zip(x_points, implied_vols):
-            moneyness = math.exp(k_val)
-            strike = forward_price / moneyness
-            call_premium = self.calculate_option_price(K=strike, T=time_to_expiry, r=risk_free_rate, option_type='C', S=spot_price, sigma=iv)
-            put_premium = self.calculate_option_price(K=strike, T=time_to_expiry, r=risk_free_rate, option_type='P', S=spot_price, sigma=iv)
-            points.append({
-                'logMoneyness': float(k_val),
-                'strikePrice': float(strike),
-                'moneyness': float(moneyness),
-                'impliedVolatility': float(iv),
-                'callPremium': call_premium,
-                'putPremium': put_premium
-            })
-        return (points, params.tolist())
+        spot_price = float(chain.spot_prices[self.underlyings[asset]])
+        moneyness = np.exp(x_points)
+        strikes = forward_price / moneyness
+        calls = black_scholes.price_and_greeks(spot_price, strikes, time_to_expiry, risk_free_rate, implied_vols, 'C')
+        puts = black_scholes.price_and_greeks(spot_price, strikes, time_to_expiry, risk_free_rate, implied_vols, 'P')
+        columns = {
+            'logMoneyness': x_points,
+            'strikePrice': strikes,
+            'moneyness': moneyness,
+            'impliedVolatility': implied_vols,
+            'callPremium': calls['price'],
+            'putPremium': puts['price'],
+        }
+        if greeks:
+            columns['callGreeks'] = {name: calls[name] for name in GREEKS}
+            columns['putGreeks'] = {name: puts[name] for name in GREEKS}
+        return columns
+
+    def svi_curve(self, asset, expiry, side, parameterization_type, params, greeks=False, chain=None):
+        """
+        Evaluate fitted SVI parameters over the slice's log-moneyness range
+        :param params: Fitted parameters of the given parameterization type
+        :param greeks: Include call and put Greeks for each point
+        :param chain: Chain snapshot the parameters were fitted to, defaults to the current one
+        :return: List of curve points
+        """
+        columns = self.svi_curve_columns(asset, expiry, side, parameterization_type, params, greeks, chain)
+        call_greeks = columns.pop('callGreeks', None)
+        put_greeks = columns.pop('putGreeks', None)
+        keys = list(columns)
+        points = [dict(zip(keys, values)) for values in zip(*(column.tolist() for column in columns.values()))]
+        if greeks:
+            for point, call, put in zip(points, greeks_block(call_greeks), greeks_block(put_greeks)):
+                point['callGreeks'] = call
+                point['putGreeks'] = put
+        return points
+
+    def get_svi_surface(self, asset, side='A', parameterization_type='raw', sequential=False, greeks=False,
+                        n_grid_points=100):
+        """
+        Fit every expiry of an asset and check the resulting surface for calendar arbitrage.
+        All fitted slices are evaluated on one shared log-moneyness grid and compared in a
+        single array operation.
+        :param asset: Asset to fit
+        :param side: Side of every slice
+        :param parameterization_type: 'raw', 'quasi_explicit', 'natural', 'jw', 'ssvi' or 'essvi'
+        :param sequential: Fit raw slices in expiry order, each bounded below by the previous one
+        :param greeks: Include call and put Greeks for each point
+        :param n_grid_points: Size of the shared grid used for the calendar check
+        :return: Surface dict, or None if the asset has no slices on this side
+        """
+        if parameterization_type not in PARAMETERIZATION_TYPES:
+            raise ValueError("Invalid parameterization type. Use 'raw', 'quasi_explicit', 'natural', 'jw', 'ssvi' or 'essvi'.")
+        if sequential and parameterization_type != 'raw':
+            raise ValueError("Sequential fits are only supported for the 'raw' parameterization.")
+        # Expiries come from the same snapshot as the slices, so a listing change in between
+        # cannot drop an expiry or mix two listings
+        chain = self.chain
+        if asset not in chain.expiry_dates:
+            return None
+        expiries = []
+        k_all = []
+        for expiry, _ in chain.expiry_dates[asset]:
+            points = chain.svi_slice(asset, expiry, side)
+            if points is not None and len(points[0]):
+                expiries.append(expiry)
+                k_all.append(points[0])
+        if not expiries:
+            return None
+        # Shared grid over every slice's range: the calendar check and the sequential bounds use it
+        k_grid = np.linspace(min(k.min() for k in k_all), max(k.max() for k in k_all), n_grid_points)
+
+        slices = []
+        fitted = []
+        previous_params = None
+        for expiry in expiries:
+            if sequential:
+                params = self.sequential_svi_params(asset, expiry, side, previous_params, k_grid, chain)
+            else:
+                params = self.svi_params(asset, expiry, side, parameterization_type, chain)
+            time_to_expiry, _, _ = chain.expiry_info(asset, expiry)
+            entry = {'expiry': expiry, 'timeToExpiry': time_to_expiry, 'params': None, 'points': None}
+            slices.append(entry)
+            if params is None:
+                app.logger.error(f"SVI parameterization ({parameterization_type}) failed for {asset}-{expiry}-{side}")
+                continue
+            previous_params = params
+            entry['params'] = params.tolist()
+            entry['points'] = self.svi_curve(asset, expiry, side, parameterization_type, params, greeks, chain)
+            fitted.append((expiry, params, time_to_expiry))
+
+        violations = []
+        if len(fitted) > 1:
+            # SSVI slices are returned as raw SVI parameters
+            w, decreasing = svi_fits.calendar_arbitrage(
+                parameterization_type, [params for _, params, _ in fitted], k_grid, CALENDAR_TOLERANCE,
+                [time_to_expiry for _, _, time_to_expiry in fitted])
+            for i in np.flatnonzero(decreasing.any(axis=1)):
+                violations.append({
+                    'expiry1': fitted[i][0],
+                    'expiry2': fitted[i + 1][0],
+                    'logMoneyness': k_grid[decreasing[i]].tolist(),
+                    'maxDecrease': float(np.max(w[i] - w[i + 1])),
+                })
+        return {
+            'asset': asset,
+            'side': side,
+            'parameterization_type': parameterization_type,
+            'sequential': sequential,
+            'version': chain.version,
+            'slices': slices,
+            'calendarArbitrageFree': len(violations) == 0,
+            'calendarViolations': violations,
+        }
     
-    def refresh_exchange_info(self, minutes=60):
-        now = int(round(time.time() * 1000))
-        if(now - self.last_exchange_update) > (minutes * 60 * 1000): 
-            self.get_exchange_info()
+    def refresh_exchange_info(self):
+        """
+        Refetch exchangeInfo and apply listing changes to the chain: slices of newly listed
+        options are added and delisted (e.g. expired) ones retired, while every other option
+        keeps its row and marks. Nothing is rebuilt if the listing did not change.
+        :return: (number of options added, number retired)
+        """
+        with metrics.REFRESH_STAGE_SECONDS.labels('exchange_info_fetch').time():
+            self.set_exchange_info(self.http.fetch(*self.request_args('info')))
+        added, retired = self.chain.listing_diff(self.market_info['optionSymbols'])
+        if not added and not retired:
+            return 0, 0
+        with metrics.REFRESH_STAGE_SECONDS.labels('listing').time(), self._update_lock:
+            self.chain = self.chain.with_listing(added, retired)
+            self.underlyings = self.chain.underlyings
+            self.expiry_dates = self.chain.expiry_dates
+        app.logger.info(f"Listing changed: {len(added)} options added, {len(retired)} retired")
+        if self.market_stream is not None:
+            # Stream names are per expiry and underlying
+            self.market_stream.resubscribe()
+        # New rows have no marks yet: the next mark refresh (or stream resync) fills and
+        # publishes them, so fits never run on a listing that has not been marked
+        if not added:
+            self.publish_updates()
+        return len(added), len(retired)
 
     def refresh_options_info(self, seconds=5):
         now = int(round(time.time() * 1000))
@@ -509,21 +955,238 @@ class Binance:
             self.get_spot_markets()
 
     def refresh_spot_options(self):
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future_spot = executor.submit(self.get_spot_markets) 
-            future_options = executor.submit(self.get_options_info)
-            
-            # Wait for all to complete
-            spot_result = future_spot.result()
-            options_result = future_options.result()
+        if self.shared_reader is not None:
+            # Readers never contact the exchange; pick up the poller's latest snapshot instead
+            self.sync_shared_chain()
+            return
+        with metrics.REFRESH_STAGE_SECONDS.labels('fetch').time():
+            spot_markets, options_info = self.http.fetch_all([self.spot_request_args(), self.request_args('mark')])
+        self.set_spot_markets(spot_markets)
+        self.set_options_info(options_info)
         self.parse_iv_info()
+        self.publish_updates()
+
+    def publish_updates(self):
+        """
+        Push a chain update to stream subscribers, record it and refit in the background
+        """
+        with metrics.REFRESH_STAGE_SECONDS.labels('publish').time():
+            self.publish_shared()
+            chain = self.chain
+            self.broadcaster.publish_chain(chain)
+            if self.history is not None:
+                self.history.record_chain(chain)
+            self.start_fit_pipeline(chain)
+
+    def publish_fits(self, version, results):
+        """
+        Push a batch of background SVI fits to stream subscribers and record it
+        :param results: Mapping of (asset, expiry, side, parameterization_type) to params
+        """
+        self.broadcaster.publish_svi(version, results)
+        if self.history is not None:
+            self.history.record_svi(version, results)
+
+    def publish_shared(self):
+        """
+        Write the current snapshot to the shared segment, if this process is the poller
+        """
+        if self.shared_writer is None:
+            return
+        with self._update_lock:
+            chain = self.chain
+            meta = {
+                'as_of': chain.as_of,
+                'spot_prices': self.spot_prices,
+                'last_options_update': self.last_options_update,
+                'last_spot_update': self.last_spot_update,
+                'last_exchange_update': self.last_exchange_update,
+            }
+        self.shared_writer.publish(chain, meta)
+
+    def sync_shared_chain(self):
+        """
+        Adopt the poller's latest snapshot, if it is newer than the current one, and push it
+        to this worker's stream subscribers and fit pipeline
+        :return: True if a new snapshot was adopted
+        """
+        loaded = self.shared_reader.load(self.chain)
+        if loaded is None:
+            return False
+        chain, meta = loaded
+        with self._update_lock:
+            self.chain = chain
+            self.spot_prices = dict(meta['spot_prices'])
+            self.underlyings = chain.underlyings
+            self.expiry_dates = chain.expiry_dates
+            self.last_options_update = meta['last_options_update']
+            self.last_spot_update = meta['last_spot_update']
+            self.last_exchange_update = meta['last_exchange_update']
+        self.broadcaster.publish_chain(chain)
+        self.start_fit_pipeline(chain)
+        return True
+
+    def wait_for_shared_chain(self, timeout):
+        """
+        Block until the poller has published a first snapshot
+        :raises TimeoutError: If none appeared within timeout seconds
+        """
+        deadline = time.time() + timeout
+        while not self.sync_shared_chain():
+            if time.time() > deadline:
+                raise TimeoutError(f"No market data published to {self.shared_reader.path} within {timeout} s")
+            time.sleep(SHARED_CHAIN_POLL_SECONDS)
+
+    def start_fit_pipeline(self, chain=None):
+        """
+        Fit every slice in the background for a chain snapshot, by default the current one
+        """
+        if self.fit_pipeline is not None:
+            self.fit_pipeline.submit(chain if chain is not None else self.chain)
     
 
 
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+def observe_request(response):
+    """
+    Record request latency, response size and the age of the snapshot served. Registered
+    before Flask-Compress, so it runs after it and sees the body as sent.
+    """
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    # The route pattern, not the path, keeps label values bounded
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.HTTP_REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(
+        time.perf_counter() - started)
+    if not response.is_streamed:
+        metrics.HTTP_RESPONSE_BYTES.labels(endpoint).observe(response.calculate_content_length() or 0)
+    if endpoint.startswith('/api/'):
+        metrics.SNAPSHOT_AGE_SECONDS.observe(time.time() - BinanceAPI.chain.as_of / 1000)
+    return response
+
+
+def start_request_profile():
+    """
+    Run the request under cProfile if it asks for it with ?profile=1 (or an X-Profile: 1
+    header) and carries the PROFILE_TOKEN admin token in X-Profile-Token. The call report
+    is returned in place of the response; with profile=save the response is served as
+    usual and the profile is written to PROFILE_DIR, named in the X-Profile-File header.
+    """
+    mode = request.args.get('profile') or request.headers.get('X-Profile')
+    if not mode or mode == '0':
+        return None
+    if not PROFILE_TOKEN or not hmac.compare_digest(request.headers.get('X-Profile-Token', ''), PROFILE_TOKEN):
+        return jsonify({'error': 'Profiling requires the admin token'}), 403
+    if not request_profiler.start():
+        return jsonify({'error': 'Another request is being profiled'}), 409
+    g.profile_mode = mode
+    return None
+
+
+def finish_request_profile(response):
+    """
+    Registered after Flask-Compress, so it runs before it and a report gets compressed like any body
+    """
+    mode = g.pop('profile_mode', None)
+    if mode is None:
+        return response
+    stats = request_profiler.stop()
+    if mode == 'save':
+        response.headers['X-Profile-File'] = request_profiler.save(stats, request.endpoint or 'request')
+        return response
+    return Response(request_profiler.report(stats), mimetype='text/plain')
+
+
+def abandon_request_profile(exc):
+    # The request failed before its after_request hooks ran
+    if g.pop('profile_mode', None) is not None:
+        request_profiler.stop()
+
+
 app = Flask(__name__)
+app.json = serialization.JSONProvider(app)
+app.before_request(start_request_timer)
+app.after_request(observe_request)
 Compress(app)
 CORS(app)
+app.before_request(start_request_profile)
+app.after_request(finish_request_profile)
+app.teardown_request(abandon_request_profile)
+request_profiler = RequestProfiler(os.getenv("PROFILE_DIR"))
 BinanceAPI = Binance()
+response_cache = ResponseCache()
+metrics.Gauge('chain_version', 'Version of the current chain snapshot', lambda: BinanceAPI.chain.version)
+metrics.Gauge('chain_snapshot_age_seconds', 'Seconds since the current chain snapshot was computed',
+              lambda: time.time() - BinanceAPI.chain.as_of / 1000)
+metrics.Gauge('response_cache_entries', 'Serialized responses held in the response cache',
+              lambda: len(response_cache))
+metrics.Gauge('history_dropped_records', 'History records dropped because the writer fell behind',
+              lambda: BinanceAPI.history.dropped if BinanceAPI.history is not None else None)
+
+
+def _conditional_headers(response, etag):
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = RESPONSE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Accept')
+    return response
+
+
+def _cached_body_response(entry):
+    """
+    Serve a cached body, pre-compressed if the client accepts gzip. Flask-Compress leaves
+    responses that already carry a Content-Encoding alone.
+    """
+    response = Response(entry.body, mimetype=entry.mimetype)
+    if request.accept_encodings['gzip'] and len(entry.body) >= app.config['COMPRESS_MIN_SIZE']:
+        response.set_data(entry.gzipped(app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return _conditional_headers(response, entry.etag)
+
+
+def cached_response(key):
+    """
+    Answer a request from the response cache without rebuilding its payload
+    :param key: Tuple of endpoint name, request parameters and chain version
+    :return: 304 if the client's copy is current, the cached body, or None on a miss
+    """
+    if 'profile_mode' in g:
+        # Profiled requests rebuild their payload, or the profile would only show a cache hit
+        return None
+    etag = response_cache.etag(key)
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains_weak(etag):
+        return _conditional_headers(Response(status=304), etag)
+    entry = response_cache.get(key)
+    if entry is None:
+        return None
+    return _cached_body_response(entry)
+
+
+def cache_response(key, payload, response_format='json', tables=(), table_column=None):
+    """
+    Serialize a payload once for its key and serve it
+    :param response_format: 'json', 'msgpack' or 'arrow', see response_format()
+    :param tables: For Arrow, the payload keys holding column dicts
+    :param table_column: For Arrow, the column naming which of them each row came from
+    """
+    with metrics.RESPONSE_ENCODE_SECONDS.labels(key[0]).time():
+        body, mimetype = serialization.encode(payload, response_format, tables, table_column)
+    entry = response_cache.put(key, body, mimetype)
+    return _cached_body_response(entry)
+
+
+def response_format(args):
+    """
+    Negotiate the body format and layout of a chain or curve response
+    :return: (format, columnar): format is 'json', 'msgpack' or 'arrow' per the Accept header;
+        columnar is set by the columnar flag, and always for Arrow
+    """
+    fmt = serialization.negotiate(request.accept_mimetypes)
+    return fmt, fmt == 'arrow' or parse_flag(args.get('columnar', False))
 
 
 
@@ -534,25 +1197,39 @@ def get_option_chain():
         asset = data.get('asset')
         expiry = data.get('expiry')
         side = data.get('side')
+        greeks = parse_flag(data.get('greeks', False))
     else:
         asset = request.args.get('asset')
         expiry = request.args.get('expiry')
         side = request.args.get('side')
-    chain = BinanceAPI.get_option_chain(asset, expiry, side)
-    return jsonify(chain)
+        greeks = parse_flag(request.args.get('greeks', False))
+    fmt, columnar = response_format(data if request.method == 'POST' else request.args)
+    snapshot = BinanceAPI.chain
+    key = ('option_chain', asset, expiry, side, greeks, fmt, columnar, snapshot.version)
+    response = cached_response(key)
+    if response is not None:
+        return response
+    chain = BinanceAPI.get_option_chain(asset, expiry, side, greeks, snapshot, columnar)
+    if chain is None:
+        return cache_response(key, chain)
+    return cache_response(key, chain, fmt, ('C', 'P'), 'side')
 
 @app.route('/api/assets', methods=['GET'])
 def get_available_assets():
-    assets = list(BinanceAPI.option_markets.keys())
+    chain = BinanceAPI.chain
+    assets = list(chain.slices.keys())
     spot_prices = {}
     for asset in assets:
-        spot_prices[asset] = BinanceAPI.spot_prices[BinanceAPI.underlyings[asset]]
+        spot_prices[asset] = chain.spot_prices[BinanceAPI.underlyings[asset]]
     return jsonify({'assets': assets, 'spot_prices': spot_prices})
 
 @app.route('/api/expiries', methods=['GET'])
 def get_available_expiries():
-
-        return jsonify(BinanceAPI.expiry_dates)
+        key = ('expiries', BinanceAPI.chain.version)
+        response = cached_response(key)
+        if response is not None:
+            return response
+        return cache_response(key, BinanceAPI.expiry_dates)
    
 
 @app.route('/api/strikes', methods=['GET', 'POST'])
@@ -566,13 +1243,18 @@ def get_available_strikes():
         asset = request.args.get('asset')
         expiry = request.args.get('expiry')
         side = request.args.get('side')
+    chain = BinanceAPI.chain
+    key = ('strikes', asset, expiry, side, chain.version)
+    response = cached_response(key)
+    if response is not None:
+        return response
     if side == 'A':
-        call_strikes = [option['strikePrice'] for option in BinanceAPI.option_markets[asset][expiry]['C']]
-        put_strikes = [option['strikePrice'] for option in BinanceAPI.option_markets[asset][expiry]['P']]
+        call_strikes = chain.column('strike_price', asset, expiry, 'C').tolist()
+        put_strikes = chain.column('strike_price', asset, expiry, 'P').tolist()
         strikes = {'call': call_strikes, 'put': put_strikes}
     else:
-        strikes = [option['strikePrice'] for option in BinanceAPI.option_markets[asset][expiry][side]]
-    return jsonify({'strikes': strikes})
+        strikes = chain.column('strike_price', asset, expiry, side).tolist()
+    return cache_response(key, {'strikes': strikes})
 
 
 @app.route('/api/svi_curve', methods=['GET', 'POST'])
@@ -583,13 +1265,21 @@ def get_svi_curve():
         expiry = data.get('expiry')
         side = data.get('side')
         parameterization_type = data.get('parameterization_type', 'raw')
+        greeks = parse_flag(data.get('greeks', False))
     else:
         asset = request.args.get('asset')
         expiry = request.args.get('expiry')
         side = request.args.get('side')
         parameterization_type = request.args.get('parameterization_type', 'raw')
+        greeks = parse_flag(request.args.get('greeks', False))
+    fmt, columnar = response_format(data if request.method == 'POST' else request.args)
+    chain = BinanceAPI.chain
+    key = ('svi_curve', asset, expiry, side, parameterization_type, greeks, fmt, columnar, chain.version)
+    response = cached_response(key)
+    if response is not None:
+        return response
     try:
-        result = BinanceAPI.get_svi_curve_points(asset, expiry, side, parameterization_type)
+        result = BinanceAPI.get_svi_curve_points(asset, expiry, side, parameterization_type, greeks, chain, columnar)
         if result is None:
             app.logger.error(f"SVI curve calculation returned None for {asset}-{expiry}-{side}-{parameterization_type}")
             return jsonify({'error': 'SVI parameterization failed - insufficient or invalid data'}), 400
@@ -604,7 +1294,165 @@ def get_svi_curve():
         app.logger.error(f"Error calculating SVI curve. No points returned: {e}")
         return jsonify({'error': 'Failed to calculate SVI curve'}), 500
     app.logger.info(f"{parameterization_type} paramterization params: {params}")
-    return jsonify({'points': points, 'params': params, 'parameterization_type': parameterization_type})
+    return cache_response(key, {'points': points, 'params': params, 'parameterization_type': parameterization_type},
+                          fmt, ('points',))
+
+@app.route('/api/svi_surface', methods=['GET', 'POST'])
+def get_svi_surface():
+    if request.method == 'POST':
+        data = request.get_json()
+        asset = data.get('asset')
+        side = data.get('side', 'A')
+        parameterization_type = data.get('parameterization_type', 'raw')
+        sequential = parse_flag(data.get('sequential', False))
+        greeks = parse_flag(data.get('greeks', False))
+    else:
+        asset = request.args.get('asset')
+        side = request.args.get('side', 'A')
+        parameterization_type = request.args.get('parameterization_type', 'raw')
+        sequential = parse_flag(request.args.get('sequential', False))
+        greeks = parse_flag(request.args.get('greeks', False))
+    try:
+        surface = BinanceAPI.get_svi_surface(asset, side, parameterization_type, sequential, greeks)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error calculating SVI surface: {e}")
+        return jsonify({'error': 'Failed to calculate SVI surface'}), 500
+    if surface is None:
+        return jsonify({'error': f'Unknown asset {asset}'}), 404
+    return jsonify(surface)
+
+@app.route('/api/batch', methods=['POST'])
+def batch_queries():
+    """
+    Many option_chain and svi_curve queries in one round trip, all answered from the same
+    snapshot. Each result carries its own status, so one bad slice does not fail the batch.
+    """
+    args = request.get_json(silent=True)
+    queries = args.get('queries') if isinstance(args, dict) else None
+    if not isinstance(queries, list):
+        return jsonify({'error': "Send a JSON object with a 'queries' list"}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({'error': f'At most {BATCH_MAX_QUERIES} queries per batch'}), 400
+    fmt = serialization.negotiate(request.accept_mimetypes, ('json', 'msgpack'))
+    chain = BinanceAPI.chain
+    results = BinanceAPI.batch(queries, parse_flag(args.get('columnar', False)), chain)
+    body, mimetype = serialization.encode({'version': chain.version, 'results': results}, fmt)
+    return Response(body, mimetype=mimetype)
+
+@app.route('/api/ssvi_surface', methods=['GET', 'POST'])
+def get_ssvi_surface():
+    if request.method == 'POST':
+        args = request.get_json()
+    else:
+        args = request.args
+    asset = args.get('asset')
+    side = args.get('side', 'A')
+    extended = parse_flag(args.get('extended', False))
+    try:
+        n_k = int(args.get('n_k', 50))
+        n_t = int(args.get('n_t', 50))
+        t_min = float(args['t_min']) if args.get('t_min') is not None else None
+        t_max = float(args['t_max']) if args.get('t_max') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'n_k, n_t, t_min and t_max must be numbers'}), 400
+    if not (1 <= n_k <= SSVI_MAX_GRID_POINTS and 1 <= n_t <= SSVI_MAX_GRID_POINTS):
+        return jsonify({'error': f'n_k and n_t must be between 1 and {SSVI_MAX_GRID_POINTS}'}), 400
+    if asset not in BinanceAPI.chain.expiry_dates:
+        return jsonify({'error': f'Unknown asset {asset}'}), 404
+    try:
+        surface = BinanceAPI.get_ssvi_surface(asset, side, extended, n_k, n_t, t_min, t_max)
+    except Exception as e:
+        app.logger.error(f"Error calibrating SSVI surface: {e}")
+        return jsonify({'error': 'Failed to calibrate SSVI surface'}), 500
+    if surface is None:
+        return jsonify({'error': 'SSVI calibration failed - insufficient or invalid data'}), 400
+    return jsonify(surface)
+
+@app.route('/api/stream', methods=['GET'])
+def stream_updates():
+    """
+    Server-Sent Events stream for one slice: a snapshot on connect, then only the
+    fields that changed after each refresh and newly fitted SVI parameters.
+    """
+    asset = request.args.get('asset')
+    expiry = request.args.get('expiry')
+    side = request.args.get('side', 'A')
+    if BinanceAPI.chain.locate(asset, expiry, side) is None:
+        return jsonify({'error': f'Unknown slice {asset}-{expiry}-{side}'}), 404
+    broadcaster = BinanceAPI.broadcaster
+    subscription = broadcaster.subscribe(asset, expiry, side)
+
+    def events():
+        try:
+            yield broadcaster.snapshot(BinanceAPI.chain, subscription.key)
+            while True:
+                try:
+                    message = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    message = broadcaster.snapshot(BinanceAPI.chain, subscription.key)
+                if message is not None:
+                    yield message
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def history_range(args):
+    """
+    Parse the from/to query range in milliseconds, defaulting to the last 24 hours
+    :raises ValueError: If either bound is not an integer
+    """
+    end = int(args['to']) if args.get('to') is not None else int(time.time() * 1000)
+    start = int(args['from']) if args.get('from') is not None else end - HISTORY_DEFAULT_RANGE_MS
+    return start, end
+
+@app.route('/api/history/svi_params', methods=['GET', 'POST'])
+def get_svi_params_history():
+    if request.method == 'POST':
+        args = request.get_json()
+    else:
+        args = request.args
+    if BinanceAPI.history_reader is None:
+        return jsonify({'error': 'History recording is disabled, set HISTORY_DIR'}), 404
+    asset = args.get('asset')
+    expiry = args.get('expiry')
+    side = args.get('side', 'A')
+    parameterization_type = args.get('parameterization_type', 'raw')
+    try:
+        start, end = history_range(args)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'from and to must be timestamps in milliseconds'}), 400
+    history = BinanceAPI.history_reader.svi_params(asset, expiry, side, parameterization_type, start, end)
+    return jsonify({'asset': asset, 'expiry': expiry, 'side': side,
+                    'parameterization_type': parameterization_type, **history})
+
+@app.route('/api/history/option', methods=['GET', 'POST'])
+def get_option_history():
+    if request.method == 'POST':
+        args = request.get_json()
+    else:
+        args = request.args
+    if BinanceAPI.history_reader is None:
+        return jsonify({'error': 'History recording is disabled, set HISTORY_DIR'}), 404
+    symbol = args.get('symbol')
+    try:
+        start, end = history_range(args)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'from and to must be timestamps in milliseconds'}), 400
+    return jsonify({'symbol': symbol, **BinanceAPI.history_reader.option_marks(symbol, start, end)})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus scrape endpoint. Every worker process keeps its own metrics.
+    """
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/api/refresh/spot_options', methods=["GET"])
 def refresh_spot_options():
@@ -0,0 +1,156 @@
+"""
+Offline micro-benchmarks of the hot paths on synthetic chains of several sizes.
+
+    python benchmark.py                      # run and print timings
+    python benchmark.py --save               # store the timings as the baseline
+    python benchmark.py --compare            # exit 1 if anything got slower than the baseline
+
+Market data is served by replay.ReplaySource from replay.synthetic_fixtures, so no
+network access is needed. Sizes are strikes per expiry; each chain lists two assets
+with four expiries, calls and puts.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from replay import ReplaySource, synthetic_fixtures
+
+DEFAULT_SIZES = (25, 250, 1000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+def load_app():
+    """
+    Import app offline. Its module-level Binance instance is built at import time,
+    so it is pointed at a small replayed chain first.
+    """
+    directory = tempfile.mkdtemp(prefix='vol-surface-replay-')
+    for name, document in synthetic_fixtures(10).items():
+        with open(os.path.join(directory, f"{name}.json"), 'w') as f:
+            json.dump(document, f)
+    os.environ['MARKET_REPLAY_DIR'] = directory
+    os.environ['MARKET_DATA_ROLE'] = 'standalone'
+    os.environ['MARKET_INGESTION'] = 'rest'
+    os.environ['SVI_FIT_WORKERS'] = '0'
+    os.environ.pop('HISTORY_DIR', None)
+    import app
+    app.BinanceAPI.scheduler.shutdown(wait=False)
+    return app
+
+
+def measure(fn, min_time=0.2, max_runs=100, min_runs=3):
+    """
+    Call fn repeatedly for at least min_time seconds
+    :return: (median, min) seconds per call
+    """
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_runs and (len(timings) < min_runs or time.perf_counter() - started < min_time):
+        t = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t)
+    return statistics.median(timings), min(timings)
+
+
+def benchmarks(app, client):
+    """
+    Benchmarked calls against one Binance instance, in the order they must run
+    :return: List of (name, fn)
+    """
+    from svi_no_arbitrage import SVINoArbitrage
+    asset = 'BTC'
+    expiry = client.chain.expiry_dates[asset][len(client.chain.expiry_dates[asset]) // 2][0]
+
+    def get_svi_curve_points():
+        # Cold fit every time, as after each refresh
+        client.svi_cache.clear()
+        client.get_svi_curve_points(asset, expiry, 'C', 'raw')
+
+    no_arbitrage = SVINoArbitrage()
+    return [
+        ('parse_options', client.parse_options),
+        ('parse_iv_info', client.parse_iv_info),
+        ('option_chain', lambda: client.option_chain(asset, expiry, 'C')),
+        ('option_chain_greeks', lambda: client.option_chain(asset, expiry, 'C', greeks=True)),
+        ('moneyness_array', lambda: client.moneyness_array(asset, expiry, 'C')),
+        ('constrained_svi_fit', lambda: no_arbitrage.constrained_svi_fit(*client.moneyness_array(asset, expiry, 'C'))),
+        ('natural_svi_parameterization', lambda: client.natural_svi_parameterization(asset, expiry, 'C')),
+        ('get_svi_curve_points', get_svi_curve_points),
+    ]
+
+
+def run(sizes, only=None, min_time=0.2):
+    """
+    :return: Mapping of 'name[size]' to {'median': seconds, 'min': seconds}
+    """
+    app = load_app()
+    results = {}
+    for size in sizes:
+        source = ReplaySource.from_documents(synthetic_fixtures(size))
+        client = app.Binance(source=source, fit_workers=0)
+        client.scheduler.shutdown(wait=False)
+        for name, fn in benchmarks(app, client):
+            if only and name not in only:
+                continue
+            median, fastest = measure(fn, min_time)
+            results[f"{name}[{size}]"] = {'median': median, 'min': fastest}
+            print(f"{name:<30} {size:>6} {client.chain.size:>8} rows  median {median * 1000:10.3f} ms  "
+                  f"min {fastest * 1000:10.3f} ms", flush=True)
+        # parse_options drops the marks; leave the instance consistent for the next size
+        client.parse_iv_info()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print every benchmark against the baseline
+    :return: Names of the benchmarks slower than the baseline by more than tolerance
+    """
+    regressions = []
+    for key, timing in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        ratio = timing['median'] / reference['median']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"{key:<40} {ratio:6.2f}x baseline{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='Strikes per expiry')
+    parser.add_argument('--only', nargs='+', help='Benchmark names to run')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds spent on each benchmark')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='Store the results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='Compare against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Relative slowdown of the median that counts as a regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.only, args.min_time)
+    status = 0
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline['results'], args.tolerance):
+            status = 1
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.platform(),
+                       'results': results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
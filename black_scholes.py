@@ -0,0 +1,81 @@
+import numpy as np
+from scipy.special import ndtr
+
+INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def _norm_pdf(x):
+    return INV_SQRT_2PI * np.exp(-0.5 * x * x)
+
+
+def _is_call(option_type):
+    """
+    Convert 'C'/'P' labels (scalar or array) to a boolean call mask.
+    """
+    option_type = np.asarray(option_type)
+    if option_type.dtype == bool:
+        return option_type
+    is_call = option_type == 'C'
+    if not np.all(is_call | (option_type == 'P')):
+        raise ValueError("Invalid option type. Use 'C' for call and 'P' for put.")
+    return is_call
+
+
+def _d1_d2(S, K, T, r, sigma):
+    sqrtT = np.sqrt(T)
+    sig_sqrtT = sigma * sqrtT
+    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / sig_sqrtT
+    return d1, d1 - sig_sqrtT, sqrtT
+
+
+def price(S, K, T, r, sigma, option_type='C'):
+    """
+    Black-Scholes option prices for arrays of inputs. All arguments broadcast.
+    :param S: Spot price
+    :param K: Strike price
+    :param T: Time to maturity (in years)
+    :param r: Risk-free interest rate
+    :param sigma: Volatility
+    :param option_type: 'C'/'P' label(s) or a boolean call mask
+    :return: Array of option prices
+    """
+    S, K, T, r, sigma = (np.asarray(x, dtype=np.float64) for x in (S, K, T, r, sigma))
+    is_call = _is_call(option_type)
+    d1, d2, _ = _d1_d2(S, K, T, r, sigma)
+    discount = K * np.exp(-r * T)
+    call = S * ndtr(d1) - discount * ndtr(d2)
+    put = discount * ndtr(-d2) - S * ndtr(-d1)
+    return np.where(is_call, call, put)
+
+
+def price_and_greeks(S, K, T, r, sigma, option_type='C'):
+    """
+    Black-Scholes prices and Greeks in one vectorized pass. All arguments broadcast.
+    Vega and rho are per unit change in sigma and r, theta is per year.
+    :param S: Spot price
+    :param K: Strike price
+    :param T: Time to maturity (in years)
+    :param r: Risk-free interest rate
+    :param sigma: Volatility
+    :param option_type: 'C'/'P' label(s) or a boolean call mask
+    :return: dict of arrays: price, delta, gamma, vega, theta, rho
+    """
+    S, K, T, r, sigma = (np.asarray(x, dtype=np.float64) for x in (S, K, T, r, sigma))
+    is_call = _is_call(option_type)
+    d1, d2, sqrtT = _d1_d2(S, K, T, r, sigma)
+    discount = K * np.exp(-r * T)
+    pdf_d1 = _norm_pdf(d1)
+    # Signed normal CDFs: N(d) for calls, N(-d) for puts
+    sign = np.where(is_call, 1.0, -1.0)
+    nd1 = ndtr(sign * d1)
+    nd2 = ndtr(sign * d2)
+
+    time_decay = -S * pdf_d1 * sigma / (2.0 * sqrtT)
+    return {
+        'price': sign * (S * nd1 - discount * nd2),
+        'delta': sign * nd1,
+        'gamma': pdf_d1 / (S * sigma * sqrtT),
+        'vega': S * pdf_d1 * sqrtT,
+        'theta': time_decay - sign * r * discount * nd2,
+        'rho': sign * T * discount * nd2,
+    }
@@ -0,0 +1,353 @@
+import copy
+import time
+from types import MappingProxyType
+
+import numpy as np
+
+import implied_vol
+
+MS_PER_DAY = 1000 * 60 * 60 * 24
+DAYS_PER_YEAR = 365.25
+
+
+def _listing_columns(option_symbols):
+    """
+    Parse exchangeInfo option symbol entries into unsorted listing columns
+    :return: (symbols, assets, expiry_labels, sides, strike_price, expiry, underlyings)
+    """
+    rows = []
+    for symbol in option_symbols:
+        asset, expiry, _, side = symbol['symbol'].split('-')
+        rows.append((symbol['symbol'], asset, expiry, side, float(symbol['strikePrice']),
+                     int(symbol['expiryDate']), symbol['underlying']))
+    symbols, assets, expiry_labels, sides, strikes, expiries, underlyings = zip(*rows) if rows else ((),) * 7
+    return (np.array(symbols, dtype=str), np.array(assets, dtype=str), np.array(expiry_labels, dtype=str),
+            np.array(sides, dtype='U1'), np.array(strikes, dtype=np.float64), np.array(expiries, dtype=np.int64),
+            np.array(underlyings, dtype=str))
+
+
+class ChainStore:
+    """
+    Columnar store for every listed option.
+
+    Rows are sorted by (asset, expiry, side, strike), so every asset/expiry/side
+    slice is a contiguous row range and its columns are plain NumPy views.
+    Calls sort before puts, which makes side 'A' (calls followed by puts) a
+    contiguous range as well.
+
+    A store is an immutable snapshot: its arrays are read-only and every update
+    (with_marks, with_mark_updates, with_listing) returns a new store with the next version, so
+    readers holding a reference always see one consistent refresh.
+    """
+
+    MARK_COLUMNS = ('mark_price', 'mark_iv', 'risk_free_rate', 'forward_price',
+                    'moneyness', 'log_moneyness', 'total_implied_variance', 'solved_iv')
+    STATIC_COLUMNS = ('symbols', 'assets', 'expiry_labels', 'sides', 'strike_price', 'expiry', 'underlying_idx')
+    TIME_COLUMNS = ('time_to_expiry_ms', 'days_to_expiry', 'time_to_expiry')
+
+    def __init__(self, option_symbols, cur_time):
+        """
+        Build the store from the exchangeInfo 'optionSymbols' list.
+        :param option_symbols: exchangeInfo option symbol entries
+        :param cur_time: Current time in milliseconds
+        """
+        self._set_listing(*_listing_columns(option_symbols))
+        # Bumped whenever derived columns change, so caches can key on the data they were built from
+        self.version = 0
+        for name in self.MARK_COLUMNS:
+            setattr(self, name, np.full(self.size, np.nan))
+        self.iv_status = np.full(self.size, implied_vol.INVALID, dtype=np.int8)
+        self.spot_prices = MappingProxyType({})
+        self.update_time(cur_time)
+        self._freeze()
+
+    def _set_listing(self, symbols, assets, expiry_labels, sides, strike_price, expiry, underlyings):
+        """
+        Sort listing columns by (asset, expiry, side, strike) and index the slices.
+        :return: The row order applied to the given columns
+        """
+        order = np.lexsort((strike_price, sides, expiry, assets))
+        n = order.size
+        self.size = n
+        self.symbols = symbols[order]
+        self.assets = assets[order]
+        self.expiry_labels = expiry_labels[order]
+        self.sides = sides[order]
+        self.strike_price = strike_price[order]
+        self.expiry = expiry[order]
+
+        self.underlying_names, underlying_idx = np.unique(underlyings[order], return_inverse=True)
+        self.underlying_names = self.underlying_names.tolist()
+        self.underlying_idx = underlying_idx.astype(np.intp).reshape(n)
+
+        # symbol -> row index, built once: sorted symbols plus the row each one lives in
+        self._symbol_order = np.argsort(self.symbols)
+        self._sorted_symbols = self.symbols[self._symbol_order]
+
+        # asset -> expiry -> side -> slice, and asset -> underlying
+        self.slices = {}
+        self.underlyings = {}
+        expiry_dates = {}
+        changed = ((self.assets[1:] != self.assets[:-1]) | (self.expiry[1:] != self.expiry[:-1])
+                   | (self.sides[1:] != self.sides[:-1]))
+        bounds = np.concatenate(([0], np.flatnonzero(changed) + 1, [n])) if n else np.zeros(1, dtype=np.intp)
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            asset, label, side = str(self.assets[start]), str(self.expiry_labels[start]), str(self.sides[start])
+            expiries = self.slices.setdefault(asset, {})
+            expiries.setdefault(label, {'C': slice(start, start), 'P': slice(start, start)})[side] = slice(start, stop)
+            self.underlyings[asset] = self.underlying_names[self.underlying_idx[start]]
+            expiry_dates.setdefault(asset, {})[label] = int(self.expiry[start])
+        for expiries in self.slices.values():
+            for sides in expiries.values():
+                sides['A'] = slice(sides['C'].start, max(sides['C'].stop, sides['P'].stop))
+
+        self.expiry_dates = {
+            asset: sorted(dates.items(), key=lambda x: x[1])
+            for asset, dates in expiry_dates.items()
+        }
+        return order
+
+    def update_time(self, cur_time):
+        """
+        Recompute time-to-expiry columns for every option in one vectorized pass.
+        Only called on a snapshot that has not been published yet.
+        :param cur_time: Current time in milliseconds
+        """
+        # Time the snapshot's time columns were computed for
+        self.as_of = cur_time
+        self.time_to_expiry_ms = self.expiry - cur_time
+        self.days_to_expiry = self.time_to_expiry_ms / MS_PER_DAY
+        self.time_to_expiry = self.days_to_expiry / DAYS_PER_YEAR
+
+    def locate(self, asset, expiry, side):
+        """
+        Get the row range of a slice
+        :param asset: Asset of the slice
+        :param expiry: Expiry of the slice
+        :param side: 'C', 'P' or 'A'
+        :return: slice object, or None if the slice does not exist
+        """
+        try:
+            return self.slices[asset][expiry][side]
+        except KeyError:
+            return None
+
+    def column(self, name, asset, expiry, side):
+        """
+        Get a view of one column for a slice
+        :param name: Column name
+        :return: NumPy view, or None if the slice does not exist
+        """
+        rows = self.locate(asset, expiry, side)
+        if rows is None:
+            return None
+        return getattr(self, name)[rows]
+
+    def otm_rows(self, asset, expiry):
+        """
+        Rows of one out-of-the-money option per strike of an expiry: the call at strikes
+        above the forward, the put at or below it. Where that option has no usable mark
+        the other side's is taken instead, and strikes with neither are left out.
+        :return: Array of row indices ordered by strike, or None if the expiry does not exist
+        """
+        calls, puts = self.locate(asset, expiry, 'C'), self.locate(asset, expiry, 'P')
+        if calls is None:
+            return None
+        strikes = np.union1d(self.strike_price[calls], self.strike_price[puts])
+
+        def match(rows):
+            # Row of each strike on one side, and whether that side lists it with a usable mark
+            side_strikes = self.strike_price[rows]
+            if len(side_strikes) == 0:
+                return np.zeros(len(strikes), dtype=np.intp), np.zeros(len(strikes), dtype=bool)
+            i = np.minimum(np.searchsorted(side_strikes, strikes), len(side_strikes) - 1)
+            row = rows.start + i
+            return row, (side_strikes[i] == strikes) & np.isfinite(self.total_implied_variance[row])
+
+        call_row, call_ok = match(calls)
+        put_row, put_ok = match(puts)
+        forward = self.forward_price[calls.start if calls.stop > calls.start else puts.start]
+        use_call = np.where(strikes > forward, call_ok, ~put_ok)
+        return np.where(use_call, call_row, put_row)[np.where(use_call, call_ok, put_ok)]
+
+    def svi_slice(self, asset, expiry, side):
+        """
+        Log-moneyness and total variance points SVI fits of a slice work on. Sides 'C' and
+        'P' give the slice's rows with a usable mark. Side 'A' gives one out-of-the-money
+        option per strike (see otm_rows) rather than every call followed by every put, so
+        fits see each strike once and skip the in-the-money marks.
+        :return: (k, w) arrays, or None if the slice does not exist
+        """
+        if side == 'A':
+            rows = self.otm_rows(asset, expiry)
+        else:
+            rows = self.locate(asset, expiry, side)
+            if rows is not None:
+                # Rows without a mark yet (new listings, symbols missing from the mark payload)
+                rows = rows.start + np.flatnonzero(np.isfinite(self.total_implied_variance[rows]))
+        if rows is None:
+            return None
+        return self.log_moneyness[rows], self.total_implied_variance[rows]
+
+    def rows_for_symbols(self, symbols):
+        """
+        Map symbols to row indices, -1 for symbols not in the store
+        :param symbols: Iterable of option symbols
+        :return: Array of row indices
+        """
+        symbols = np.asarray(symbols, dtype=str)
+        if self.size == 0 or symbols.size == 0:
+            return np.full(symbols.size, -1, dtype=np.intp)
+        pos = np.searchsorted(self._sorted_symbols, symbols)
+        pos = np.minimum(pos, self.size - 1)
+        found = self._sorted_symbols[pos] == symbols
+        return np.where(found, self._symbol_order[pos], -1)
+
+    def listing_diff(self, option_symbols):
+        """
+        Compare an exchangeInfo listing with the options in this store
+        :param option_symbols: exchangeInfo option symbol entries
+        :return: (entries of newly listed options, symbols no longer listed)
+        """
+        listed = {symbol['symbol']: symbol for symbol in option_symbols}
+        names = np.array(list(listed), dtype=str)
+        retired = self.symbols[~np.isin(self.symbols, names)]
+        added = [listed[name] for name in names[self.rows_for_symbols(names) < 0].tolist()]
+        return added, retired.tolist()
+
+    def with_listing(self, added, retired, cur_time=None):
+        """
+        New snapshot with options listed or delisted. Rows of every other option are
+        carried over with their marks, so only the affected slices change; new options
+        have no marks until the next mark refresh.
+        :param added: exchangeInfo entries of newly listed options
+        :param retired: Symbols of delisted (e.g. expired) options
+        :param cur_time: Current time in milliseconds, defaults to now
+        :return: ChainStore with the next version
+        """
+        keep = ~np.isin(self.symbols, np.array(retired, dtype=str))
+        new_columns = _listing_columns(added)
+        snapshot = copy.copy(self)
+        order = snapshot._set_listing(
+            *(np.concatenate((getattr(self, name)[keep], values)) for name, values in zip(
+                ('symbols', 'assets', 'expiry_labels', 'sides', 'strike_price', 'expiry'), new_columns[:6])),
+            np.concatenate((np.array(self.underlying_names, dtype=str)[self.underlying_idx[keep]], new_columns[6])))
+        # Previous row of every new row, -1 for newly listed options
+        previous_rows = np.concatenate((np.flatnonzero(keep), np.full(len(added), -1)))[order]
+        carried = previous_rows >= 0
+        columns = {}
+        for name in ('mark_price', 'mark_iv', 'risk_free_rate'):
+            values = np.full(snapshot.size, np.nan)
+            values[carried] = getattr(self, name)[previous_rows[carried]]
+            columns[name] = values
+        return snapshot._successor(self.spot_prices, cur_time, **columns)
+
+    def with_marks(self, mark_info, spot_prices, cur_time=None):
+        """
+        New snapshot with a /eapi/v1/mark payload scattered into the mark columns and
+        every time and derived column recomputed. This snapshot is left untouched.
+        :param mark_info: List of mark entries from the exchange
+        :param spot_prices: Mapping of underlying symbol to spot price
+        :param cur_time: Current time in milliseconds, defaults to now
+        :return: ChainStore with the next version
+        """
+        rows = self.rows_for_symbols([data['symbol'] for data in mark_info])
+        known = rows >= 0
+        rows = rows[known]
+        columns = {}
+        for name, key in (('mark_price', 'markPrice'), ('mark_iv', 'markIV'), ('risk_free_rate', 'riskFreeInterest')):
+            values = getattr(self, name).copy()
+            values[rows] = np.array([data[key] for data in mark_info], dtype=np.float64)[known]
+            columns[name] = values
+        return self._successor(spot_prices, cur_time, **columns)
+
+    def with_mark_updates(self, symbols, mark_price, mark_iv, spot_prices, cur_time=None):
+        """
+        New snapshot with a batch of incremental mark updates (e.g. websocket ticks).
+        Options missing from the batch keep their previous marks, and so do NaN entries,
+        so a tick carrying only a mark price leaves the mark IV as it was.
+        :param symbols: Option symbols of the batch
+        :param mark_price: Mark prices, aligned with symbols
+        :param mark_iv: Mark implied volatilities, aligned with symbols
+        :param spot_prices: Mapping of underlying symbol to spot price
+        :param cur_time: Current time in milliseconds, defaults to now
+        :return: ChainStore with the next version, or this snapshot if the batch changes nothing
+        """
+        rows = self.rows_for_symbols(symbols)
+        known = rows >= 0
+        columns = {}
+        for name, values in (('mark_price', mark_price), ('mark_iv', mark_iv)):
+            values = np.asarray(values, dtype=np.float64)[known]
+            target = rows[known][np.isfinite(values)]
+            values = values[np.isfinite(values)]
+            if (getattr(self, name)[target] != values).any():
+                columns[name] = getattr(self, name).copy()
+                columns[name][target] = values
+        if not columns and dict(spot_prices) == dict(self.spot_prices):
+            return self
+        return self._successor(spot_prices, cur_time, **columns)
+
+    def _successor(self, spot_prices, cur_time=None, **columns):
+        """
+        Build the next snapshot off to the side: it shares the static symbol/strike/expiry
+        columns, takes the given mark columns, recomputes the time and derived ones and is
+        frozen before anyone can see it.
+        """
+        snapshot = copy.copy(self)
+        for name, values in columns.items():
+            setattr(snapshot, name, values)
+        snapshot.spot_prices = MappingProxyType(dict(spot_prices))
+        snapshot.update_time(time.time() * 1000 if cur_time is None else cur_time)
+        snapshot._compute_derived()
+        snapshot.version = self.version + 1
+        snapshot._freeze()
+        return snapshot
+
+    def with_columns(self, version, spot_prices, as_of=None, **columns):
+        """
+        New snapshot that takes the given columns as they are, nothing recomputed. Used to
+        adopt a snapshot computed by another process (see shared_chain).
+        :param version: Version of the adopted snapshot
+        :param spot_prices: Mapping of underlying symbol to spot price
+        :param as_of: Time in milliseconds the adopted time columns were computed for
+        :param columns: Arrays for any of the mark, time and iv_status columns
+        :return: ChainStore
+        """
+        snapshot = copy.copy(self)
+        for name, values in columns.items():
+            setattr(snapshot, name, values)
+        if as_of is not None:
+            snapshot.as_of = as_of
+        snapshot.spot_prices = MappingProxyType(dict(spot_prices))
+        snapshot.version = version
+        snapshot._freeze()
+        return snapshot
+
+    def _compute_derived(self):
+        """
+        Recompute forward, moneyness, total variance and solved IV columns from the marks.
+        Only called on a snapshot that has not been published yet.
+        """
+        spot = np.array([self.spot_prices.get(name, np.nan) for name in self.underlying_names], dtype=np.float64)
+        row_spot = spot[self.underlying_idx]
+        self.forward_price = row_spot * np.exp(self.risk_free_rate * self.time_to_expiry)
+        self.moneyness = self.forward_price / self.strike_price
+        self.log_moneyness = np.log(self.moneyness)
+        self.total_implied_variance = self.mark_iv**2 * self.time_to_expiry
+        self.solved_iv, self.iv_status = implied_vol.implied_volatility(
+            self.mark_price, row_spot, self.strike_price, self.time_to_expiry, self.risk_free_rate, self.sides == 'C')
+
+    def _freeze(self):
+        for name in self.MARK_COLUMNS + self.STATIC_COLUMNS + self.TIME_COLUMNS + ('iv_status',):
+            getattr(self, name).flags.writeable = False
+
+    def expiry_info(self, asset, expiry):
+        """
+        Get per-expiry values shared by every option of the expiry
+        :return: (time_to_expiry, forward_price, risk_free_rate)
+        """
+        rows = self.locate(asset, expiry, 'A')
+        if rows is None:
+            return None
+        i = rows.start
+        return float(self.time_to_expiry[i]), float(self.forward_price[i]), float(self.risk_free_rate[i])
@@ -0,0 +1,290 @@
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# On-disk layout: <root>/<kind>/<YYYY-MM-DD>/<column>.bin plus keys.json. Every column
+# is a raw little-endian array appended in lockstep, one element per record; keys.json
+# lists the symbols (chain) or slices (svi) that the key_id column indexes into. Rows
+# are appended in time order, so a time range is one searchsorted away.
+CHAIN_COLUMNS = {
+    'time': '<i8',
+    'key_id': '<i4',
+    'mark_price': '<f4',
+    'mark_iv': '<f4',
+    'solved_iv': '<f4',
+    'forward_price': '<f4',
+    'time_to_expiry': '<f4',
+}
+# Every SVI parameterization fitted in the background has five parameters
+SVI_PARAM_COUNT = 5
+SVI_COLUMNS = {
+    'time': '<i8',
+    'key_id': '<i4',
+    'version': '<i8',
+    **{f'param_{i}': '<f8' for i in range(SVI_PARAM_COUNT)},
+}
+SCHEMAS = {'chain': CHAIN_COLUMNS, 'svi': SVI_COLUMNS}
+
+
+def day_of(timestamp):
+    """
+    UTC day of a millisecond timestamp, e.g. '2025-03-28'
+    """
+    return datetime.datetime.fromtimestamp(timestamp / 1000, datetime.timezone.utc).strftime('%Y-%m-%d')
+
+
+def svi_key(asset, expiry, side, parameterization_type):
+    return f"{asset}-{expiry}-{side}-{parameterization_type}"
+
+
+class HistoryRecorder:
+    """
+    Appends every refreshed chain and every batch of background SVI fits to day-rotated
+    columnar files. Records are queued and written by a background thread, so the
+    refresh path only pays for a queue put; if the writer falls behind, records are
+    dropped rather than blocking the refresh.
+    """
+
+    def __init__(self, root, queue_size=256):
+        """
+        :param root: Directory the history is written under
+        :param queue_size: Records that may wait for the writer before new ones are dropped
+        """
+        self.root = root
+        self.dropped = 0
+        self._queue = queue.Queue(queue_size)
+        self._keys = {}
+        self._last_listing = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record_chain(self, chain, timestamp=None):
+        """
+        Queue a chain snapshot. Snapshots are immutable, so only the reference is queued.
+        :param timestamp: Record time in milliseconds, defaults to now
+        """
+        self._offer('chain', timestamp, chain)
+
+    def record_svi(self, version, results, timestamp=None):
+        """
+        Queue a batch of fitted SVI parameters
+        :param results: Mapping of (asset, expiry, side, parameterization_type) to params
+        """
+        self._offer('svi', timestamp, (version, dict(results)))
+
+    def _offer(self, kind, timestamp, payload):
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        try:
+            self._queue.put_nowait((kind, timestamp, payload))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logger.warning("History writer is behind, dropped a %s record (%s so far)", kind, self.dropped)
+
+    def flush(self):
+        """
+        Block until every queued record is written
+        """
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                kind, timestamp, payload = item
+                if kind == 'chain':
+                    self._write_chain(timestamp, payload)
+                else:
+                    self._write_svi(timestamp, *payload)
+            except Exception as e:
+                logger.error("Failed to record %s history: %s", item[0], e)
+            finally:
+                self._queue.task_done()
+
+    def _directory(self, kind, day):
+        path = os.path.join(self.root, kind, day)
+        if (kind, day) not in self._keys:
+            os.makedirs(path, exist_ok=True)
+            keys_path = os.path.join(path, 'keys.json')
+            keys = []
+            if os.path.exists(keys_path):
+                with open(keys_path) as f:
+                    keys = json.load(f)
+                _truncate_to_common_length(path, SCHEMAS[kind])
+            self._keys[(kind, day)] = {key: i for i, key in enumerate(keys)}
+        return path
+
+    def _key_ids(self, kind, day, keys):
+        """
+        Dictionary codes of keys, registering new ones in the day's keys.json
+        """
+        path = self._directory(kind, day)
+        codes = self._keys[(kind, day)]
+        new = [key for key in dict.fromkeys(keys) if key not in codes]
+        if new:
+            for key in new:
+                codes[key] = len(codes)
+            temp_path = os.path.join(path, 'keys.json.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump(list(codes), f)
+            os.replace(temp_path, os.path.join(path, 'keys.json'))
+        return np.array([codes[key] for key in keys], dtype=np.int32)
+
+    def _append(self, kind, day, columns):
+        path = self._directory(kind, day)
+        for name, dtype in SCHEMAS[kind].items():
+            with open(os.path.join(path, f'{name}.bin'), 'ab') as f:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+    def _write_chain(self, timestamp, chain):
+        day = day_of(timestamp)
+        last = self._last_listing
+        if last is not None and last[0] == day and last[1] is chain.symbols:
+            key_ids = last[2]
+        else:
+            # Snapshots share the symbols array until the listing changes
+            key_ids = self._key_ids('chain', day, chain.symbols.tolist())
+            self._last_listing = (day, chain.symbols, key_ids)
+        self._append('chain', day, {
+            'time': np.full(chain.size, timestamp),
+            'key_id': key_ids,
+            'mark_price': chain.mark_price,
+            'mark_iv': chain.mark_iv,
+            'solved_iv': chain.solved_iv,
+            'forward_price': chain.forward_price,
+            'time_to_expiry': chain.time_to_expiry,
+        })
+
+    def _write_svi(self, timestamp, version, results):
+        fitted = [(key, params) for key, params in results.items() if params is not None]
+        if not fitted:
+            return
+        day = day_of(timestamp)
+        params = np.full((len(fitted), SVI_PARAM_COUNT), np.nan)
+        for i, (_, values) in enumerate(fitted):
+            values = np.asarray(values, dtype=np.float64)[:SVI_PARAM_COUNT]
+            params[i, :values.size] = values
+        columns = {
+            'time': np.full(len(fitted), timestamp),
+            'key_id': self._key_ids('svi', day, [svi_key(*key) for key, _ in fitted]),
+            'version': np.full(len(fitted), version),
+        }
+        for i in range(SVI_PARAM_COUNT):
+            columns[f'param_{i}'] = params[:, i]
+        self._append('svi', day, columns)
+
+
+def _truncate_to_common_length(path, schema):
+    """
+    Cut every column of a day back to the number of complete records, in case a
+    previous process stopped between appending two columns
+    """
+    sizes = {}
+    for name, dtype in schema.items():
+        column_path = os.path.join(path, f'{name}.bin')
+        sizes[column_path] = (os.path.getsize(column_path) if os.path.exists(column_path) else 0,
+                              np.dtype(dtype).itemsize)
+    records = min(size // itemsize for size, itemsize in sizes.values())
+    for column_path, (size, itemsize) in sizes.items():
+        if size > records * itemsize:
+            os.truncate(column_path, records * itemsize)
+
+
+class HistoryReader:
+    """
+    Time-range queries over recorded history. Columns are memory-mapped, and only the
+    columns a query needs are touched, so history never has to fit in RAM.
+    """
+
+    def __init__(self, root):
+        """
+        :param root: Directory the history was recorded under
+        """
+        self.root = root
+
+    def _days(self, kind, start, end):
+        first = datetime.datetime.fromtimestamp(start / 1000, datetime.timezone.utc).date()
+        last = datetime.datetime.fromtimestamp(end / 1000, datetime.timezone.utc).date()
+        day = first
+        while day <= last:
+            path = os.path.join(self.root, kind, day.strftime('%Y-%m-%d'))
+            if os.path.isdir(path):
+                yield path
+            day += datetime.timedelta(days=1)
+
+    def _query(self, kind, key, columns, start, end):
+        """
+        Rows of one key within [start, end]
+        :param columns: Columns to read besides time
+        :return: dict of column name to array, concatenated across days
+        """
+        schema = SCHEMAS[kind]
+        needed = ('time', 'key_id') + tuple(columns)
+        parts = {name: [] for name in ('time',) + tuple(columns)}
+        for path in self._days(kind, start, end):
+            try:
+                with open(os.path.join(path, 'keys.json')) as f:
+                    key_id = json.load(f).index(key)
+            except (FileNotFoundError, ValueError):
+                continue
+            # A column may be one record ahead of the others while the writer is appending
+            try:
+                records = min(os.path.getsize(os.path.join(path, f'{name}.bin')) // np.dtype(schema[name]).itemsize
+                              for name in needed)
+            except FileNotFoundError:
+                continue
+            if records == 0:
+                continue
+            mapped = {name: np.memmap(os.path.join(path, f'{name}.bin'), dtype=schema[name], mode='r',
+                                      shape=(records,)) for name in needed}
+            times = mapped['time']
+            lo, hi = np.searchsorted(times, start, 'left'), np.searchsorted(times, end, 'right')
+            rows = lo + np.flatnonzero(mapped['key_id'][lo:hi] == key_id)
+            for name in parts:
+                parts[name].append(np.asarray(mapped[name][rows]))
+        return {name: np.concatenate(values) if values else np.empty(0, dtype=schema[name])
+                for name, values in parts.items()}
+
+    def svi_params(self, asset, expiry, side, parameterization_type, start, end):
+        """
+        Fitted SVI parameters of one slice over time
+        :param start: Range start in milliseconds, inclusive
+        :param end: Range end in milliseconds, inclusive
+        :return: {'time': [...], 'version': [...], 'params': [[...], ...]}
+        """
+        param_columns = [f'param_{i}' for i in range(SVI_PARAM_COUNT)]
+        rows = self._query('svi', svi_key(asset, expiry, side, parameterization_type),
+                           ['version'] + param_columns, start, end)
+        return {
+            'time': rows['time'].tolist(),
+            'version': rows['version'].tolist(),
+            'params': np.column_stack([rows[name] for name in param_columns]).tolist(),
+        }
+
+    def option_marks(self, symbol, start, end, columns=('mark_price', 'mark_iv', 'solved_iv', 'forward_price')):
+        """
+        Recorded marks of one option over time
+        :param columns: Chain columns to read
+        :return: {'time': [...], <column>: [...], ...}, NaN as None
+        """
+        rows = self._query('chain', symbol, list(columns), start, end)
+        res = {'time': rows['time'].tolist()}
+        for name in columns:
+            values = rows[name].astype(np.float64)
+            res[name] = np.where(np.isnan(values), None, values).tolist()
+        return res
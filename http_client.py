@@ -0,0 +1,103 @@
+import asyncio
+import atexit
+import logging
+import random
+import threading
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Worth retrying: rate limits and transient upstream failures. 418 (IP ban) is not.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class AsyncHTTPClient:
+    """
+    Pooled aiohttp client running on its own event loop thread, so synchronous callers
+    (the scheduler, Flask views) can fan requests out concurrently over persistent
+    connections. Every request has a timeout and is retried with jittered exponential
+    backoff on connection errors, timeouts and retryable statuses.
+    """
+
+    def __init__(self, proxy=None, pool_size=10, timeout=10, retries=3, backoff=0.25, max_backoff=4):
+        """
+        :param proxy: Optional HTTP(S) proxy URL
+        :param pool_size: Maximum number of open connections
+        :param timeout: Default total timeout per attempt in seconds
+        :param retries: Retries after the first attempt
+        :param backoff: Base delay of the exponential backoff in seconds
+        :param max_backoff: Cap on a single backoff delay in seconds
+        """
+        self.proxy = proxy
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._session = self.run(self._create_session())
+        atexit.register(self.close)
+
+    async def _create_session(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector)
+
+    def run(self, coroutine):
+        """
+        Run a coroutine on the client's loop and wait for its result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def retry_delay(self, attempt):
+        """
+        Full-jitter exponential backoff: uniform in [0, min(max_backoff, backoff * 2**attempt)]
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    async def get_json(self, url, params=None, timeout=None):
+        """
+        GET a JSON document, retrying transient failures
+        :param timeout: Total timeout per attempt in seconds, defaults to the client timeout
+        :return: Decoded JSON
+        :raises aiohttp.ClientError: Non-retryable status, or retries exhausted
+        :raises asyncio.TimeoutError: Last attempt timed out
+        """
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._session.get(url, params=params, proxy=self.proxy, timeout=client_timeout) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        logger.warning("GET %s returned %s, retrying", url, response.status)
+                    else:
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning("GET %s failed (%s), retrying", url, e.__class__.__name__)
+            await asyncio.sleep(self.retry_delay(attempt))
+
+    def fetch(self, url, params=None, timeout=None):
+        """
+        Synchronous get_json
+        """
+        return self.run(self.get_json(url, params, timeout))
+
+    def fetch_all(self, requests):
+        """
+        Issue several GETs concurrently and wait for all of them
+        :param requests: Iterable of (url, params, timeout) tuples
+        :return: List of decoded JSON documents, in request order
+        """
+        async def gather():
+            return await asyncio.gather(*(self.get_json(*request) for request in requests))
+        return self.run(gather())
+
+    def close(self):
+        if not self._loop.is_running():
+            return
+        self.run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
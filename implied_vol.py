@@ -0,0 +1,131 @@
+import numpy as np
+from scipy.special import ndtr
+
+import black_scholes
+
+# Per-option solver status codes
+CONVERGED = 0        # Newton/Halley converged without needing the bracket
+BRACKETED = 1        # converged, but bisection steps on the bracket were needed
+NOT_CONVERGED = 2    # hit max_iter before reaching tolerance
+INVALID = 3          # price outside no-arbitrage bounds, or T <= 0
+UNDETERMINED = 4     # vega below the price tolerance: the price does not pin down sigma
+
+STATUS_NAMES = {
+    CONVERGED: 'converged',
+    BRACKETED: 'bracketed',
+    NOT_CONVERGED: 'not_converged',
+    INVALID: 'invalid',
+    UNDETERMINED: 'undetermined',
+}
+
+MIN_VOL = 1e-6
+MAX_VOL = 20.0
+
+
+def brenner_subrahmanyam(price, S, T):
+    """
+    Brenner and Subrahmanyam (1988) ATM estimate: sigma0 = sqrt(2pi/T) * (C/S)
+    """
+    return np.sqrt(2 * np.pi / T) * price / S
+
+
+def implied_volatility(price, S, K, T, r, option_type='C', price_tol=1e-10, vol_tol=1e-10, max_iter=100):
+    """
+    Invert Black-Scholes prices for a whole chain in one vectorized pass.
+
+    Every price is first mapped to its out-of-the-money equivalent through put-call
+    parity (so deep ITM quotes are solved on their time value), seeded with the
+    Brenner-Subrahmanyam guess and refined with Halley steps. Each option keeps a
+    [lo, hi] bracket on sigma; whenever a step leaves the bracket or vega vanishes
+    (deep OTM, near expiry) the option falls back to bisection for that iteration.
+    :param price: Option prices
+    :param S: Spot price
+    :param K: Strike price
+    :param T: Time to maturity (in years)
+    :param r: Risk-free interest rate
+    :param option_type: 'C'/'P' label(s) or a boolean call mask
+    :param price_tol: Absolute price tolerance, relative to S
+    :param vol_tol: Absolute tolerance on sigma between iterations
+    :param max_iter: Maximum number of iterations
+    :return: (implied volatilities, status codes); unsolved options are NaN, and so are options
+        with negligible time value, whose price matches a whole range of sigma within price_tol
+    """
+    price, S, K, T, r = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (price, S, K, T, r)))
+    is_call = np.broadcast_to(black_scholes._is_call(option_type), price.shape)
+    shape = price.shape
+    price, S, K, T, r, is_call = (x.ravel() for x in (price, S, K, T, r, is_call))
+
+    n = price.size
+    iv = np.full(n, np.nan)
+    status = np.full(n, INVALID, dtype=np.int8)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discount = K * np.exp(-r * T)
+        # Put-call parity: solve on the OTM option relative to the forward
+        call_price = np.where(is_call, price, price + S - discount)
+        otm_call = discount >= S
+        target = np.where(otm_call, call_price, call_price - S + discount)
+        upper = np.where(otm_call, S, discount)
+        valid = (T > 0) & (S > 0) & (K > 0) & np.isfinite(price) & (target > 0) & (target < upper)
+
+    idx = np.flatnonzero(valid)
+    if idx.size == 0:
+        return iv.reshape(shape), status.reshape(shape)
+
+    S_, K_, T_, r_, target_, call_ = S[idx], K[idx], T[idx], r[idx], target[idx], otm_call[idx]
+    tol_ = price_tol * S_
+    sigma = np.clip(brenner_subrahmanyam(target_, S_, T_), 0.01, 5.0)
+    lo = np.full(idx.size, MIN_VOL)
+    hi = np.full(idx.size, MAX_VOL)
+    used_bracket = np.zeros(idx.size, dtype=bool)
+    done = np.zeros(idx.size, dtype=bool)
+
+    active = np.arange(idx.size)
+    for _ in range(max_iter):
+        s, k, t, rr, tgt, c = S_[active], K_[active], T_[active], r_[active], target_[active], call_[active]
+        sig = sigma[active]
+        sqrtT = np.sqrt(t)
+        d1 = (np.log(s / k) + (rr + 0.5 * sig**2) * t) / (sig * sqrtT)
+        d2 = d1 - sig * sqrtT
+        disc = k * np.exp(-rr * t)
+        model = np.where(c, s * ndtr(d1) - disc * ndtr(d2), disc * ndtr(-d2) - s * ndtr(-d1))
+        diff = model - tgt
+
+        # Price is increasing in sigma, so the sign of diff tightens the bracket
+        over = diff > 0
+        hi[active] = np.where(over, np.minimum(hi[active], sig), hi[active])
+        lo[active] = np.where(over, lo[active], np.maximum(lo[active], sig))
+
+        vega = s * black_scholes._norm_pdf(d1) * sqrtT
+        lo_, hi_ = lo[active], hi[active]
+        with np.errstate(all='ignore'):
+            newton = diff / vega
+            # Halley correction using vomma / vega = d1 * d2 / sigma
+            halley = newton / (1 - 0.5 * newton * d1 * d2 / sig)
+            newton_sig = sig - newton
+            halley_sig = sig - halley
+        # A Newton step that leaves the bracket means vega is too small to trust: bisect instead
+        outside = ~np.isfinite(newton_sig) | (newton_sig <= lo_) | (newton_sig >= hi_)
+        use_halley = np.isfinite(halley_sig) & (halley_sig > lo_) & (halley_sig < hi_) & (halley * newton > 0)
+        new_sig = np.where(use_halley, halley_sig, newton_sig)
+        new_sig = np.where(outside, 0.5 * (lo_ + hi_), new_sig)
+        used_bracket[active] |= outside
+
+        converged = (np.abs(diff) <= tol_[active]) | (np.abs(new_sig - sig) <= vol_tol)
+        sigma[active] = np.where(converged & (np.abs(diff) <= tol_[active]), sig, new_sig)
+        done[active] = converged
+        active = active[~converged]
+        if active.size == 0:
+            break
+
+    # Where vega is below the price tolerance, any sigma near the solution reprices the
+    # option within tolerance (typically at the MIN_VOL floor), so the solution means nothing
+    sqrtT = np.sqrt(T_)
+    d1 = (np.log(S_ / K_) + (r_ + 0.5 * sigma**2) * T_) / (sigma * sqrtT)
+    undetermined = done & (S_ * black_scholes._norm_pdf(d1) * sqrtT < tol_)
+
+    iv[idx] = sigma
+    status[idx] = np.where(done, np.where(used_bracket, BRACKETED, CONVERGED), NOT_CONVERGED)
+    status[idx[undetermined]] = UNDETERMINED
+    iv[idx[~done | undetermined]] = np.nan
+    return iv.reshape(shape), status.reshape(shape)
@@ -0,0 +1,255 @@
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+import websocket
+
+logger = logging.getLogger(__name__)
+
+OPTIONS_STREAM_URL = "wss://nbstream.binance.com/eoptions/stream"
+SPOT_STREAM_URL = "wss://stream.binance.com:9443/stream"
+
+
+def options_stream_names(chain):
+    """
+    One ticker stream per asset and expiry, e.g. BTC@ticker@250328. Each message
+    carries the mark price ('mp') and mark IV ('vo') of every option of the expiry.
+    """
+    return [f"{asset}@ticker@{expiry}" for asset, expiries in chain.slices.items() for expiry in expiries]
+
+
+def spot_stream_names(underlyings):
+    """
+    Mini ticker streams for the listed underlyings only, e.g. btcusdt@miniTicker
+    """
+    return [f"{symbol.lower()}@miniTicker" for symbol in sorted(set(underlyings))]
+
+
+def combined_stream_url(base_url, streams):
+    return f"{base_url}?streams={'/'.join(streams)}"
+
+
+class MarketStream:
+    """
+    Keeps the chain fresh from the exchange websocket streams instead of 5 s REST polling.
+
+    Option tickers and spot mini tickers are buffered as they arrive and applied to the
+    chain in one batch every flush_interval seconds. Every (re)connect first reloads the
+    matching REST snapshot, so nothing missed while disconnected is lost.
+    """
+
+    def __init__(self, client, flush_interval=0.25, reconnect_delay=5, record_path=None,
+                 websocket_factory=websocket.WebSocketApp, options_url=OPTIONS_STREAM_URL,
+                 spot_url=SPOT_STREAM_URL):
+        """
+        :param client: Binance instance whose chain and spot prices are updated
+        :param flush_interval: Seconds between applying buffered updates
+        :param reconnect_delay: Seconds to wait before reconnecting a dropped stream
+        :param record_path: Optional JSONL file every received message is appended to
+        :param websocket_factory: websocket.WebSocketApp, or a stand-in with the same interface
+        """
+        self.client = client
+        self.flush_interval = flush_interval
+        self.reconnect_delay = reconnect_delay
+        self.record_path = record_path
+        self.websocket_factory = websocket_factory
+        self.options_url = options_url
+        self.spot_url = spot_url
+        self.messages = 0
+        self.last_flush = None
+        self._marks = {}
+        self._spot = {}
+        self._buffer_lock = threading.Lock()
+        self._record_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sockets = []
+        self._threads = []
+
+    def options_stream_url(self):
+        return combined_stream_url(self.options_url, options_stream_names(self.client.chain))
+
+    def spot_stream_url(self):
+        return combined_stream_url(self.spot_url, spot_stream_names(self.client.chain.underlyings.values()))
+
+    def start(self):
+        connections = [
+            (self.options_stream_url, self.resync_options),
+            (self.spot_stream_url, self.resync_spot),
+        ]
+        for stream_url, resync in connections:
+            self._start_thread(self._run, stream_url, resync)
+        self._start_thread(self._flush_loop)
+
+    def resync_options(self):
+        """
+        Reload every mark from the REST snapshot, e.g. after the options stream reconnects.
+        Marks still buffered from before the reconnect are older than the snapshot and dropped.
+        """
+        client = self.client
+        with self._buffer_lock:
+            self._marks = {}
+        client.get_options_info()
+        client.parse_iv_info()
+        client.publish_updates()
+
+    def resync_spot(self):
+        """
+        Reload spot prices from the REST snapshot, e.g. after the spot stream reconnects.
+        Marks are left as they are: they may be newer than the last REST mark snapshot.
+        """
+        client = self.client
+        client.apply_mark_updates([], [], [], client.get_spot_markets())
+        client.publish_updates()
+
+    def resubscribe(self):
+        """
+        Reconnect every stream, subscribing to the streams of the current listing
+        """
+        for ws in list(self._sockets):
+            ws.close()
+
+    def stop(self):
+        self._stop.set()
+        for ws in list(self._sockets):
+            ws.close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _run(self, stream_url, resync):
+        """
+        Connection loop for one combined stream, reconnecting until stopped
+        :param stream_url: Callable returning the combined stream URL, re-evaluated on every connect
+        """
+        while not self._stop.is_set():
+            url = stream_url()
+            def on_open(ws):
+                # Fall back to a REST snapshot on every (re)connect
+                try:
+                    resync()
+                except Exception as e:
+                    logger.error("REST resync failed for %s: %s", url, e)
+
+            def on_message(ws, message):
+                self.handle_message(message, url)
+
+            def on_error(ws, error):
+                logger.error("Stream error on %s: %s", url, error)
+
+            ws = self.websocket_factory(url, on_open=on_open, on_message=on_message, on_error=on_error)
+            self._sockets.append(ws)
+            try:
+                ws.run_forever(ping_interval=20, ping_timeout=10)
+            finally:
+                self._sockets.remove(ws)
+            if self._stop.wait(self.reconnect_delay):
+                break
+            logger.info("Reconnecting to %s", url)
+
+    def handle_message(self, message, url=None):
+        """
+        Buffer one raw combined-stream message
+        :param message: JSON text as received
+        :param url: Stream URL, only used when recording
+        """
+        if self.record_path is not None:
+            with self._record_lock, open(self.record_path, 'a') as f:
+                f.write(json.dumps({'time': time.time(), 'url': url, 'message': message}) + '\n')
+        payload = json.loads(message)
+        data = payload.get('data', payload)
+        events = data if isinstance(data, list) else [data]
+        with self._buffer_lock:
+            self.messages += 1
+            for event in events:
+                kind = event.get('e')
+                if kind == '24hrTicker' and ('mp' in event or 'vo' in event):
+                    # Fields a tick does not carry keep their buffered (or, if NaN, current) value
+                    mark_price, mark_iv = self._marks.get(event['s'], (np.nan, np.nan))
+                    self._marks[event['s']] = (event.get('mp', mark_price), event.get('vo', mark_iv))
+                elif kind == '24hrMiniTicker':
+                    self._spot[event['s']] = event['c']
+
+    def flush(self):
+        """
+        Apply every buffered update to the chain in one batch. Ticks that only repeat the
+        current marks do not publish a new snapshot, so the fit and response caches keyed on
+        the chain version survive quiet markets.
+        :return: True if the chain changed
+        """
+        with self._buffer_lock:
+            marks, self._marks = self._marks, {}
+            spot, self._spot = self._spot, {}
+        if not marks and not spot:
+            return False
+        client = self.client
+        values = np.array(list(marks.values()), dtype=np.float64).reshape(-1, 2)
+        changed = client.apply_mark_updates(list(marks), values[:, 0], values[:, 1],
+                                            {symbol: float(price) for symbol, price in spot.items()})
+        if spot:
+            client.last_spot_update = int(round(time.time() * 1000))
+        if marks:
+            client.last_options_update = int(round(time.time() * 1000))
+        if not changed:
+            return False
+        client.publish_updates()
+        self.last_flush = time.time()
+        return True
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Failed to apply stream updates: %s", e)
+
+
+class RecordedWebSocketApp:
+    """
+    Local stand-in for websocket.WebSocketApp that replays messages recorded by
+    MarketStream(record_path=...) instead of connecting to the exchange. Pass
+    functools.partial(RecordedWebSocketApp, path) as MarketStream's websocket_factory.
+    """
+
+    def __init__(self, path, url, on_open=None, on_message=None, on_error=None, on_close=None, speed=None):
+        """
+        :param path: JSONL recording
+        :param url: Stream URL; only messages recorded from the same endpoint are replayed
+        :param speed: Replay speed relative to the recording, None replays without pauses
+        """
+        self.path = path
+        self.url = url
+        self.on_open = on_open
+        self.on_message = on_message
+        self.on_error = on_error
+        self.on_close = on_close
+        self.speed = speed
+        self._closed = threading.Event()
+
+    def run_forever(self, **kwargs):
+        endpoint = self.url.split('?')[0]
+        if self.on_open is not None:
+            self.on_open(self)
+        previous = None
+        with open(self.path) as f:
+            for line in f:
+                if self._closed.is_set():
+                    break
+                record = json.loads(line)
+                if (record.get('url') or '').split('?')[0] != endpoint:
+                    continue
+                if self.speed and previous is not None:
+                    self._closed.wait(max(record['time'] - previous, 0) / self.speed)
+                previous = record['time']
+                self.on_message(self, record['message'])
+        if self.on_close is not None:
+            self.on_close(self, None, None)
+        return False
+
+    def close(self):
+        self._closed.set()
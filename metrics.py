@@ -0,0 +1,254 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus instrumentation: counters, callback gauges and fixed-bucket
+# histograms rendered in the text exposition format. Recording a value is a dict
+# lookup, a bisect and two additions under a per-metric lock, so the hot paths can
+# afford it on every call.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ITERATION_BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000)
+AGE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Registry:
+    """
+    Collection of metrics rendered together for one scrape
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        :return: Every metric in the Prometheus text format
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.family} {metric.documentation}')
+            lines.append(f'# TYPE {metric.family} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    @property
+    def family(self):
+        """
+        Name the HELP and TYPE lines describe
+        """
+        return self.name
+
+    def labels(self, *values):
+        """
+        Child metric of one label combination
+        """
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    @property
+    def family(self):
+        # Counter samples carry the _total suffix, and so does their family
+        return f'{self.name}_total'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._items():
+            yield f'{self.family}{_labels(self.labelnames, values)} {_format_value(child.value)}'
+
+
+class Gauge(_Metric):
+    """
+    Gauge read from a callback at scrape time, so keeping it current costs nothing
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function, registry=REGISTRY):
+        """
+        :param function: Callable returning the current value, or None to omit the sample
+        """
+        super().__init__(name, documentation, (), registry)
+        self.function = function
+
+    def samples(self):
+        try:
+            value = self.function()
+        except Exception:
+            value = None
+        if value is not None:
+            yield f'{self.name} {_format_value(value)}'
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """
+        Observe the duration of a with block in seconds
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        """
+        :param buckets: Ascending upper bounds; +Inf is implied
+        """
+        self.buckets = tuple(float(bound) for bound in buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self):
+        for values, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = _labels(self.labelnames, values, [('le', _format_value(bound))])
+                yield f'{self.name}_bucket{le} {cumulative}'
+            labels = _labels(self.labelnames, values)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+# Application metrics
+
+REFRESH_STAGE_SECONDS = Histogram(
+    'refresh_stage_seconds', 'Duration of each market data refresh stage (fetch, parse, listing, publish, fit)',
+    ['stage'])
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_seconds', 'Request handling latency by endpoint', ['endpoint', 'method', 'status'])
+HTTP_RESPONSE_BYTES = Histogram(
+    'http_response_bytes', 'Response body size on the wire by endpoint', ['endpoint'], SIZE_BUCKETS)
+RESPONSE_ENCODE_SECONDS = Histogram(
+    'response_encode_seconds', 'JSON encoding time of responses built on a response cache miss', ['endpoint'])
+SNAPSHOT_AGE_SECONDS = Histogram(
+    'served_snapshot_age_seconds', 'Age of the chain snapshot current when each API request finished',
+    buckets=AGE_BUCKETS)
+SVI_FIT_SECONDS = Histogram(
+    'svi_fit_seconds', 'Duration of one SVI slice fit', ['parameterization_type'])
+SVI_FIT_ITERATIONS = Histogram(
+    'svi_fit_iterations', 'Optimizer iterations of SVI slice fits (SLSQP for raw fits, Nelder-Mead for quasi-explicit '
+    'and cold-started SVI-JW fits, Levenberg-Marquardt for natural fits, Jacobian evaluations for warm-started SVI-JW fits)',
+    ['asset', 'expiry', 'parameterization_type'], ITERATION_BUCKETS)
+SVI_FIT_OUTCOMES = Counter(
+    'svi_fit_outcomes', 'SVI slice fits by outcome: converged, fallback (SLSQP failed and least squares was used, '
+    'or a warm-started SVI-JW fit was rejected and the slice refitted from scratch), unconverged (the quasi-explicit '
+    'Nelder-Mead search, the natural Levenberg-Marquardt search or the SVI-JW least squares stopped at its '
+    'iteration limit), rejected (failed the no-arbitrage check) or failed (no usable fit)',
+    ['asset', 'expiry', 'parameterization_type', 'outcome'])
+
+
+def record_fit(asset, expiry, parameterization_type, report):
+    """
+    Record the telemetry of one slice fit
+    :param report: svi_fits.FitReport
+    """
+    SVI_FIT_SECONDS.labels(parameterization_type).observe(report.seconds)
+    if report.iterations is not None:
+        SVI_FIT_ITERATIONS.labels(asset, expiry, parameterization_type).observe(report.iterations)
+    SVI_FIT_OUTCOMES.labels(asset, expiry, parameterization_type, report.outcome).inc()
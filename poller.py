@@ -0,0 +1,35 @@
+"""
+Market data poller for multi-worker deployments. Run exactly one next to gunicorn:
+
+    python poller.py &
+    MARKET_DATA_ROLE=reader gunicorn app:app -w 4
+
+The poller owns all exchange traffic (REST polling or websocket streams, per
+MARKET_INGESTION) and publishes every chain snapshot to the shared segment; the
+gunicorn workers attach to it read-only.
+"""
+import logging
+import os
+import signal
+import threading
+
+os.environ["MARKET_DATA_ROLE"] = "poller"
+
+from app import BinanceAPI  # noqa: E402  (builds the poller instance on import)
+
+
+def main():
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())
+    logging.getLogger(__name__).info("Publishing market data to %s", BinanceAPI.shared_writer.path)
+    stop.wait()
+    BinanceAPI.scheduler.shutdown(wait=False)
+    if BinanceAPI.market_stream is not None:
+        BinanceAPI.market_stream.stop()
+    BinanceAPI.shared_writer.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,195 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Lines of the per-request call report
+REPORT_LIMIT = 60
+
+
+class RequestProfiler:
+    """
+    Deterministic profile of one request at a time. cProfile hooks are process-wide on
+    Python 3.12+, so concurrent requests would garble each other's reports; a second
+    profiled request while one is running is refused instead.
+    """
+
+    def __init__(self, directory=None):
+        """
+        :param directory: Where saved profiles are written, defaults to the temp directory
+        """
+        self.directory = directory
+        self._busy = threading.Lock()
+        self._profiler = None
+
+    def start(self):
+        """
+        :return: False if another request is being profiled
+        """
+        if not self._busy.acquire(blocking=False):
+            return False
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return True
+
+    def stop(self):
+        """
+        :return: pstats.Stats of the profiled request
+        """
+        profiler, self._profiler = self._profiler, None
+        try:
+            profiler.disable()
+            return pstats.Stats(profiler)
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def report(stats, limit=REPORT_LIMIT):
+        """
+        Text call report: the top functions by cumulative time, then who each of them calls
+        """
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(limit)
+        stats.print_callees(limit // 3)
+        return out.getvalue()
+
+    def save(self, stats, name):
+        """
+        Dump stats in the binary pstats format, readable by pstats, snakeviz or gprof2dot
+        :return: Path of the written file
+        """
+        directory = self.directory or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}-{int(time.time() * 1000)}.prof")
+        stats.dump_stats(path)
+        return path
+
+
+def _frame_name(code):
+    # ';' separates frames in the folded format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+def fold(frame):
+    """
+    Folded stack of a frame, root first, as flamegraph.pl and speedscope read it
+    """
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for selected blocks of code, e.g. the scheduler's refresh jobs.
+    A daemon thread records the stack of every thread inside a track() block each
+    interval and sleeps while none is. Counts are aggregated as folded stacks and written
+    to <directory>/<name>-<timestamp>.folded every dump_interval seconds.
+    """
+
+    def __init__(self, directory, interval=0.005, dump_interval=60, name='refresh'):
+        """
+        :param directory: Where stack dumps are written
+        :param interval: Seconds between samples
+        :param dump_interval: Seconds between dumps; nothing is written for a period without samples
+        :param name: Prefix of the dump files
+        """
+        self.directory = directory
+        self.interval = interval
+        self.dump_interval = dump_interval
+        self.name = name
+        self.samples = 0
+        self._counts = Counter()
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._stopped = threading.Event()
+        self._last_dump = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def track(self):
+        """
+        Sample the current thread for the duration of the with block
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            self._tracked[ident] = self._tracked.get(ident, 0) + 1
+            self._active.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._tracked[ident] -= 1
+                if not self._tracked[ident]:
+                    del self._tracked[ident]
+                if not self._tracked:
+                    self._active.clear()
+
+    def wrap(self, fn):
+        """
+        Wrap a function, e.g. a scheduler job, so that every call is sampled
+        """
+        def tracked(*args, **kwargs):
+            with self.track():
+                return fn(*args, **kwargs)
+        tracked.__name__ = getattr(fn, '__name__', 'tracked')
+        tracked.__doc__ = fn.__doc__
+        return tracked
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self._active.wait(timeout=self.dump_interval):
+                self.sample()
+                time.sleep(self.interval)
+            if time.monotonic() - self._last_dump >= self.dump_interval:
+                self.dump()
+
+    def sample(self):
+        with self._lock:
+            idents = list(self._tracked)
+        frames = sys._current_frames()
+        stacks = [fold(frames[ident]) for ident in idents if ident in frames]
+        with self._lock:
+            self._counts.update(stacks)
+            self.samples += len(stacks)
+
+    def dump(self):
+        """
+        Write the samples collected since the last dump
+        :return: Path of the written file, or None if there were no samples
+        """
+        self._last_dump = time.monotonic()
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return None
+        path = os.path.join(self.directory, f"{self.name}-{int(time.time() * 1000)}.folded")
+        try:
+            with open(path, 'w') as f:
+                for stack, count in counts.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.error("Failed to write stack samples to %s: %s", path, e)
+            return None
+        return path
+
+    def stop(self):
+        self._stopped.set()
+        self._active.set()
+        self._thread.join()
+        self.dump()
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+import black_scholes
+
+# Fixture name of each exchange endpoint; other paths use their last segment
+FIXTURE_NAMES = {
+    '/eapi/v1/exchangeInfo': 'exchangeInfo',
+    '/eapi/v1/mark': 'mark',
+    '/api/v3/ticker/price': 'spot',
+}
+MS_PER_DAY = 1000 * 60 * 60 * 24
+DAYS_PER_YEAR = 365.25
+
+
+def fixture_name(url):
+    path = urlparse(url).path
+    return FIXTURE_NAMES.get(path, path.rstrip('/').rsplit('/', 1)[-1])
+
+
+def _scoped(name, data, params):
+    # The spot ticker can be scoped to a symbols=[...] list, as the live endpoint can
+    if name == 'spot' and params and 'symbols' in params:
+        wanted = set(json.loads(params['symbols']))
+        return [item for item in data if item['symbol'] in wanted]
+    return data
+
+
+class ReplaySource:
+    """
+    Offline stand-in for AsyncHTTPClient that serves recorded exchange responses.
+    Each endpoint has a list of documents; every fetch returns the next one and the
+    last repeats, so a recording of several mark snapshots replays as the chain
+    moving, then standing still.
+    """
+
+    def __init__(self, fixtures):
+        """
+        :param fixtures: Mapping of fixture name ('exchangeInfo', 'mark', 'spot') to the
+            list of documents served in turn
+        """
+        self.fixtures = {name: list(documents) for name, documents in fixtures.items()}
+        self._positions = {name: 0 for name in self.fixtures}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_documents(cls, documents):
+        """
+        Serve one fixed document per endpoint, e.g. the output of synthetic_fixtures
+        """
+        return cls({name: [document] for name, document in documents.items()})
+
+    @classmethod
+    def from_directory(cls, path):
+        """
+        Load fixtures from <name>.json (one document) or <name>.jsonl (one document per line) files
+        """
+        fixtures = {}
+        for filename in sorted(os.listdir(path)):
+            name, extension = os.path.splitext(filename)
+            with open(os.path.join(path, filename)) as f:
+                if extension == '.json':
+                    fixtures[name] = [json.load(f)]
+                elif extension == '.jsonl':
+                    fixtures[name] = [json.loads(line) for line in f if line.strip()]
+        return cls(fixtures)
+
+    def fetch(self, url, params=None, timeout=None):
+        name = fixture_name(url)
+        with self._lock:
+            documents = self.fixtures.get(name)
+            if not documents:
+                raise KeyError(f"No replay fixture for {url}")
+            position = self._positions[name]
+            self._positions[name] = min(position + 1, len(documents) - 1)
+        return _scoped(name, documents[position], params)
+
+    def fetch_all(self, requests):
+        return [self.fetch(*request) for request in requests]
+
+    def close(self):
+        pass
+
+
+class RecordingSource:
+    """
+    Wraps a live source and appends every response to <directory>/<name>.jsonl, in
+    the format ReplaySource.from_directory loads.
+    """
+
+    def __init__(self, source, directory):
+        self.source = source
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _record(self, url, data):
+        with self._lock, open(os.path.join(self.directory, f"{fixture_name(url)}.jsonl"), 'a') as f:
+            f.write(json.dumps(data) + '\n')
+        return data
+
+    def fetch(self, url, params=None, timeout=None):
+        return self._record(url, self.source.fetch(url, params, timeout))
+
+    def fetch_all(self, requests):
+        requests = list(requests)
+        return [self._record(request[0], data) for request, data in zip(requests, self.source.fetch_all(requests))]
+
+    def close(self):
+        self.source.close()
+
+
+def synthetic_fixtures(n_strikes=50, expiry_days=(1, 7, 30, 90), assets=None, now=None, seed=0):
+    """
+    Generate exchangeInfo, mark and spot documents for a synthetic chain of any size.
+    Implied volatilities follow a raw SVI smile per expiry plus a little noise, and
+    mark prices are their Black-Scholes prices, so every slice is fittable.
+    :param n_strikes: Strikes per expiry (each listed as a call and a put)
+    :param expiry_days: Days to each expiry
+    :param assets: Mapping of asset to (underlying symbol, spot price), defaults to BTC and ETH
+    :param now: Current time in milliseconds, defaults to now
+    :param seed: Seed of the IV noise
+    :return: {'exchangeInfo': ..., 'mark': [...], 'spot': [...]}
+    """
+    assets = assets or {'BTC': ('BTCUSDT', 60000.0), 'ETH': ('ETHUSDT', 3000.0)}
+    now = int(time.time() * 1000) if now is None else now
+    rng = np.random.default_rng(seed)
+    rate = 0.02
+    option_symbols, marks = [], []
+    for asset, (underlying, spot) in assets.items():
+        for days in expiry_days:
+            # Listed expiries settle at 08:00 UTC
+            expiry = (now + days * MS_PER_DAY) // MS_PER_DAY * MS_PER_DAY + 8 * 60 * 60 * 1000
+            T = (expiry - now) / MS_PER_DAY / DAYS_PER_YEAR
+            label = time.strftime('%y%m%d', time.gmtime(expiry / 1000))
+            width = 4 * 0.6 * np.sqrt(T)
+            strikes = np.unique(np.round(spot * np.exp(np.linspace(-width, width, n_strikes)), 2))
+            k = np.log(spot * np.exp(rate * T) / strikes)
+            w = T * (0.25 + 0.3 * (-0.3 * k + np.sqrt(k**2 + 0.04)))
+            iv = np.sqrt(w / T) * (1 + 0.005 * rng.standard_normal(strikes.size))
+            for side in 'CP':
+                prices = black_scholes.price(spot, strikes, T, rate, iv, side)
+                for strike, price, vol in zip(strikes.tolist(), prices.tolist(), iv.tolist()):
+                    strike = np.format_float_positional(strike, trim='-')
+                    symbol = f"{asset}-{label}-{strike}-{side}"
+                    option_symbols.append({'symbol': symbol, 'expiryDate': expiry, 'strikePrice': strike,
+                                           'side': 'CALL' if side == 'C' else 'PUT', 'underlying': underlying})
+                    marks.append({'symbol': symbol, 'markPrice': f"{price:.4f}", 'markIV': f"{vol:.4f}",
+                                  'riskFreeInterest': str(rate)})
+    spot_prices = [{'symbol': underlying, 'price': str(spot)} for underlying, spot in assets.values()]
+    return {
+        'exchangeInfo': {'serverTime': now, 'optionSymbols': option_symbols},
+        'mark': marks,
+        'spot': spot_prices,
+    }
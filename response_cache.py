@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class CachedBody:
+    """
+    One serialized response body, with its gzip encoding produced on first request
+    """
+
+    __slots__ = ('etag', 'body', 'mimetype', '_gzipped', '_lock')
+
+    def __init__(self, etag, body, mimetype='application/json'):
+        self.etag = etag
+        self.body = body
+        self.mimetype = mimetype
+        self._gzipped = None
+        self._lock = threading.Lock()
+
+    def gzipped(self, compresslevel=6):
+        with self._lock:
+            if self._gzipped is None:
+                self._gzipped = gzip.compress(self.body, compresslevel)
+            return self._gzipped
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized responses.
+
+    Entries are keyed by endpoint, request parameters and the chain version they were
+    built from, so a body is encoded (and compressed) once per refresh no matter how
+    often it is polled. The same key yields the entity tag, so a client revalidating
+    with If-None-Match can be answered without touching the data at all.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+        # Versions count up independently in every worker process, so tags are salted
+        # to never match a body built by another process from different data
+        self._salt = os.urandom(8)
+        self.hits = 0
+        self.misses = 0
+
+    def etag(self, key):
+        """
+        Entity tag of a key, without quotes
+        :param key: Hashable tuple of endpoint, request parameters and data version
+        """
+        return hashlib.blake2b(repr(key).encode(), key=self._salt, digest_size=12).hexdigest()
+
+    def get(self, key):
+        """
+        :return: CachedBody, or None if the key is not cached
+        """
+        with self._lock:
+            entry = self._bodies.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._bodies.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, mimetype='application/json'):
+        """
+        Store a serialized body
+        :param body: Encoded bytes
+        :param mimetype: Media type of the body
+        :return: CachedBody
+        """
+        entry = CachedBody(self.etag(key), body, mimetype)
+        with self._lock:
+            self._bodies[key] = entry
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.maxsize:
+                self._bodies.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+
+    def __len__(self):
+        return len(self._bodies)
@@ -0,0 +1,150 @@
+import json
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+# Optional encoders: orjson speeds up JSON, msgpack and pyarrow add the binary formats.
+# A format is only offered to clients if its library is installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+MIMETYPE_FORMATS = {
+    JSON_MIMETYPE: 'json',
+    MSGPACK_MIMETYPE: 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    ARROW_MIMETYPE: 'arrow',
+}
+
+
+def _default(obj):
+    """
+    Encode what the encoders do not handle natively: NumPy arrays (text arrays with
+    orjson, every array otherwise) and NumPy scalars. NaN becomes null, as orjson does.
+    """
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'f':
+            return np.where(np.isnan(obj), None, obj).tolist()
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(obj, sort_keys=False):
+    """
+    Encode JSON with NumPy arrays written directly, through orjson if it is installed
+    :return: UTF-8 bytes
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, sort_keys=sort_keys).encode()
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by dumps_json, so jsonify and app.json.dumps take the
+    fast path too. Falls back to Flask's encoder if orjson is not installed.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return dumps_json(obj, kwargs.get('sort_keys', self.sort_keys)).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def available_formats():
+    """
+    :return: Response formats the installed libraries can encode, JSON first
+    """
+    formats = ['json']
+    if msgpack is not None:
+        formats.append('msgpack')
+    if pyarrow is not None:
+        formats.append('arrow')
+    return formats
+
+
+def negotiate(accept_mimetypes, supported=('json', 'msgpack', 'arrow')):
+    """
+    Pick a response format from the request's Accept header
+    :param accept_mimetypes: werkzeug MIMEAccept, i.e. request.accept_mimetypes
+    :param supported: Formats the endpoint can produce
+    :return: 'json', 'msgpack' or 'arrow'; JSON unless the client prefers an installed binary format
+    """
+    formats = [name for name in available_formats() if name in supported]
+    offered = [mimetype for mimetype, name in MIMETYPE_FORMATS.items() if name in formats]
+    return MIMETYPE_FORMATS[accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)]
+
+
+def _flat_columns(columns, prefix=''):
+    # Nested column groups such as greeks become 'greeks.delta', 'greeks.gamma', ...
+    flat = {}
+    for name, values in columns.items():
+        if isinstance(values, dict):
+            flat.update(_flat_columns(values, f"{prefix}{name}."))
+        else:
+            flat[prefix + name] = np.asarray(values)
+    return flat
+
+
+def encode_arrow(payload, tables, table_column=None):
+    """
+    Encode a payload as one Arrow IPC stream
+    :param payload: dict whose tables entries are column dicts; every other entry is
+        stored JSON-encoded in the schema metadata
+    :param tables: Keys of the column dicts, concatenated in order into one table
+    :param table_column: Column recording which key each row came from, e.g. 'side'
+    :return: bytes
+    """
+    parts = []
+    for key in tables:
+        if payload.get(key) is None:
+            continue
+        table = pyarrow.table(_flat_columns(payload[key]))
+        if table_column is not None:
+            table = table.append_column(table_column, pyarrow.array([key] * table.num_rows, pyarrow.string()))
+        parts.append(table)
+    table = pyarrow.concat_tables(parts) if parts else pyarrow.table({})
+    metadata = {key: dumps_json(value) for key, value in payload.items() if key not in tables}
+    table = table.replace_schema_metadata(metadata)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(payload, response_format, tables=(), table_column=None):
+    """
+    Serialize a response payload
+    :param response_format: 'json', 'msgpack' or 'arrow'
+    :param tables: For Arrow, the payload keys holding column dicts (see encode_arrow)
+    :param table_column: For Arrow, the column naming each row's table
+    :return: (body bytes, mimetype)
+    """
+    if response_format == 'msgpack':
+        return msgpack.packb(payload, default=_default, use_bin_type=True), MSGPACK_MIMETYPE
+    if response_format == 'arrow':
+        return encode_arrow(payload, tables, table_column), ARROW_MIMETYPE
+    return dumps_json(payload) + b'\n', JSON_MIMETYPE
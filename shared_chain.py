@@ -0,0 +1,247 @@
+import json
+import mmap
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from chain_store import ChainStore
+
+# Segment layout: a fixed header followed by the payload of the latest snapshot.
+#   header:  magic, sequence, chain version, writer instance, payload size
+#   payload: listing id, row count, listing JSON size, meta JSON size, listing JSON,
+#            meta JSON, then one 8-byte aligned array per SNAPSHOT_COLUMNS entry
+# The sequence is odd while the writer is copying a snapshot in and even once it is
+# complete (a seqlock), so readers retry instead of seeing a torn snapshot.
+MAGIC = b'VSCHAIN1'
+HEADER = struct.Struct('<8sQQQQ')
+HEADER_SIZE = 64
+SECTION = struct.Struct('<QQQQ')
+SNAPSHOT_COLUMNS = {
+    **{name: np.float64 for name in ChainStore.MARK_COLUMNS + ChainStore.TIME_COLUMNS},
+    'iv_status': np.int8,
+}
+
+
+def default_segment_path():
+    shm = '/dev/shm'
+    return os.path.join(shm if os.path.isdir(shm) else tempfile.gettempdir(), 'vol-surface-chain')
+
+
+def _aligned(size):
+    return (size + 7) & ~7
+
+
+class SharedChainWriter:
+    """
+    Publishes ChainStore snapshots into a memory-mapped file, so one poller process can
+    own market data ingestion while any number of request workers attach read-only.
+    The listing (symbols, strikes, expiries) is re-encoded only when it changes; each
+    publish otherwise copies the snapshot's columns in.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: Segment file, defaults to default_segment_path()
+        """
+        self.path = path or default_segment_path()
+        # Identifies this writer, so readers notice a restarted poller whose versions start over
+        self.instance = random.getrandbits(63)
+        # A fresh file swapped into place: truncating the old one under readers that still
+        # map it would crash them, while a replaced file stays valid until they reopen
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        self._fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self._mm = None
+        self._ensure_capacity(HEADER_SIZE)
+        os.replace(temp_path, self.path)
+        self._seq = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._listing_symbols = None
+        self._listing_id = 0
+        self._listing = b''
+
+    def _ensure_capacity(self, size):
+        if self._mm is not None and len(self._mm) >= size:
+            return
+        capacity = max(size, 2 * len(self._mm) if self._mm is not None else 0, mmap.PAGESIZE)
+        os.ftruncate(self._fd, capacity)
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mmap.mmap(self._fd, capacity)
+
+    def _encode_listing(self, chain):
+        names = chain.underlying_names
+        return json.dumps({
+            'symbol': chain.symbols.tolist(),
+            'expiryDate': chain.expiry.tolist(),
+            'strikePrice': chain.strike_price.tolist(),
+            'underlying': [names[i] for i in chain.underlying_idx.tolist()],
+        }).encode()
+
+    def publish(self, chain, meta):
+        """
+        Write a snapshot into the segment
+        :param chain: ChainStore snapshot
+        :param meta: JSON-serializable dict published alongside it (spot prices, update times)
+        :return: False if a newer snapshot was already published
+        """
+        with self._lock:
+            if self._version is not None and chain.version < self._version:
+                return False
+            self._write(chain, meta)
+            self._version = chain.version
+            return True
+
+    def _write(self, chain, meta):
+        if chain.symbols is not self._listing_symbols:
+            # Snapshots share the listing arrays until the listing itself changes
+            self._listing_symbols = chain.symbols
+            self._listing_id += 1
+            self._listing = self._encode_listing(chain)
+        meta_bytes = json.dumps(meta).encode()
+        columns_offset = _aligned(SECTION.size + len(self._listing) + len(meta_bytes))
+        size = columns_offset + sum(_aligned(chain.size * np.dtype(dtype).itemsize)
+                                    for dtype in SNAPSHOT_COLUMNS.values())
+        self._ensure_capacity(HEADER_SIZE + size)
+        mm = self._mm
+
+        self._seq += 1
+        HEADER.pack_into(mm, 0, MAGIC, self._seq, chain.version, self.instance, size)
+        offset = HEADER_SIZE
+        SECTION.pack_into(mm, offset, self._listing_id, chain.size, len(self._listing), len(meta_bytes))
+        offset += SECTION.size
+        mm[offset:offset + len(self._listing)] = self._listing
+        offset += len(self._listing)
+        mm[offset:offset + len(meta_bytes)] = meta_bytes
+        offset = HEADER_SIZE + columns_offset
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            data = np.ascontiguousarray(getattr(chain, name), dtype=dtype).tobytes()
+            mm[offset:offset + len(data)] = data
+            offset += _aligned(len(data))
+        self._seq += 1
+        HEADER.pack_into(mm, 0, MAGIC, self._seq, chain.version, self.instance, size)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class SharedChainReader:
+    """
+    Read-only view of a segment published by SharedChainWriter. Each load copies the
+    payload out once and rebuilds a ChainStore snapshot from it, reusing the previous
+    snapshot's listing when it has not changed.
+    """
+
+    def __init__(self, path=None, retries=100):
+        """
+        :param path: Segment file, defaults to default_segment_path()
+        :param retries: Attempts to get a consistent copy while the writer is busy
+        """
+        self.path = path or default_segment_path()
+        self.retries = retries
+        self._fd = None
+        self._mm = None
+        self._instance = None
+        self._listing_id = None
+        self._base = None
+
+    def _map(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+        if self._fd is not None and os.fstat(self._fd).st_ino != inode:
+            # The poller restarted and swapped in a new segment
+            self.close()
+        if self._fd is None:
+            try:
+                self._fd = os.open(self.path, os.O_RDONLY)
+            except FileNotFoundError:
+                return None
+        size = os.fstat(self._fd).st_size
+        if size < HEADER_SIZE:
+            return None
+        if self._mm is None or len(self._mm) < size:
+            if self._mm is not None:
+                self._mm.close()
+            self._mm = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def header(self):
+        """
+        :return: (sequence, version, instance, payload size), or None if nothing was published yet
+        """
+        mm = self._map()
+        if mm is None:
+            return None
+        magic, seq, version, instance, size = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or seq == 0:
+            return None
+        return seq, version, instance, size
+
+    def _read_payload(self):
+        for _ in range(self.retries):
+            header = self.header()
+            if header is None:
+                return None
+            seq, version, instance, size = header
+            if seq % 2 == 0:
+                if HEADER_SIZE + size > len(self._mm):
+                    # Segment grew since it was mapped
+                    self._mm.close()
+                    self._mm = None
+                    continue
+                payload = self._mm[HEADER_SIZE:HEADER_SIZE + size]
+                if HEADER.unpack_from(self._mm, 0)[1] == seq:
+                    return version, instance, payload
+            time.sleep(0.001)
+        raise RuntimeError(f"No consistent snapshot in {self.path} after {self.retries} attempts")
+
+    def load(self, chain=None):
+        """
+        Copy the published snapshot out of the segment
+        :param chain: Snapshot loaded previously; nothing is copied if it is still current
+        :return: (ChainStore, meta), or None if nothing newer than chain was published
+        """
+        header = self.header()
+        if header is None:
+            return None
+        if chain is not None and header[1:3] == (chain.version, self._instance):
+            return None
+        read = self._read_payload()
+        if read is None:
+            return None
+        version, instance, payload = read
+        listing_id, n, listing_size, meta_size = SECTION.unpack_from(payload, 0)
+        offset = SECTION.size
+        if instance != self._instance or listing_id != self._listing_id:
+            listing = json.loads(payload[offset:offset + listing_size])
+            option_symbols = [dict(zip(listing, values)) for values in zip(*listing.values())]
+            self._base = ChainStore(option_symbols, 0)
+            self._instance, self._listing_id = instance, listing_id
+        offset += listing_size
+        meta = json.loads(payload[offset:offset + meta_size])
+        offset = _aligned(offset + meta_size)
+        columns = {}
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            columns[name] = np.frombuffer(payload, dtype=dtype, count=n, offset=offset)
+            offset += _aligned(n * np.dtype(dtype).itemsize)
+        return self._base.with_columns(version, meta.get('spot_prices', {}), meta.get('as_of'), **columns), meta
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
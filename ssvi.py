@@ -0,0 +1,215 @@
+import numpy as np
+from scipy.optimize import minimize
+
+# Surface SVI (Gatheral and Jacquier, 2014): every expiry shares one (rho, eta, gamma)
+# set and is indexed by its ATM total variance theta,
+#     w(k, theta) = theta/2 * (1 + rho*phi*k + sqrt((phi*k + rho)**2 + 1 - rho**2))
+# with the power-law curvature phi(theta) = eta / (theta**gamma * (1 + theta)**(1 - gamma)).
+# Extended SSVI (Hendriks and Martini, 2019) lets rho move linearly in theta from rho_0 at
+# the shortest listed expiry to rho_1 at the longest.
+
+MIN_GAMMA = 0.01
+MAX_GAMMA = 0.5
+
+
+def power_law_phi(theta, eta, gamma):
+    return eta / (theta**gamma * (1 + theta)**(1 - gamma))
+
+
+def total_variance(k, theta, rho, phi):
+    """
+    SSVI total implied variance. All arguments broadcast.
+    """
+    return theta / 2 * (1 + rho * phi * k + np.sqrt((phi * k + rho)**2 + 1 - rho**2))
+
+
+def atm_total_variance(k, w):
+    """
+    ATM (k = 0) total variance of a slice, interpolated linearly between the nearest quotes
+    """
+    order = np.argsort(k)
+    return float(np.interp(0.0, k[order], w[order]))
+
+
+class SSVISurface:
+    """
+    Calibrated SSVI or eSSVI surface. Total variance at any (k, T) is a closed-form
+    evaluation; theta is interpolated linearly in T between the listed expiries.
+    """
+
+    def __init__(self, params, expiry_times, thetas, extended=False):
+        """
+        :param params: (rho, eta, gamma) for SSVI or (rho_0, rho_1, eta, gamma) for eSSVI
+        :param expiry_times: Listed times to expiry in years, increasing
+        :param thetas: ATM total variance at each listed expiry, non-decreasing
+        :param extended: Whether params are eSSVI parameters
+        """
+        self.params = np.asarray(params, dtype=np.float64)
+        self.expiry_times = np.asarray(expiry_times, dtype=np.float64)
+        self.thetas = np.asarray(thetas, dtype=np.float64)
+        self.extended = extended
+
+    @property
+    def eta(self):
+        return self.params[-2]
+
+    @property
+    def gamma(self):
+        return self.params[-1]
+
+    def theta(self, T):
+        """
+        ATM total variance at arbitrary maturities: linear in T between listed expiries,
+        proportional to T before the first and extrapolated along the last segment after
+        the last one, so it stays non-decreasing.
+        """
+        T = np.asarray(T, dtype=np.float64)
+        times, thetas = self.expiry_times, self.thetas
+        if times.size == 1:
+            return thetas[0] * T / times[0]
+        slope = (thetas[-1] - thetas[-2]) / (times[-1] - times[-2])
+        return np.where(T < times[0], thetas[0] * T / times[0],
+                        np.where(T > times[-1], thetas[-1] + slope * (T - times[-1]), np.interp(T, times, thetas)))
+
+    def rho(self, theta):
+        if not self.extended:
+            return np.full_like(np.asarray(theta, dtype=np.float64), self.params[0])
+        return _interpolated_rho(theta, self.params[0], self.params[1], self.thetas[0], self.thetas[-1])
+
+    def phi(self, theta):
+        return power_law_phi(theta, self.eta, self.gamma)
+
+    def total_variance(self, k, T):
+        """
+        Total implied variance on any (k, T) points. k and T broadcast, so
+        total_variance(k[None, :], T[:, None]) gives a whole grid.
+        """
+        theta = self.theta(T)
+        return total_variance(k, theta, self.rho(theta), self.phi(theta))
+
+    def implied_volatility(self, k, T):
+        return np.sqrt(self.total_variance(k, T) / np.asarray(T, dtype=np.float64))
+
+    def raw_params(self, T):
+        """
+        Equivalent raw SVI parameters (a, b, rho, m, sigma) of the slice at maturity T
+        """
+        theta = float(self.theta(T))
+        rho = float(self.rho(theta))
+        phi = float(self.phi(theta))
+        return np.array([theta / 2 * (1 - rho**2), theta * phi / 2, rho, -rho / phi, np.sqrt(1 - rho**2) / phi])
+
+    def to_dict(self):
+        names = ('rho0', 'rho1', 'eta', 'gamma') if self.extended else ('rho', 'eta', 'gamma')
+        return {
+            'params': dict(zip(names, self.params.tolist())),
+            'expiryTimes': self.expiry_times.tolist(),
+            'thetas': self.thetas.tolist(),
+            'extended': self.extended,
+        }
+
+
+def _interpolated_rho(theta, rho_0, rho_1, theta_min, theta_max):
+    if theta_max <= theta_min:
+        return np.full_like(np.asarray(theta, dtype=np.float64), rho_0)
+    s = np.clip((np.asarray(theta) - theta_min) / (theta_max - theta_min), 0, 1)
+    return rho_0 + (rho_1 - rho_0) * s
+
+
+def fit_ssvi(k_slices, w_slices, expiry_times, extended=False, initial_guess=None):
+    """
+    Calibrate one SSVI (or eSSVI) parameter set to every slice of an asset at once.
+
+    theta is taken from the data (ATM total variance of each slice, made non-decreasing
+    in T) and (rho, eta, gamma) are fitted with SLSQP under the Gatheral-Jacquier
+    condition eta * (1 + |rho|) <= 2 with gamma <= 1/2, which rules out butterfly
+    arbitrage. For eSSVI the Hendriks-Martini condition
+    |rho_2 psi_2 - rho_1 psi_1| <= psi_2 - psi_1 with psi = theta * phi is also imposed
+    between consecutive expiries to rule out calendar arbitrage.
+    :param k_slices: Log-moneyness array per expiry
+    :param w_slices: Total implied variance array per expiry
+    :param expiry_times: Time to expiry of each slice in years
+    :param extended: Fit eSSVI instead of SSVI
+    :param initial_guess: Optional starting parameters, e.g. the previous calibration
+    :return: SSVISurface, or None if there is no usable slice or the fit fails
+    """
+    slices = []
+    for T, k, w in zip(expiry_times, k_slices, w_slices):
+        k, w = np.asarray(k, dtype=np.float64), np.asarray(w, dtype=np.float64)
+        usable = np.isfinite(k) & np.isfinite(w) & (w > 0)
+        if T > 0 and usable.any():
+            slices.append((float(T), k[usable], w[usable]))
+    if not slices:
+        return None
+    slices.sort(key=lambda x: x[0])
+    times = np.array([T for T, _, _ in slices])
+    thetas = np.maximum.accumulate([atm_total_variance(k, w) for _, k, w in slices])
+    if thetas[0] <= 0:
+        return None
+
+    k = np.concatenate([k for _, k, _ in slices])
+    w = np.concatenate([w for _, _, w in slices])
+    point_theta = np.repeat(thetas, [k.size for _, k, _ in slices])
+    # Weight every slice equally, relative to its own variance level
+    weights = np.concatenate([np.full(k.size, 1 / (k.size * np.mean(w**2))) for _, k, w in slices])
+    log_ratio = np.log((1 + point_theta) / point_theta)
+    theta_min, theta_max = thetas[0], thetas[-1]
+    spread = (point_theta - theta_min) / (theta_max - theta_min) if theta_max > theta_min else np.zeros_like(k)
+
+    def unpack(p):
+        if extended:
+            return p[0], p[1], p[2], p[3]
+        return p[0], p[0], p[1], p[2]
+
+    def objective(p):
+        rho_0, rho_1, eta, gamma = unpack(p)
+        rho = rho_0 + (rho_1 - rho_0) * spread
+        phi = power_law_phi(point_theta, eta, gamma)
+        x = phi * k + rho
+        root = np.sqrt(x**2 + 1 - rho**2)
+        residuals = point_theta / 2 * (1 + rho * phi * k + root) - w
+        # Partial derivatives of w w.r.t. rho and phi, then chained to the parameters
+        dw_drho = point_theta / 2 * (phi * k + phi * k / root)
+        dw_dphi = point_theta / 2 * (rho * k + x * k / root)
+        grad_residual = weights * residuals
+        d_eta = 2 * grad_residual @ (dw_dphi * phi / eta)
+        d_gamma = 2 * grad_residual @ (dw_dphi * phi * log_ratio)
+        if extended:
+            d_rho_0 = 2 * grad_residual @ (dw_drho * (1 - spread))
+            d_rho_1 = 2 * grad_residual @ (dw_drho * spread)
+            gradient = np.array([d_rho_0, d_rho_1, d_eta, d_gamma])
+        else:
+            gradient = np.array([2 * grad_residual @ dw_drho, d_eta, d_gamma])
+        return np.sum(weights * residuals**2), gradient
+
+    def butterfly_constraint(p):
+        rho_0, rho_1, eta, _ = unpack(p)
+        return np.array([2 - eta * (1 + abs(rho_0)), 2 - eta * (1 + abs(rho_1))])
+
+    def calendar_constraint(p):
+        rho_0, rho_1, eta, gamma = unpack(p)
+        rho = _interpolated_rho(thetas, rho_0, rho_1, theta_min, theta_max)
+        psi = thetas * power_law_phi(thetas, eta, gamma)
+        return np.diff(psi) - np.abs(np.diff(rho * psi))
+
+    rho_bounds = (-0.999, 0.999)
+    bounds = [rho_bounds] * (2 if extended else 1) + [(1e-4, 2.0), (MIN_GAMMA, MAX_GAMMA)]
+    constraints = [{'type': 'ineq', 'fun': butterfly_constraint}]
+    if extended and thetas.size > 1:
+        constraints.append({'type': 'ineq', 'fun': calendar_constraint})
+
+    if initial_guess is None:
+        if extended:
+            # Start eSSVI from the SSVI calibration, with a flat rho
+            surface = fit_ssvi(k_slices, w_slices, expiry_times)
+            rho, eta, gamma = surface.params if surface is not None else (0.0, 1.0, 0.4)
+            initial_guess = [rho, rho, eta, gamma]
+        else:
+            initial_guess = [0.0, 1.0, 0.4]
+    initial_guess = np.clip(initial_guess, [b[0] for b in bounds], [b[1] for b in bounds])
+
+    result = minimize(objective, initial_guess, jac=True, method='SLSQP', bounds=bounds,
+                      constraints=constraints, options={'maxiter': 500, 'ftol': 1e-10})
+    if not result.success and any(np.any(c['fun'](result.x) < -1e-8) for c in constraints):
+        return None
+    return SSVISurface(result.x, times, thetas, extended)
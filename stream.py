@@ -0,0 +1,168 @@
+import json
+import queue
+import threading
+
+import numpy as np
+
+# Streamed fields: JSON name -> ChainStore column
+STREAM_FIELDS = {
+    'markPrice': 'mark_price',
+    'impliedVolatility': 'mark_iv',
+    'solvedImpliedVolatility': 'solved_iv',
+    'moneyness': 'moneyness',
+    'logMoneyness': 'log_moneyness',
+}
+
+
+def sse_event(event, data):
+    """
+    Format one Server-Sent Events message
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def json_column(values):
+    """
+    Column as a JSON-safe list, NaN -> None
+    """
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+class Subscription:
+    """
+    One client's queue of pre-serialized SSE messages. A None entry tells the reader
+    it fell behind and should resynchronize from a fresh snapshot.
+    """
+
+    def __init__(self, key, maxsize):
+        self.key = key
+        self.queue = queue.Queue(maxsize)
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Slow client: drop everything queued and ask it to resync
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                # Another publisher refilled it first; the reader will still resync later
+                pass
+
+    def get(self, timeout=None):
+        """
+        :return: Next message, or None if the client must resync
+        :raises queue.Empty: If nothing arrived within timeout
+        """
+        return self.queue.get(timeout=timeout)
+
+
+class UpdateBroadcaster:
+    """
+    Fans chain and SVI updates out to streaming subscribers. Each refresh is diffed once
+    per subscribed (asset, expiry, side) slice against what was last sent for it, and the
+    serialized message is shared by every subscriber of that slice.
+    """
+
+    def __init__(self, queue_size=64):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._last_sent = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, asset, expiry, side):
+        subscription = Subscription((asset, expiry, side), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(subscription.key, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.key, None)
+                self._last_sent.pop(subscription.key, None)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def snapshot(self, chain, key):
+        """
+        Full current state of a slice, sent when a client connects or resyncs
+        :return: SSE message, or None if the slice does not exist
+        """
+        rows = chain.locate(*key)
+        if rows is None:
+            return None
+        data = {'version': chain.version, 'symbol': chain.symbols[rows].tolist()}
+        for name, column in STREAM_FIELDS.items():
+            data[name] = json_column(getattr(chain, column)[rows])
+        return sse_event('snapshot', data)
+
+    def publish_chain(self, chain):
+        """
+        Push the fields that changed since the last refresh to every subscriber. Chains are
+        published from several threads (REST refresh jobs, the stream flush), so each one is
+        diffed against what was last sent, recorded and queued under the lock.
+        :param chain: ChainStore snapshot just published
+        """
+        with self._lock:
+            for key, subscribers in self._subscribers.items():
+                rows = chain.locate(*key)
+                if rows is None:
+                    continue
+                symbols = chain.symbols[rows]
+                current = {name: getattr(chain, column)[rows] for name, column in STREAM_FIELDS.items()}
+                last = self._last_sent.get(key)
+                self._last_sent[key] = {'symbol': symbols, **current}
+                if last is None or not np.array_equal(last['symbol'], symbols):
+                    # First refresh for this slice, or the listed options changed
+                    message = self.snapshot(chain, key)
+                else:
+                    message = self._diff_message(chain.version, symbols, current, last)
+                if message is None:
+                    continue
+                for subscription in subscribers:
+                    subscription.put(message)
+
+    @staticmethod
+    def _diff_message(version, symbols, current, last):
+        changed = {
+            name: ~((values == last[name]) | (np.isnan(values) & np.isnan(last[name])))
+            for name, values in current.items()
+        }
+        rows = np.flatnonzero(np.logical_or.reduce(list(changed.values())))
+        if rows.size == 0:
+            return None
+        updates = [{'symbol': symbol} for symbol in symbols[rows].tolist()]
+        for name, mask in changed.items():
+            values = json_column(current[name][rows])
+            for update, is_changed, value in zip(updates, mask[rows].tolist(), values):
+                if is_changed:
+                    update[name] = value
+        return sse_event('chain', {'version': version, 'updates': updates})
+
+    def publish_svi(self, version, results):
+        """
+        Push newly fitted SVI parameters to subscribers of the fitted slices
+        :param results: Mapping of (asset, expiry, side, parameterization_type) to params
+        """
+        by_slice = {}
+        for (asset, expiry, side, parameterization_type), params in results.items():
+            if params is not None:
+                by_slice.setdefault((asset, expiry, side), {})[parameterization_type] = np.asarray(params).tolist()
+        with self._lock:
+            targets = {key: list(subscribers) for key, subscribers in self._subscribers.items() if key in by_slice}
+        for key, subscribers in targets.items():
+            message = sse_event('svi', {'version': version, 'params': by_slice[key]})
+            for subscription in subscribers:
+                subscription.put(message)
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+
+class SVIFitCache:
+    """
+    Bounded LRU cache of fitted SVI parameters.
+
+    Entries are keyed by (asset, expiry, side, parameterization, data version), so a
+    fit is reused until the chain it was computed from changes. The most recent
+    parameters of every slice are also kept (regardless of version) to warm-start
+    the next fit once the data moves on.
+    """
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._fits = OrderedDict()
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, asset, expiry, side, parameterization_type, version):
+        """
+        Look up a cached fit
+        :return: (hit, params); params may be None for a cached failed fit
+        """
+        key = (asset, expiry, side, parameterization_type, version)
+        with self._lock:
+            if key in self._fits:
+                self._fits.move_to_end(key)
+                self.hits += 1
+                return True, self._fits[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, asset, expiry, side, parameterization_type, version, params):
+        """
+        Store a fit for a data version. Failed fits (None) are cached too, so they
+        are not retried until the data changes, but never used as a warm start.
+        """
+        key = (asset, expiry, side, parameterization_type, version)
+        with self._lock:
+            self._fits[key] = params
+            self._fits.move_to_end(key)
+            self._evict(self._fits)
+            if params is not None:
+                slice_key = key[:4]
+                self._latest[slice_key] = params
+                self._latest.move_to_end(slice_key)
+                self._evict(self._latest)
+
+    def put_many(self, version, results):
+        """
+        Publish a batch of fits for one data version under a single lock, so readers
+        see either none or all of them.
+        :param results: Mapping of (asset, expiry, side, parameterization_type) to params
+        """
+        with self._lock:
+            for slice_key, params in results.items():
+                key = (*slice_key, version)
+                self._fits[key] = params
+                self._fits.move_to_end(key)
+                if params is not None:
+                    self._latest[slice_key] = params
+                    self._latest.move_to_end(slice_key)
+            self._evict(self._fits)
+            self._evict(self._latest)
+
+    def warm_start(self, asset, expiry, side, parameterization_type):
+        """
+        Most recent successful parameters for a slice, from any data version
+        :return: Parameters, or None if the slice has never been fit
+        """
+        with self._lock:
+            return self._latest.get((asset, expiry, side, parameterization_type))
+
+    def clear(self):
+        with self._lock:
+            self._fits.clear()
+            self._latest.clear()
+
+    def _evict(self, entries):
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
@@ -0,0 +1,442 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from svi_no_arbitrage import SVINoArbitrage
+from svi_parameterizations import jw_to_raw, raw_to_jw, raw_to_natural, to_raw
+
+# Slice-level SVI fits that only depend on (k, total variance) arrays, so they can
+# run in worker processes as well as in the request thread.
+
+PARAMETERIZATION_TYPES = ('raw', 'quasi_explicit', 'natural', 'jw')
+# How the points of a slice are weighted in fits, see slice_weights
+SLICE_WEIGHTINGS = ('equal', 'vega')
+# Bounds of the natural SVI parameters delta, mu, rho, omega, zeta
+NATURAL_BOUNDS = ([-np.inf, -np.inf, -0.999, 0, 0.001],
+                  [np.inf, np.inf, 0.999, np.inf, np.inf])
+# The multi-start search stops early once a start's RMSE is within this fraction of the
+# mean total variance, and a start has converged once an iteration improves its squared
+# error by less than NATURAL_FTOL
+NATURAL_TARGET_RELATIVE_RMSE = 1e-4
+NATURAL_FTOL = 1e-10
+NATURAL_MAX_ITER = 200
+# After NATURAL_PRUNE_AFTER iterations, starts whose RMSE is more than NATURAL_PRUNE_RATIO
+# times the best valid start's are dropped instead of iterated to convergence
+NATURAL_PRUNE_AFTER = 10
+NATURAL_PRUNE_RATIO = 2.0
+# Weight of the penalty on relative changes of the SVI-JW parameters of a warm-started
+# fit: a 10% change of one parameter costs as much as an RMSE of
+# JW_REGULARIZATION / 10 of the mean total variance
+JW_REGULARIZATION = 1e-2
+# Smallest parameter scale the relative changes are measured against, as psi is often near 0
+JW_MIN_SCALE = 1e-2
+# Bounds of the SVI-JW parameters v, psi, p, c, v_tilde
+JW_BOUNDS = ([1e-8, -np.inf, 1e-8, 1e-8, 0],
+             [np.inf, np.inf, np.inf, np.inf, np.inf])
+
+# How a slice fit went, returned next to the parameters so fits run in worker processes
+# can be reported by the parent. outcome is 'converged', 'fallback' (SLSQP failed and the
+# least squares fallback was used, or a warm-started SVI-JW fit was rejected and the
+# slice refitted from scratch), 'unconverged' (the optimizer hit its iteration limit),
+# 'rejected' (failed the no-arbitrage check) or 'failed'; iterations is None where the
+# optimizer does not report them.
+FitReport = namedtuple('FitReport', ['outcome', 'iterations', 'seconds'])
+
+
+def raw_svi(k, a, b, rho, m, sigma):
+    """
+    k = log moneyness
+    returns: total implied variance (implied vol**2)*time to expiry
+    """
+    return a + b * (rho * (k - m) + np.sqrt((k - m)**2 + sigma**2))
+
+
+def natural_svi(k, delta, mu, rho, omega, zeta):
+    return delta + (omega/2) * (1 + (zeta*rho*(k - mu)) + np.sqrt((zeta*(k-mu) + rho) ** 2 + (1 - rho**2)))
+
+
+def slice_weights(weighting, k, total_implied_variances):
+    """
+    Weights of each point's squared error in a slice fit, with mean 1
+    :param weighting: 'equal', or 'vega' to weight points by their Black-Scholes vega, which
+        favours the liquid strikes near the money over the far wings
+    :return: Array of weights, or None for equal weights
+    """
+    if weighting == 'equal':
+        return None
+    if weighting == 'vega':
+        # Vega is proportional to the normal density of d1 = (k + w/2) / sqrt(w) within a slice
+        w = np.asarray(total_implied_variances, dtype=np.float64)
+        d1 = (np.asarray(k, dtype=np.float64) + w / 2) / np.sqrt(w)
+        vega = np.exp(-0.5 * d1**2)
+        return vega / np.mean(vega)
+    raise ValueError(f"Unknown slice weighting {weighting!r}")
+
+
+def validate_no_arbitrage(params, k_data):
+    """
+    Validate that raw SVI parameters satisfy no-arbitrage conditions.
+    :param params: Raw SVI parameters a, b, rho, m, sigma
+    :param k_data: Log-moneyness of the fitted slice, sets the range checked
+    :return: (is_valid, message)
+    """
+    a, b, rho, m, sigma = params
+
+    # Check basic constraints
+    if b < 0:
+        return False, "b must be non-negative"
+    if abs(rho) >= 1:
+        return False, "|rho| must be < 1"
+    if sigma <= 0:
+        return False, "sigma must be positive"
+
+    # Check b(1 + |rho|) <= 4
+    if b * (1 + abs(rho)) > 4:
+        return False, "b(1 + |rho|) > 4 violates no-arbitrage"
+
+    # Check minimum variance
+    w_min = a + b * sigma * np.sqrt(1 - rho**2)
+    if w_min < 0:
+        return False, "Minimum total variance is negative"
+
+    # Check butterfly arbitrage at sample points
+    k_test = np.linspace(np.min(k_data) - 1, np.max(k_data) + 1, 50)
+    w = raw_svi(k_test, a, b, rho, m, sigma)
+    if np.any(w < 0):
+        return False, f"Negative total variance at k={k_test[np.argmax(w < 0)]}"
+
+    return True, "No arbitrage violations detected"
+
+
+def fit_raw_report(k, total_implied_variances, initial_guess=None, lower_bound=None, weights=None):
+    """
+    Raw SVI fit with SLSQP under no-arbitrage constraints.
+    :param lower_bound: Optional (k, w) arrays the fitted total variance must stay above
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: (params, FitReport); params are a, b, rho, m, sigma, or None if they violate no-arbitrage
+    """
+    started = time.perf_counter()
+    fitter = SVINoArbitrage()
+    params = fitter.constrained_svi_fit(k, total_implied_variances, initial_guess, lower_bound=lower_bound,
+                                        weights=weights)
+    result = fitter.last_result
+    outcome = 'converged' if result.success else 'fallback'
+    is_valid, message = validate_no_arbitrage(params, k)
+    if not is_valid:
+        params, outcome = None, 'rejected'
+    return params, FitReport(outcome, int(result.nit), time.perf_counter() - started)
+
+
+def fit_raw(k, total_implied_variances, initial_guess=None, lower_bound=None, weights=None):
+    """
+    Raw SVI fit with SLSQP under no-arbitrage constraints.
+    :param lower_bound: Optional (k, w) arrays the fitted total variance must stay above
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: Parameters a, b, rho, m, sigma, or None if they violate no-arbitrage
+    """
+    return fit_raw_report(k, total_implied_variances, initial_guess, lower_bound, weights)[0]
+
+
+def fit_quasi_explicit_report(k, total_implied_variances, initial_guess=None, weights=None):
+    """
+    Raw SVI fit with the quasi-explicit method.
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: (params, FitReport); params are a, b, rho, m, sigma, or None if they violate no-arbitrage
+    """
+    started = time.perf_counter()
+    fitter = SVINoArbitrage()
+    params = fitter.quasi_explicit_svi_fit(k, total_implied_variances, initial_guess, weights)
+    result = fitter.last_result
+    outcome = 'converged' if result.success else 'unconverged'
+    is_valid, message = validate_no_arbitrage(params, k)
+    if not is_valid:
+        params, outcome = None, 'rejected'
+    return params, FitReport(outcome, int(result.nit), time.perf_counter() - started)
+
+
+def fit_quasi_explicit(k, total_implied_variances, initial_guess=None, weights=None):
+    """
+    Raw SVI fit with the quasi-explicit method.
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: Parameters a, b, rho, m, sigma, or None if they violate no-arbitrage
+    """
+    return fit_quasi_explicit_report(k, total_implied_variances, initial_guess, weights)[0]
+
+
+def natural_svi_jacobian(k, delta, mu, rho, omega, zeta):
+    """
+    Natural SVI total variance and its partial derivatives. Parameters may be column
+    vectors, to evaluate several parameter sets at once.
+    :return: (w, dw) where dw stacks d/d(delta, mu, rho, omega, zeta) on a trailing axis
+    """
+    x = zeta * (k - mu)
+    root = np.sqrt((x + rho)**2 + 1 - rho**2)
+    inner = 1 + rho * x + root
+    w = delta + omega / 2 * inner
+    dw_dx = omega / 2 * (rho + (x + rho) / root)
+    dw = np.stack(np.broadcast_arrays(
+        1.0,
+        -zeta * dw_dx,
+        omega / 2 * (x + x / root),
+        inner / 2,
+        (k - mu) * dw_dx,
+    ), axis=-1)
+    return w, dw
+
+
+def natural_starts(k, total_implied_variances, initial_guess=None, weights=None):
+    """
+    Starting points of the natural SVI search: the previous fit, a quick quasi-explicit raw
+    fit and the raw heuristic guess converted to natural parameters, and generic guesses
+    :return: Array of shape (n_starts, 5)
+    """
+    starts = []
+    if initial_guess is not None:
+        starts.append(initial_guess)
+    fitter = SVINoArbitrage()
+    # Quick raw fit: the exact (a, b, rho) solution at the best point of a coarse (m, sigma)
+    # grid, as quasi_explicit_svi_fit starts from, without its Nelder-Mead refinement
+    grid = [(m, sigma) for m in np.linspace(k.min(), k.max(), 7) for sigma in np.geomspace(0.01, 1, 5)]
+    quick = min((fitter.quasi_explicit_inner_fit(k, total_implied_variances, m, sigma, weights) for m, sigma in grid),
+                key=lambda fit: fit[0])[1]
+    for raw in (quick, fitter.initial_raw_guess(k, total_implied_variances)):
+        natural = raw_to_natural(raw)
+        if np.all(np.isfinite(natural)):
+            starts.append(natural)
+    starts += [
+        [total_implied_variances.mean(), k.mean(), 0.0, 0.5, 0.1],
+        [np.median(total_implied_variances), 0.0, 0.0, 0.3, 0.1],
+        [total_implied_variances[len(total_implied_variances)//2], k.mean(), -0.3, 0.8, 0.2],
+    ]
+    return np.clip(np.array(starts, dtype=np.float64), *NATURAL_BOUNDS)
+
+
+def multistart_natural_fit(k, total_implied_variances, starts, target_rmse=None, max_iter=NATURAL_MAX_ITER,
+                           weights=None):
+    """
+    Least squares natural SVI fit from several starts at once: one vectorized, bounded
+    Levenberg-Marquardt iteration advances every start, so adding starts costs array
+    width rather than more optimizer runs. Starts falling well behind the best one are
+    dropped after a few iterations, and the search stops once the best start has
+    converged, or early once it reaches target_rmse.
+    :param starts: Array of shape (n_starts, 5)
+    :param target_rmse: Root mean squared error in total variance that is good enough to stop at
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: (params, rmse, iterations, converged) of the best start with positive total
+        variance at every quote, params None if there is none. converged is True if that start
+        reached target_rmse or stopped improving, False if max_iter cut it short.
+    """
+    k = np.asarray(k, dtype=np.float64)
+    w = np.asarray(total_implied_variances, dtype=np.float64)
+    root = np.ones_like(w) if weights is None else np.sqrt(np.asarray(weights, dtype=np.float64))
+    lower, upper = (np.asarray(bound) for bound in NATURAL_BOUNDS)
+    params = np.clip(np.asarray(starts, dtype=np.float64), lower, upper)
+    damping = np.full(len(params), 1e-3)
+    done = np.zeros(len(params), dtype=bool)
+    # Done because they stopped improving rather than because they were pruned
+    converged = np.zeros(len(params), dtype=bool)
+
+    def evaluate(p):
+        w_model, dw = natural_svi_jacobian(k, *(p[:, i, None] for i in range(5)))
+        residuals = (w_model - w) * root
+        dw = dw * root[:, None]
+        with np.errstate(invalid='ignore'):
+            cost = np.where(np.isfinite(residuals).all(axis=1), np.sum(residuals**2, axis=1), np.inf)
+        return w_model, dw, residuals, cost
+
+    w_model, dw, residuals, cost = evaluate(params)
+    iterations = 0
+    while iterations < max_iter and not done.all():
+        iterations += 1
+        jtj = np.einsum('sni,snj->sij', dw, dw)
+        gradient = np.einsum('sni,sn->si', dw, residuals)
+        # Marquardt scaling: damp each parameter in proportion to its curvature
+        system = jtj + damping[:, None, None] * (jtj * np.eye(5) + 1e-12 * np.eye(5))
+        step = -np.linalg.solve(system, gradient[..., None])[..., 0]
+        trial = np.clip(params + step, lower, upper)
+        trial_w, trial_dw, trial_residuals, trial_cost = evaluate(trial)
+        better = (trial_cost < cost) & ~done
+        small = better & (cost - trial_cost <= NATURAL_FTOL * cost)
+        params[better], w_model[better], dw[better] = trial[better], trial_w[better], trial_dw[better]
+        residuals[better], cost[better] = trial_residuals[better], trial_cost[better]
+        damping = np.where(better, damping * 0.3, damping * 10)
+        converged |= ~done & (small | (damping > 1e10))
+        done |= converged
+        valid = np.all(w_model > 0, axis=1)
+        if not valid.any():
+            continue
+        best = np.flatnonzero(valid)[np.argmin(cost[valid])]
+        if target_rmse is not None and np.sqrt(cost[best] / len(w)) <= target_rmse:
+            break
+        if iterations >= NATURAL_PRUNE_AFTER:
+            if done[best]:
+                break
+            done |= cost > NATURAL_PRUNE_RATIO**2 * cost[best]
+
+    valid = np.all(w_model > 0, axis=1) & np.isfinite(cost)
+    if not valid.any():
+        return None, None, iterations, False
+    best = np.flatnonzero(valid)[np.argmin(cost[valid])]
+    rmse = float(np.sqrt(cost[best] / len(w)))
+    reached = target_rmse is not None and rmse <= target_rmse
+    return params[best].copy(), rmse, iterations, bool(converged[best] or reached)
+
+
+def fit_natural_report(k, total_implied_variances, initial_guess=None, weights=None):
+    """
+    Natural SVI fit, the best of several starts (see natural_starts and multistart_natural_fit).
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: (params, FitReport); params are delta, mu, rho, omega, zeta, or None if no start
+        gives positive variances
+    """
+    started = time.perf_counter()
+    k = np.asarray(k, dtype=np.float64)
+    total_implied_variances = np.asarray(total_implied_variances, dtype=np.float64)
+    starts = natural_starts(k, total_implied_variances, initial_guess, weights)
+    params, _, iterations, converged = multistart_natural_fit(
+        k, total_implied_variances, starts, NATURAL_TARGET_RELATIVE_RMSE * np.mean(total_implied_variances),
+        weights=weights)
+    if params is None:
+        outcome = 'failed'
+    else:
+        outcome = 'converged' if converged else 'unconverged'
+    return params, FitReport(outcome, iterations, time.perf_counter() - started)
+
+
+def fit_natural(k, total_implied_variances, initial_guess=None, weights=None):
+    """
+    Natural SVI fit, the best of several starts (see natural_starts and multistart_natural_fit).
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: Parameters delta, mu, rho, omega, zeta, or None if no start gives positive variances
+    """
+    return fit_natural_report(k, total_implied_variances, initial_guess, weights)[0]
+
+
+def _refine_jw(k, total_implied_variances, time_to_expiry, prior, regularization, weights):
+    # Least squares in SVI-JW space from the prior fit, penalizing relative parameter changes
+    # so the fit follows the market without the parameters jumping between refreshes
+    weight = regularization * np.mean(total_implied_variances) * np.sqrt(len(k))
+    scale = np.maximum(np.abs(prior), JW_MIN_SCALE)
+    root = np.ones_like(total_implied_variances) if weights is None else np.sqrt(weights)
+
+    def residuals(params):
+        model = raw_svi(k, *jw_to_raw(params, time_to_expiry))
+        return np.concatenate([(model - total_implied_variances) * root, weight * (params - prior) / scale])
+
+    if not np.all(np.isfinite(residuals(prior))):
+        return None
+    return least_squares(residuals, prior, bounds=JW_BOUNDS, method='trf')
+
+
+def fit_jw_report(k, total_implied_variances, time_to_expiry, initial_guess=None, regularization=JW_REGULARIZATION,
+                  weights=None):
+    """
+    SVI-JW fit. A previous fit of the slice is refined directly in SVI-JW space, where the
+    parameters (ATM variance, skew, wing slopes) move little between refreshes, with a
+    penalty on their relative changes. Without one, or if the refined fit fails the
+    no-arbitrage check, a quasi-explicit raw fit is converted to SVI-JW.
+    :param time_to_expiry: Years to expiry of the slice
+    :param initial_guess: Optional previous SVI-JW fit of the slice
+    :param regularization: Weight of the penalty on parameter changes, see JW_REGULARIZATION
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: (params, FitReport); params are v, psi, p, c, v_tilde, or None if they violate no-arbitrage
+    """
+    started = time.perf_counter()
+    k = np.asarray(k, dtype=np.float64)
+    total_implied_variances = np.asarray(total_implied_variances, dtype=np.float64)
+    raw_guess = None
+    if initial_guess is not None:
+        prior = np.clip(np.asarray(initial_guess, dtype=np.float64), *JW_BOUNDS)
+        result = _refine_jw(k, total_implied_variances, time_to_expiry, prior, regularization, weights)
+        if result is not None:
+            params = result.x
+            raw_params = jw_to_raw(params, time_to_expiry)
+            if np.all(np.isfinite(raw_params)) and validate_no_arbitrage(raw_params, k)[0]:
+                outcome = 'converged' if result.success else 'unconverged'
+                return params, FitReport(outcome, int(result.njev), time.perf_counter() - started)
+        raw_guess = jw_to_raw(prior, time_to_expiry)
+        if not np.all(np.isfinite(raw_guess)):
+            raw_guess = None
+
+    raw_params, report = fit_quasi_explicit_report(k, total_implied_variances, raw_guess, weights)
+    params = raw_to_jw(raw_params, time_to_expiry) if raw_params is not None else None
+    outcome = 'fallback' if initial_guess is not None and params is not None else report.outcome
+    return params, FitReport(outcome, report.iterations, time.perf_counter() - started)
+
+
+def fit_jw(k, total_implied_variances, time_to_expiry, initial_guess=None, weights=None):
+    """
+    SVI-JW fit, see fit_jw_report.
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: Parameters v, psi, p, c, v_tilde, or None if they violate no-arbitrage
+    """
+    return fit_jw_report(k, total_implied_variances, time_to_expiry, initial_guess, weights=weights)[0]
+
+
+def total_variance_grid(parameterization_type, params, k, time_to_expiry=None):
+    """
+    Evaluate several slices of one parameterization on a shared log-moneyness grid.
+    :param params: Sequence of parameter vectors, one per slice
+    :param k: Log-moneyness points
+    :param time_to_expiry: Years to expiry of each slice, needed for 'jw'
+    :return: Array of total variances with shape (len(params), len(k))
+    """
+    params = np.asarray(params, dtype=np.float64).reshape(-1, 5)
+    if parameterization_type == 'natural':
+        return natural_svi(np.asarray(k), *(column[:, None] for column in params.T))
+    if time_to_expiry is not None:
+        time_to_expiry = np.asarray(time_to_expiry, dtype=np.float64).reshape(-1)
+    raw_params = to_raw(parameterization_type, params, time_to_expiry)
+    return raw_svi(np.asarray(k), *(column[:, None] for column in raw_params.T))
+
+
+def calendar_arbitrage(parameterization_type, params, k, tol=0.0, time_to_expiry=None):
+    """
+    Check a surface for calendar arbitrage: at every k of the shared grid, total
+    variance must be non-decreasing from one expiry to the next.
+    :param params: Parameter vectors ordered by expiry
+    :param tol: Allowed decrease in total variance before a point counts as a violation
+    :param time_to_expiry: Years to expiry of each slice, needed for 'jw'
+    :return: (w, violations) where violations[i, j] is True if total variance decreases
+        from slice i to slice i + 1 at k[j]
+    """
+    w = total_variance_grid(parameterization_type, params, k, time_to_expiry)
+    return w, np.diff(w, axis=0) < -tol
+
+
+FITTERS = {
+    'raw': fit_raw_report,
+    'quasi_explicit': fit_quasi_explicit_report,
+    'natural': fit_natural_report,
+}
+
+
+def fit_slice_report(parameterization_type, k, total_implied_variances, initial_guess=None, time_to_expiry=None,
+                     weights=None):
+    """
+    Fit one slice with the given parameterization. Module-level so it can be
+    pickled into a ProcessPoolExecutor.
+    :param time_to_expiry: Years to expiry of the slice, needed for 'jw'
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: (params, FitReport); params are None if the fit failed
+    """
+    if len(k) == 0:
+        # No marked points, e.g. a slice listed since the last mark refresh
+        return None, FitReport('failed', None, 0.0)
+    if parameterization_type == 'jw':
+        return fit_jw_report(k, total_implied_variances, time_to_expiry, initial_guess, weights=weights)
+    return FITTERS[parameterization_type](k, total_implied_variances, initial_guess, weights=weights)
+
+
+def fit_slice(parameterization_type, k, total_implied_variances, initial_guess=None, time_to_expiry=None,
+              weights=None):
+    """
+    Fit one slice with the given parameterization
+    :param time_to_expiry: Years to expiry of the slice, needed for 'jw'
+    :param weights: Optional weight of each point's squared error, e.g. from slice_weights
+    :return: Fitted parameters, or None if the fit failed
+    """
+    return fit_slice_report(parameterization_type, k, total_implied_variances, initial_guess, time_to_expiry,
+                            weights)[0]
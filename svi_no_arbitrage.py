@@ -1,10 +1,22 @@
+import itertools
 import numpy as np
 from scipy.optimize import minimize, NonlinearConstraint
 
+# Largest |rho| of quasi-explicit fits, enforced inside the inner least squares problem
+QE_MAX_RHO = 0.999
+
+# Active sets of the quasi-explicit inner problem: every set of at most 3 of its 6
+# linear constraints, ordered so that sets with fewer active constraints are tried first
+_ACTIVE_SETS = [np.array(active, dtype=np.intp) for size in range(4)
+                for active in itertools.combinations(range(6), size)]
+
 class SVINoArbitrage:
     """
     SVI parameterization with no-arbitrage constraints
     """
+
+    # scipy OptimizeResult of the latest SLSQP or Nelder-Mead search, for telemetry
+    last_result = None
     
     @staticmethod
     def check_butterfly_arbitrage_raw(a, b, rho, m, sigma):
@@ -33,14 +45,11 @@ class SVINoArbitrage:
         """
         Calculate the butterfly density (second derivative of call price w.r.t. strike).
         This must be non-negative for no arbitrage.
+        k may be a scalar or an array of log-moneyness points.
         """
         # First, calculate d1 and d2 for the SVI implied volatility
         w = a + b * (rho * (k - m) + np.sqrt((k - m)**2 + sigma**2))
         
-        # For very small w, return a large value to indicate violation
-        if w <= 0:
-            return -1
-        
         # Calculate derivatives of w w.r.t. k
         sqrt_term = np.sqrt((k - m)**2 + sigma**2)
         w_k = b * (rho + (k - m) / sqrt_term)
@@ -49,9 +58,63 @@ class SVINoArbitrage:
         # Butterfly density condition from Gatheral's SVI paper
         # This is a simplified check - full implementation would compute
         # the actual second derivative of the call price
-        g = (1 - k * w_k / (2 * w))**2 - w_k**2 / 4 * (1/w + 1/4) + w_kk / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            g = (1 - k * w_k / (2 * w))**2 - w_k**2 / 4 * (1/w + 1/4) + w_kk / 2
         
-        return g
+        # For very small w, return a negative value to indicate violation
+        return np.where(w <= 0, -1.0, g)
+
+    @staticmethod
+    def raw_svi_jacobian(k, a, b, rho, m, sigma):
+        """
+        Partial derivatives of raw SVI total variance w.r.t. (a, b, rho, m, sigma).
+        :return: (w, dw) with dw of shape (len(k), 5)
+        """
+        u = k - m
+        sqrt_term = np.sqrt(u**2 + sigma**2)
+        w = a + b * (rho * u + sqrt_term)
+        dw = np.column_stack([
+            np.ones_like(u),
+            rho * u + sqrt_term,
+            b * u,
+            -b * (rho + u / sqrt_term),
+            b * sigma / sqrt_term,
+        ])
+        return w, dw
+
+    @staticmethod
+    def butterfly_density_jacobian(k, a, b, rho, m, sigma):
+        """
+        Partial derivatives of the butterfly density g(k) w.r.t. (a, b, rho, m, sigma),
+        evaluated over an array of k.
+        :return: Array of shape (len(k), 5)
+        """
+        u = k - m
+        s = np.sqrt(u**2 + sigma**2)
+        s3 = s**3
+        s5 = s**5
+        w, dw = SVINoArbitrage.raw_svi_jacobian(k, a, b, rho, m, sigma)
+        w_k = b * (rho + u / s)
+        dw_k = np.column_stack([
+            np.zeros_like(u),
+            rho + u / s,
+            np.full_like(u, b),
+            -b * sigma**2 / s3,
+            -b * u * sigma / s3,
+        ])
+        dw_kk = np.column_stack([
+            np.zeros_like(u),
+            sigma**2 / s3,
+            np.zeros_like(u),
+            3 * b * sigma**2 * u / s5,
+            b * (2 * sigma * s**2 - 3 * sigma**3) / s5,
+        ])
+        w = w[:, None]
+        w_k = w_k[:, None]
+        k = np.asarray(k)[:, None]
+        A = 1 - k * w_k / (2 * w)
+        dA = -k / 2 * (dw_k * w - w_k * dw) / w**2
+        return 2 * A * dA - w_k / 2 * (1 / w + 1 / 4) * dw_k + w_k**2 / 4 * dw / w**2 + dw_kk / 2
     
     @staticmethod
     def calendar_spread_constraint(t1, t2, params1, params2):
@@ -62,59 +125,85 @@ class SVINoArbitrage:
         if t2 <= t1:
             return True  # Not applicable
         
-        a1, b1, rho1, m1, sigma1 = params1
-        a2, b2, rho2, m2, sigma2 = params2
-        
-        # Sample points to check
         k_points = np.linspace(-2, 2, 50)
-        
-        for k in k_points:
-            w1 = a1 + b1 * (rho1 * (k - m1) + np.sqrt((k - m1)**2 + sigma1**2))
-            w2 = a2 + b2 * (rho2 * (k - m2) + np.sqrt((k - m2)**2 + sigma2**2))
-            
-            # Total variance must be increasing
-            if w2 < w1:
-                return False
-        
-        return True
+        _, violations = SVINoArbitrage.calendar_arbitrage_grid(k_points, [params1, params2])
+        return not violations.any()
+
+    @staticmethod
+    def calendar_arbitrage_grid(k_grid, raw_params, tol=0.0):
+        """
+        Evaluate raw SVI slices on a shared log-moneyness grid and check that total
+        variance is non-decreasing in time at every k, all in one array operation.
+        :param k_grid: Shared log-moneyness points
+        :param raw_params: Raw SVI parameters (a, b, rho, m, sigma) per slice, ordered by expiry
+        :param tol: Allowed decrease in total variance before a point counts as a violation
+        :return: (w, violations) where w has shape (n_slices, len(k_grid)) and violations[i, j]
+            is True if w decreases from slice i to slice i + 1 at k_grid[j]
+        """
+        # Imported here: svi_fits builds on this module
+        from svi_fits import calendar_arbitrage
+        return calendar_arbitrage('raw', raw_params, np.asarray(k_grid, dtype=np.float64), tol)
     
-    def constrained_svi_fit(self, k_data, total_variance_data, initial_guess=None):
+    @staticmethod
+    def initial_raw_guess(k_data, total_variance_data):
+        """
+        Data-scaled raw SVI starting point: vertex at the lowest observed variance,
+        b from the steepest rise away from it.
+        """
+        i = np.argmin(total_variance_data)
+        m = k_data[i]
+        sigma = 0.1
+        span = max(np.max(np.abs(k_data - m)), 1e-3)
+        b = max((np.max(total_variance_data) - total_variance_data[i]) / span, 1e-3)
+        return [total_variance_data[i] - b * sigma, b, 0.0, m, sigma]
+
+    def constrained_svi_fit(self, k_data, total_variance_data, initial_guess=None, n_test_points=50,
+                            lower_bound=None, weights=None):
         """
         Fit SVI parameters with no-arbitrage constraints.
+        The objective and every constraint supply analytic Jacobians to SLSQP, and the
+        butterfly density is enforced as a vector constraint over n_test_points.
+        :param lower_bound: Optional (k, w) arrays the fitted total variance must not fall
+            below, e.g. the previous expiry's slice, to rule out calendar arbitrage
+        :param weights: Optional weight of each point's squared error
         """
+        k_data = np.asarray(k_data, dtype=np.float64)
+        total_variance_data = np.asarray(total_variance_data, dtype=np.float64)
+        weights = np.ones_like(total_variance_data) if weights is None else np.asarray(weights, dtype=np.float64)
         if initial_guess is None:
-            initial_guess = [
-                np.mean(total_variance_data),  # a
-                0.5,  # b
-                0.0,  # rho
-                0.0,  # m
-                0.1   # sigma
-            ]
-        
-        # Objective function: minimize squared error
+            initial_guess = self.initial_raw_guess(k_data, total_variance_data)
+        
+        k_test = np.linspace(np.min(k_data) - 0.5, np.max(k_data) + 0.5, n_test_points)
+        # Normalize the objective so SLSQP's ftol is relative to the size of the data;
+        # short expiries have total variances of order 1e-3
+        scale = np.sum(weights * total_variance_data**2)
+
+        # Objective function: minimize squared error, with its gradient
         def objective(params):
-            a, b, rho, m, sigma = params
-            w_model = a + b * (rho * (k_data - m) + np.sqrt((k_data - m)**2 + sigma**2))
-            return np.sum((w_model - total_variance_data)**2)
+            w_model, dw = self.raw_svi_jacobian(k_data, *params)
+            residuals = w_model - total_variance_data
+            return np.sum(weights * residuals**2) / scale, 2 * (weights * residuals) @ dw / scale
         
         # Constraint functions
         def butterfly_constraint(params):
-            """Returns positive value if no arbitrage"""
-            a, b, rho, m, sigma = params
-            
-            # Basic constraints
-            if not self.check_butterfly_arbitrage_raw(a, b, rho, m, sigma):
-                return -1
-            
-            # Check butterfly density at sample points
-            k_test = np.linspace(np.min(k_data) - 0.5, np.max(k_data) + 0.5, 20)
-            min_density = np.inf
-            
-            for k in k_test:
-                density = self.butterfly_density_constraint(k, a, b, rho, m, sigma)
-                min_density = min(min_density, density)
-            
-            return min_density
+            """Butterfly density at every test point, non-negative if no arbitrage"""
+            return self.butterfly_density_constraint(k_test, *params)
+
+        def butterfly_jacobian(params):
+            return self.butterfly_density_jacobian(k_test, *params)
+
+        def wing_constraint(p):
+            return 4 - p[1] * (1 + abs(p[2]))
+
+        def wing_jacobian(p):
+            return np.array([0.0, -(1 + abs(p[2])), -p[1] * np.sign(p[2]), 0.0, 0.0])
+
+        def min_variance_constraint(p):
+            return p[0] + p[1] * p[4] * np.sqrt(1 - p[2]**2)
+
+        def min_variance_jacobian(p):
+            root = np.sqrt(1 - p[2]**2)
+            return np.array([1.0, p[4] * root, -p[1] * p[4] * p[2] / root, 0.0, p[1] * root])
         
         # Bounds
         bounds = [
@@ -128,32 +217,46 @@ class SVINoArbitrage:
         # Additional constraints
         constraints = [
             # b(1 + |rho|) <= 4
-            {'type': 'ineq', 'fun': lambda p: 4 - p[1] * (1 + abs(p[2]))},
+            {'type': 'ineq', 'fun': wing_constraint, 'jac': wing_jacobian},
             # Butterfly arbitrage
-            {'type': 'ineq', 'fun': butterfly_constraint},
+            {'type': 'ineq', 'fun': butterfly_constraint, 'jac': butterfly_jacobian},
             # Ensure positive total variance at ATM
-            {'type': 'ineq', 'fun': lambda p: p[0] + p[1] * p[4] * np.sqrt(1 - p[2]**2)}
+            {'type': 'ineq', 'fun': min_variance_constraint, 'jac': min_variance_jacobian}
         ]
+        if lower_bound is not None:
+            k_bound, w_bound = (np.asarray(x, dtype=np.float64) for x in lower_bound)
+
+            def calendar_constraint(p):
+                return self.raw_svi_jacobian(k_bound, *p)[0] - w_bound
+
+            def calendar_jacobian(p):
+                return self.raw_svi_jacobian(k_bound, *p)[1]
+
+            # Total variance must not fall below the previous expiry's
+            constraints.append({'type': 'ineq', 'fun': calendar_constraint, 'jac': calendar_jacobian})
         
         # Optimize
         result = minimize(
             objective,
             initial_guess,
+            jac=True,
             method='SLSQP',
             bounds=bounds,
             constraints=constraints,
-            options={'maxiter': 1000}
+            options={'maxiter': 1000, 'ftol': 1e-8}
         )
+        self.last_result = result
         
         if result.success:
             return result.x
         else:
             # Fall back to constrained least squares if SLSQP fails
-            return self.fallback_constrained_fit(k_data, total_variance_data)
+            return self.fallback_constrained_fit(k_data, total_variance_data, weights)
     
-    def fallback_constrained_fit(self, k_data, total_variance_data):
+    def fallback_constrained_fit(self, k_data, total_variance_data, weights=None):
         """
         Fallback fitting method with relaxed constraints.
+        :param weights: Optional weight of each point's squared error
         """
         from scipy.optimize import curve_fit
         
@@ -183,27 +286,127 @@ class SVINoArbitrage:
                 k_data,
                 total_variance_data,
                 p0=initial_guess,
+                sigma=None if weights is None else 1 / np.sqrt(weights),
                 maxfev=10000
             )
             return params
         except:
             # Return initial guess if all else fails
-            return initial_guess
+            return np.array(initial_guess)
     
+    @staticmethod
+    def _constrained_least_squares(X, y, A, bound):
+        """
+        Exact least squares min ||X p - y||^2 subject to A p <= bound for a handful of
+        variables and constraints. Each active set is solved in closed form through its
+        KKT system, starting with the unconstrained one, until a feasible candidate has
+        non-negative multipliers; the problem is convex, so that candidate is the
+        constrained optimum.
+        """
+        n = X.shape[1]
+        G = X.T @ X
+        h = X.T @ y
+        tol = 1e-12 * (1 + np.abs(bound))
+        multiplier_tol = 1e-12 * (1 + np.max(np.abs(h)))
+        best, best_value = None, np.inf
+        for active in _ACTIVE_SETS:
+            A_active = A[active]
+            system = np.block([[G, A_active.T], [A_active, np.zeros((active.size, active.size))]])
+            try:
+                solution = np.linalg.solve(system, np.concatenate([h, bound[active]]))
+            except np.linalg.LinAlgError:
+                continue
+            p, multipliers = solution[:n], solution[n:]
+            if (A @ p > bound + tol).any():
+                continue
+            if (multipliers >= -multiplier_tol).all():
+                return p
+            value = p @ G @ p - 2 * p @ h
+            if value < best_value:
+                best, best_value = p, value
+        return best
+
+    def quasi_explicit_inner_fit(self, k_data, total_variance_data, m, sigma, weights=None):
+        """
+        Solve the linear part of raw SVI in closed form for fixed (m, sigma).
+
+        With y = (k - m) / sigma, raw SVI is w = a + d*y + c*sqrt(y^2 + 1), where
+        c = b*sigma and d = rho*b*sigma. In u = c + d, v = c - d the no-arbitrage domain
+        0 <= c <= 4*sigma, |d| <= c, |d| <= 4*sigma - c is the box 0 <= u, v <= 4*sigma;
+        |rho| <= QE_MAX_RHO narrows |d| <= c to the cone |u - v| <= QE_MAX_RHO*(u + v),
+        and 0 <= a <= max(w).
+        :param weights: Optional weight of each point's squared error
+        :return: (sum of squared errors, raw SVI params (a, b, rho, m, sigma))
+        """
+        y = (k_data - m) / sigma
+        z = np.sqrt(y**2 + 1)
+        X = np.column_stack([np.ones_like(y), (z + y) / 2, (z - y) / 2])
+        # Rows of A p <= bound for p = (a, u, v); the cone also keeps u and v non-negative
+        A = np.array([
+            [-1.0, 0.0, 0.0],
+            [1.0, 0.0, 0.0],
+            [0.0, 1.0, 0.0],
+            [0.0, 0.0, 1.0],
+            [0.0, 1 - QE_MAX_RHO, -1 - QE_MAX_RHO],
+            [0.0, -1 - QE_MAX_RHO, 1 - QE_MAX_RHO],
+        ])
+        bound = np.array([0.0, max(np.max(total_variance_data), 0.0), 4 * sigma, 4 * sigma, 0.0, 0.0])
+        if weights is not None:
+            root = np.sqrt(weights)
+            X, total_variance_data = X * root[:, None], total_variance_data * root
+        a, u, v = self._constrained_least_squares(X, total_variance_data, A, bound)
+        c, d = (u + v) / 2, (u - v) / 2
+        b = c / sigma
+        rho = np.clip(d / c, -QE_MAX_RHO, QE_MAX_RHO) if c > 0 else 0.0
+        residuals = X @ np.array([a, u, v]) - total_variance_data
+        return np.sum(residuals**2), np.array([a, b, rho, m, sigma])
+
+    def quasi_explicit_svi_fit(self, k_data, total_variance_data, initial_guess=None, weights=None):
+        """
+        Fit raw SVI with the quasi-explicit (dimension-reduced) method.
+
+        The inner (a, b, rho) problem is solved exactly for each (m, sigma), leaving a
+        2-D Nelder-Mead search. Without an initial guess the search starts from the
+        best point of a coarse (m, sigma) grid.
+        :param initial_guess: Optional raw SVI params; only (m, sigma) are used
+        :param weights: Optional weight of each point's squared error
+        :return: Raw SVI params (a, b, rho, m, sigma)
+        """
+        k_data = np.asarray(k_data, dtype=np.float64)
+        total_variance_data = np.asarray(total_variance_data, dtype=np.float64)
+        k_min, k_max = np.min(k_data), np.max(k_data)
+        # A vertex outside the quotes lets a straight line through one wing pass for a smile
+        bounds = [(k_min, k_max), (0.001, 10)]
+
+        def objective(x):
+            return self.quasi_explicit_inner_fit(k_data, total_variance_data, x[0], x[1], weights)[0]
+
+        if initial_guess is not None:
+            start = np.clip([initial_guess[3], initial_guess[4]], [b[0] for b in bounds], [b[1] for b in bounds])
+        else:
+            grid = [(m, sigma) for m in np.linspace(k_min, k_max, 7) for sigma in np.geomspace(0.01, 1, 5)]
+            start = min(grid, key=objective)
+
+        result = minimize(
+            objective,
+            start,
+            method='Nelder-Mead',
+            bounds=bounds,
+            options={'xatol': 1e-6, 'fatol': 1e-12, 'maxiter': 1000}
+        )
+        self.last_result = result
+        return self.quasi_explicit_inner_fit(k_data, total_variance_data, *result.x, weights)[1]
+
     @staticmethod
     def validate_svi_surface(asset_data, expiry_data):
         """
         Validate an entire SVI surface across expiries for calendar arbitrage.
         """
         expiries = sorted(expiry_data.keys())
-        violations = []
-        
-        for i in range(len(expiries) - 1):
-            t1, t2 = expiries[i], expiries[i + 1]
-            params1 = expiry_data[t1]['svi_params']
-            params2 = expiry_data[t2]['svi_params']
-            
-            if not SVINoArbitrage.calendar_spread_constraint(t1, t2, params1, params2):
-                violations.append((t1, t2))
+        if len(expiries) < 2:
+            return True, []
+        params = [expiry_data[t]['svi_params'] for t in expiries]
+        _, violations = SVINoArbitrage.calendar_arbitrage_grid(np.linspace(-2, 2, 50), params)
+        violations = [(expiries[i], expiries[i + 1]) for i in np.flatnonzero(violations.any(axis=1))]
         
         return len(violations) == 0, violations
@@ -0,0 +1,144 @@
+import numpy as np
+
+# Conversions between the raw, natural and SVI-JW (jump-wings) parameterizations of an
+# SVI slice. Every function takes an array of parameter sets with the five parameters
+# on the last axis, so one call converts a single slice or every slice of a surface.
+# SVI-JW parameters are per year and depend on the slice's time to expiry, given as a
+# scalar or as one value per parameter set.
+#
+#   raw:     a, b, rho, m, sigma
+#   natural: delta, mu, rho, omega, zeta
+#   jw:      v (ATM variance), psi (ATM skew), p (put wing slope), c (call wing slope),
+#            v_tilde (minimum variance)
+
+# Parameterization types whose parameters are raw SVI parameters
+RAW_PARAMETERIZATION_TYPES = ('raw', 'quasi_explicit', 'raw_sequential', 'ssvi', 'essvi')
+
+
+def _unpack(params):
+    return tuple(np.moveaxis(np.asarray(params, dtype=np.float64), -1, 0))
+
+
+def _pack(*columns):
+    return np.stack(np.broadcast_arrays(*columns), axis=-1)
+
+
+def raw_to_natural(params):
+    """
+    :param params: Raw SVI parameters a, b, rho, m, sigma, shape (..., 5)
+    :return: Natural SVI parameters delta, mu, rho, omega, zeta of the same smiles
+    """
+    a, b, rho, m, sigma = _unpack(params)
+    root = np.sqrt(1 - rho**2)
+    zeta = root / sigma
+    return _pack(a - b * sigma * root, m + rho / zeta, rho, 2 * b * sigma / root, zeta)
+
+
+def natural_to_raw(params):
+    """
+    :param params: Natural SVI parameters delta, mu, rho, omega, zeta, shape (..., 5)
+    :return: Raw SVI parameters a, b, rho, m, sigma of the same smiles
+    """
+    delta, mu, rho, omega, zeta = _unpack(params)
+    return _pack(delta + omega / 2 * (1 - rho**2), omega * zeta / 2, rho, mu - rho / zeta,
+                 np.sqrt(1 - rho**2) / zeta)
+
+
+def raw_to_jw(params, time_to_expiry):
+    """
+    :param params: Raw SVI parameters a, b, rho, m, sigma, shape (..., 5)
+    :param time_to_expiry: Years to expiry, a scalar or shape (...)
+    :return: SVI-JW parameters v, psi, p, c, v_tilde of the same smiles
+    """
+    a, b, rho, m, sigma = _unpack(params)
+    t = np.asarray(time_to_expiry, dtype=np.float64)
+    root = np.sqrt(m**2 + sigma**2)
+    w = a + b * (root - rho * m)
+    sqrt_w = np.sqrt(w)
+    return _pack(w / t, b / (2 * sqrt_w) * (rho - m / root), b * (1 - rho) / sqrt_w, b * (1 + rho) / sqrt_w,
+                 (a + b * sigma * np.sqrt(1 - rho**2)) / t)
+
+
+def jw_to_raw(params, time_to_expiry):
+    """
+    Inverse of raw_to_jw. Parameter sets that are not the SVI-JW parameters of any raw
+    SVI smile (the ATM skew outside (-p/2, c/2), or non-positive wings) give NaN, and so
+    does the degenerate symmetric smile centred at the money (psi = 0 and p = c), whose
+    sigma the SVI-JW parameters do not determine.
+    :param params: SVI-JW parameters v, psi, p, c, v_tilde, shape (..., 5)
+    :param time_to_expiry: Years to expiry, a scalar or shape (...)
+    :return: Raw SVI parameters a, b, rho, m, sigma of the same smiles
+    """
+    v, psi, p, c, v_tilde = _unpack(params)
+    t = np.asarray(time_to_expiry, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_w = np.sqrt(v * t)
+        b = sqrt_w / 2 * (c + p)
+        rho = 1 - p * sqrt_w / b
+        root = np.sqrt(1 - rho**2)
+        # beta = m / sqrt(m^2 + sigma^2) and alpha = sigma / m
+        beta = rho - 2 * psi * sqrt_w / b
+        alpha = np.sign(beta) * np.sqrt(1 / beta**2 - 1)
+        m = (v - v_tilde) * t / (b * (-rho + np.sign(alpha) * np.sqrt(1 + alpha**2) - alpha * root))
+        sigma = np.where(beta == 0, (v - v_tilde) * t / (b * (1 - root)), alpha * m)
+        m = np.where(beta == 0, 0.0, m)
+        a = v_tilde * t - b * sigma * root
+    return _pack(a, b, rho, m, sigma)
+
+
+def natural_to_jw(params, time_to_expiry):
+    """
+    :param params: Natural SVI parameters delta, mu, rho, omega, zeta, shape (..., 5)
+    :param time_to_expiry: Years to expiry, a scalar or shape (...)
+    :return: SVI-JW parameters v, psi, p, c, v_tilde of the same smiles
+    """
+    return raw_to_jw(natural_to_raw(params), time_to_expiry)
+
+
+def jw_to_natural(params, time_to_expiry):
+    """
+    :param params: SVI-JW parameters v, psi, p, c, v_tilde, shape (..., 5)
+    :param time_to_expiry: Years to expiry, a scalar or shape (...)
+    :return: Natural SVI parameters delta, mu, rho, omega, zeta of the same smiles
+    """
+    return raw_to_natural(jw_to_raw(params, time_to_expiry))
+
+
+def to_raw(parameterization_type, params, time_to_expiry=None):
+    """
+    Raw SVI parameters of fitted parameters of any parameterization type
+    :param time_to_expiry: Years to expiry, needed for 'jw'
+    """
+    if parameterization_type == 'natural':
+        return natural_to_raw(params)
+    if parameterization_type == 'jw':
+        return jw_to_raw(params, time_to_expiry)
+    if parameterization_type in RAW_PARAMETERIZATION_TYPES:
+        return np.asarray(params, dtype=np.float64)
+    raise ValueError(f"Unknown parameterization type {parameterization_type!r}")
+
+
+def from_raw(parameterization_type, params, time_to_expiry=None):
+    """
+    Parameters of the given parameterization type for raw SVI parameters
+    :param time_to_expiry: Years to expiry, needed for 'jw'
+    """
+    if parameterization_type == 'natural':
+        return raw_to_natural(params)
+    if parameterization_type == 'jw':
+        return raw_to_jw(params, time_to_expiry)
+    if parameterization_type in RAW_PARAMETERIZATION_TYPES:
+        return np.asarray(params, dtype=np.float64)
+    raise ValueError(f"Unknown parameterization type {parameterization_type!r}")
+
+
+def convert(params, source, target, time_to_expiry=None):
+    """
+    Convert parameter sets between parameterization types, e.g. a surface's natural fits
+    to SVI-JW: convert(params, 'natural', 'jw', times_to_expiry)
+    :param params: Parameter sets of the source type, shape (..., 5)
+    :param time_to_expiry: Years to expiry, needed if either type is 'jw'
+    """
+    if source == target:
+        return np.asarray(params, dtype=np.float64)
+    return from_raw(target, to_raw(source, params, time_to_expiry), time_to_expiry)
@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import metrics
+import svi_fits
+
+logger = logging.getLogger(__name__)
+
+
+class SVIFitPipeline:
+    """
+    Fits every asset/expiry/side slice in a process pool after each refresh and
+    publishes the results into an SVIFitCache under the chain version they were
+    computed from, so request handlers only fit on cache misses.
+    """
+
+    def __init__(self, cache, max_workers=None, parameterization_types=('raw', 'natural'), on_complete=None,
+                 slice_weighting='equal'):
+        """
+        :param cache: SVIFitCache the results are published into
+        :param max_workers: Worker process count (None lets the executor pick)
+        :param parameterization_types: Parameterizations fitted for every slice
+        :param on_complete: Optional callback(version, results) run after each batch is published
+        :param slice_weighting: How the points of a slice are weighted, see svi_fits.slice_weights
+        """
+        self.cache = cache
+        self.slice_weighting = slice_weighting
+        self.max_workers = max_workers
+        self.parameterization_types = tuple(parameterization_types)
+        self.last_version = None
+        self.last_duration = None
+        self.on_complete = on_complete
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._running = threading.Lock()
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(self, chain):
+        """
+        Start fitting every slice of the chain at its current version. Returns
+        immediately; results are published by a collector thread once all fits are
+        done. A run is skipped if the previous one is still in flight.
+        :param chain: ChainStore to fit
+        :return: True if a run was started
+        """
+        if not self._running.acquire(blocking=False):
+            logger.info("SVI fit pipeline still running, skipping version %s", chain.version)
+            return False
+        started = time.monotonic()
+        try:
+            executor = self._pool()
+            version = chain.version
+            jobs = {}
+            for asset, expiries in chain.slices.items():
+                for expiry, sides in expiries.items():
+                    for side, rows in sides.items():
+                        if rows.stop <= rows.start:
+                            continue
+                        k, w = chain.svi_slice(asset, expiry, side)
+                        if len(k) == 0:
+                            # Nothing marked yet, e.g. a new listing before its first mark refresh
+                            continue
+                        weights = svi_fits.slice_weights(self.slice_weighting, k, w)
+                        time_to_expiry, _, _ = chain.expiry_info(asset, expiry)
+                        for parameterization_type in self.parameterization_types:
+                            key = (asset, expiry, side, parameterization_type)
+                            initial_guess = self.cache.warm_start(*key)
+                            jobs[key] = executor.submit(svi_fits.fit_slice_report, parameterization_type,
+                                                        k, w, initial_guess, time_to_expiry, weights)
+        except Exception:
+            self._running.release()
+            raise
+        threading.Thread(target=self._collect, args=(version, jobs, started), daemon=True).start()
+        return True
+
+    def _collect(self, version, jobs, started):
+        try:
+            wait(jobs.values())
+            results = {}
+            for key, future in jobs.items():
+                asset, expiry, _, parameterization_type = key
+                try:
+                    results[key], report = future.result()
+                except Exception as e:
+                    logger.error("SVI fit failed for %s: %s", '-'.join(key), e)
+                    metrics.SVI_FIT_OUTCOMES.labels(asset, expiry, parameterization_type, 'failed').inc()
+                    continue
+                metrics.record_fit(asset, expiry, parameterization_type, report)
+            self.cache.put_many(version, results)
+            self.last_version = version
+            self.last_duration = time.monotonic() - started
+            metrics.REFRESH_STAGE_SECONDS.labels('fit').observe(self.last_duration)
+            if self.on_complete is not None:
+                self.on_complete(version, results)
+        except Exception as e:
+            logger.error("SVI fit pipeline failed to publish version %s: %s", version, e)
+        finally:
+            self._running.release()
+
+    def fit(self, jobs):
+        """
+        Fit slices on the worker pool right away and wait for them, outside the
+        per-refresh runs, e.g. for the fits a batch request is missing
+        :param jobs: Mapping of key to svi_fits.fit_slice_report arguments
+            (parameterization_type, k, w, initial_guess, time_to_expiry, weights)
+        :return: Mapping of key to (params, FitReport)
+        """
+        executor = self._pool()
+        futures = {key: executor.submit(svi_fits.fit_slice_report, *args) for key, args in jobs.items()}
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                logger.error("SVI fit failed for %s: %s", '-'.join(map(str, key)), e)
+                results[key] = (None, svi_fits.FitReport('failed', None, 0.0))
+        return results
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
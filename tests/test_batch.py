@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+
+def slice_query(app, **overrides):
+    chain = app.BinanceAPI.chain
+    asset = next(iter(chain.slices))
+    expiry = next(iter(chain.slices[asset]))
+    return {'type': 'option_chain', 'asset': asset, 'expiry': expiry, 'side': 'C', **overrides}
+
+
+def test_batch_answers_each_query(app, client):
+    response = client.post('/api/batch', json={'queries': [slice_query(app), slice_query(app, expiry='000101')]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == [200, 404]
+
+
+@pytest.mark.parametrize('field', ['asset', 'expiry', 'side'])
+def test_batch_rejects_non_string_slice_fields(app, client, field):
+    query = slice_query(app)
+    bad = slice_query(app, **{field: [query[field]]})
+    response = client.post('/api/batch', json={'queries': [bad, query]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[0]['status'] == 400
+    assert results[1]['status'] == 200
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import svi_fits
+from replay import ReplaySource, synthetic_fixtures
+from svi_no_arbitrage import SVINoArbitrage
+
+SLICES = [[0.01, 0.1, -0.3, 0.0, 0.1], [0.02, 0.1, -0.3, 0.0, 0.1], [0.015, 0.1, -0.3, 0.0, 0.1]]
+
+
+def test_grid_check_matches_svi_fits():
+    k = np.linspace(-1, 1, 9)
+    w, violations = SVINoArbitrage.calendar_arbitrage_grid(k, SLICES)
+    expected_w, expected_violations = svi_fits.calendar_arbitrage('raw', SLICES, k)
+    np.testing.assert_array_equal(w, expected_w)
+    np.testing.assert_array_equal(violations, expected_violations)
+    assert violations.any(axis=1).tolist() == [False, True]
+    assert SVINoArbitrage.calendar_spread_constraint(0.1, 0.2, SLICES[0], SLICES[1])
+    assert not SVINoArbitrage.calendar_spread_constraint(0.1, 0.2, SLICES[1], SLICES[0])
+
+
+@pytest.fixture
+def client(app):
+    documents = synthetic_fixtures(10, expiry_days=(7, 30))
+    client = app.Binance(source=ReplaySource.from_documents(documents), fit_workers=0, ingestion='rest')
+    client.scheduler.shutdown(wait=False)
+    return client
+
+
+def test_sequential_fit_is_cached_per_bound(client):
+    first, second = client.expiry_dates['BTC'][0][0], client.expiry_dates['BTC'][1][0]
+    previous = client.sequential_svi_params('BTC', first, 'C')
+    assert previous is not None
+    unbounded = client.sequential_svi_params('BTC', second, 'C')
+    # A bound well above the unbounded fit must lift it
+    raised = np.array(unbounded, dtype=np.float64) + [0.05, 0, 0, 0, 0]
+    bounded = client.sequential_svi_params('BTC', second, 'C', raised)
+    assert bounded is not None
+    k_bound = np.linspace(-0.5, 0.5, 11)
+    assert (client.raw_svi(k_bound, *bounded) >= client.raw_svi(k_bound, *raised) - 1e-6).all()
+    assert not np.allclose(bounded, unbounded)
+    # Same bound again: served from the cache
+    hits = client.svi_cache.hits
+    assert client.sequential_svi_params('BTC', second, 'C', raised) is bounded
+    assert client.svi_cache.hits == hits + 1
+
+
+@pytest.mark.parametrize('sequential', [False, True])
+def test_surface_follows_the_snapshot_listing(client, sequential):
+    listed = [expiry for expiry, _ in client.chain.expiry_dates['BTC']]
+    # A listing swap between reading the expiries and the snapshot
+    client.expiry_dates = {'BTC': [('000101', 0), *client.chain.expiry_dates['BTC'][1:]]}
+    surface = client.get_svi_surface('BTC', 'C', sequential=sequential)
+    assert [entry['expiry'] for entry in surface['slices']] == listed
+    assert all(entry['params'] is not None for entry in surface['slices'])
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import svi_fits
+from chain_store import ChainStore
+from replay import ReplaySource, synthetic_fixtures
+
+NOW = 1_800_000_000_000
+EXPIRY = '270214'
+UNMARKED = f'BTC-{EXPIRY}-64765.26-C'
+
+
+@pytest.fixture
+def documents():
+    """
+    A chain where one call has no entry in the mark payload
+    """
+    documents = synthetic_fixtures(10, expiry_days=(30,), now=NOW)
+    documents['mark'] = [mark for mark in documents['mark'] if mark['symbol'] != UNMARKED]
+    return documents
+
+
+@pytest.fixture
+def chain(documents):
+    spot = {item['symbol']: float(item['price']) for item in documents['spot']}
+    return ChainStore(documents['exchangeInfo']['optionSymbols'], NOW).with_marks(documents['mark'], spot, cur_time=NOW)
+
+
+def test_unmarked_row_is_nan(chain):
+    row = chain.rows_for_symbols([UNMARKED])[0]
+    assert row >= 0
+    assert np.isnan(chain.total_implied_variance[row])
+
+
+@pytest.mark.parametrize('side', ['C', 'P', 'A'])
+def test_svi_slice_skips_unmarked_rows(chain, side):
+    k, w = chain.svi_slice('BTC', EXPIRY, side)
+    assert np.isfinite(k).all() and np.isfinite(w).all()
+    expected = 9 if side == 'C' else 10
+    assert len(k) == expected
+    assert svi_fits.fit_raw(k, w) is not None
+
+
+def test_unmarked_slice_has_no_points(documents):
+    spot = {item['symbol']: float(item['price']) for item in documents['spot']}
+    chain = ChainStore(documents['exchangeInfo']['optionSymbols'], NOW).with_marks([], spot, cur_time=NOW)
+    k, w = chain.svi_slice('BTC', EXPIRY, 'C')
+    assert len(k) == 0
+    params, report = svi_fits.fit_slice_report('raw', k, w)
+    assert params is None and report.outcome == 'failed'
+
+
+def test_curve_of_slice_with_unmarked_row(app, documents):
+    client = app.Binance(source=ReplaySource.from_documents(documents), fit_workers=0, ingestion='rest')
+    client.scheduler.shutdown(wait=False)
+    points, params = client.get_svi_curve_points('BTC', EXPIRY, 'C', columnar=True)
+    assert np.isfinite(points['logMoneyness']).all()
+    assert np.isfinite(points['impliedVolatility']).all()
@@ -0,0 +1,27 @@
+import numpy as np
+
+import black_scholes
+import implied_vol
+
+S, T, R = 60000.0, 30 / 365.25, 0.0
+
+
+def test_recovers_volatility():
+    K = np.array([45000.0, 55000.0, 60000.0, 65000.0, 80000.0])
+    sides = np.array(['P', 'P', 'C', 'C', 'C'])
+    prices = black_scholes.price(S, K, T, R, 0.6, sides)
+    iv, status = implied_vol.implied_volatility(prices, S, K, T, R, sides)
+    np.testing.assert_allclose(iv, 0.6, rtol=1e-6)
+    assert np.isin(status, (implied_vol.CONVERGED, implied_vol.BRACKETED)).all()
+
+
+def test_negligible_time_value_is_undetermined():
+    # Far OTM call and the ITM put of the same strike, both worth (about) nothing beyond intrinsic
+    K = np.array([200000.0, 200000.0, 60000.0])
+    sides = np.array(['C', 'P', 'C'])
+    prices = np.array([1e-9, 200000.0 - S + 1e-9, black_scholes.price(S, 60000.0, T, R, 0.6, 'C')])
+    iv, status = implied_vol.implied_volatility(prices, S, K, T, R, sides)
+    assert status.tolist() == [implied_vol.UNDETERMINED, implied_vol.UNDETERMINED, implied_vol.CONVERGED]
+    assert np.isnan(iv[:2]).all()
+    np.testing.assert_allclose(iv[2], 0.6, rtol=1e-6)
+    assert implied_vol.STATUS_NAMES[implied_vol.UNDETERMINED] == 'undetermined'
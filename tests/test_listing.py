@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from replay import ReplaySource, synthetic_fixtures
+
+
+@pytest.fixture
+def listings():
+    """
+    One expiry listed at first, a second one listed later
+    """
+    later = synthetic_fixtures(5, expiry_days=(7, 30))
+    first = dict(later, exchangeInfo=dict(later['exchangeInfo']))
+    expiry = later['exchangeInfo']['optionSymbols'][-1]['symbol'].split('-')[1]
+    first['exchangeInfo']['optionSymbols'] = [symbol for symbol in later['exchangeInfo']['optionSymbols']
+                                              if symbol['symbol'].split('-')[1] != expiry]
+    return first, later
+
+
+@pytest.fixture
+def client(app, listings, monkeypatch):
+    first, _ = listings
+    client = app.Binance(source=ReplaySource.from_documents(first), fit_workers=0, ingestion='rest')
+    client.scheduler.shutdown(wait=False)
+    client.publishes = 0
+    publish_updates = client.publish_updates
+
+    def counting_publish():
+        client.publishes += 1
+        publish_updates()
+
+    monkeypatch.setattr(client, 'publish_updates', counting_publish)
+    return client
+
+
+def test_new_listing_is_published_after_its_marks(client, listings):
+    first, later = listings
+    client.http = ReplaySource.from_documents(later)
+    added, retired = client.refresh_exchange_info()
+    assert added > 0 and retired == 0
+    assert client.publishes == 0
+    assert np.isnan(client.chain.total_implied_variance).any()
+
+    client.refresh_spot_options()
+    assert client.publishes == 1
+    assert np.isfinite(client.chain.total_implied_variance).all()
+
+
+def test_retired_listing_is_published_at_once(client, listings):
+    first, later = listings
+    client.http = ReplaySource.from_documents(later)
+    client.refresh_exchange_info()
+    client.refresh_spot_options()
+    publishes = client.publishes
+
+    client.http = ReplaySource.from_documents(first)
+    added, retired = client.refresh_exchange_info()
+    assert added == 0 and retired > 0
+    assert client.publishes == publishes + 1
@@ -0,0 +1,146 @@
+import json
+import os
+import time
+from functools import partial
+
+import numpy as np
+import pytest
+
+from market_stream import MarketStream, RecordedWebSocketApp
+from replay import ReplaySource, synthetic_fixtures
+
+# Recorded stream messages for the synthetic chain listed at FIXTURE_NOW
+RECORDING = os.path.join(os.path.dirname(__file__), 'fixtures', 'market_stream.jsonl')
+RECORDED_MESSAGES = 5
+FIXTURE_NOW = 4_000_000_000_000
+STREAM_MARKS = {'BTC-961101-60000-C': 2510.0, 'BTC-961101-60000-P': 2400.5, 'ETH-961101-3000-C': 140.25}
+STREAM_SPOT = {'BTCUSDT': 61000.0, 'ETHUSDT': 3050.0}
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    documents = synthetic_fixtures(3, expiry_days=(30,), now=FIXTURE_NOW)
+    client = app.Binance(source=ReplaySource.from_documents(documents), fit_workers=0, ingestion='rest')
+    client.scheduler.shutdown(wait=False)
+    client.publishes = 0
+    publish_updates = client.publish_updates
+
+    def counting_publish():
+        client.publishes += 1
+        publish_updates()
+
+    monkeypatch.setattr(client, 'publish_updates', counting_publish)
+    return client
+
+
+def marks(client, symbols):
+    chain = client.chain
+    return dict(zip(symbols, chain.mark_price[chain.rows_for_symbols(list(symbols))]))
+
+
+def replay(client):
+    """
+    Run a MarketStream over the recording until every message is buffered, without flushing
+    """
+    stream = MarketStream(client, flush_interval=3600, reconnect_delay=3600,
+                          websocket_factory=partial(RecordedWebSocketApp, RECORDING))
+    stream.start()
+    deadline = time.time() + 10
+    while stream.messages < RECORDED_MESSAGES and time.time() < deadline:
+        time.sleep(0.01)
+    stream.stop()
+    assert stream.messages == RECORDED_MESSAGES
+    return stream
+
+
+def test_flush_applies_recorded_marks_and_spot(client):
+    rest_marks = marks(client, STREAM_MARKS)
+    stream = replay(client)
+    version = client.chain.version
+    publishes = client.publishes
+
+    assert stream.flush()
+    assert client.chain.version == version + 1
+    assert client.publishes == publishes + 1
+    assert marks(client, STREAM_MARKS) == pytest.approx(STREAM_MARKS)
+    assert marks(client, STREAM_MARKS) != pytest.approx(rest_marks)
+    assert client.spot_prices == pytest.approx(STREAM_SPOT)
+    assert dict(client.chain.spot_prices) == pytest.approx(STREAM_SPOT)
+    # Nothing left to apply
+    assert not stream.flush()
+
+
+def test_connect_resyncs_and_publishes(client):
+    publishes = client.publishes
+    replay(client)
+    # One REST resync per stream on connect, each published
+    assert client.publishes == publishes + 2
+
+
+def test_spot_resync_keeps_stream_marks(client):
+    stream = replay(client)
+    stream.flush()
+    publishes = client.publishes
+
+    stream.resync_spot()
+    assert client.publishes == publishes + 1
+    assert client.spot_prices == pytest.approx({'BTCUSDT': 60000.0, 'ETHUSDT': 3000.0})
+    assert dict(client.chain.spot_prices) == pytest.approx({'BTCUSDT': 60000.0, 'ETHUSDT': 3000.0})
+    assert marks(client, STREAM_MARKS) == pytest.approx(STREAM_MARKS)
+
+
+def test_options_resync_reloads_marks_and_drops_buffered(client):
+    rest_marks = marks(client, STREAM_MARKS)
+    stream = replay(client)
+    stream.flush()
+    stream.handle_message('{"data": {"e": "24hrTicker", "s": "BTC-961101-60000-C", "mp": "9999", "vo": "0.9"}}')
+    publishes = client.publishes
+
+    stream.resync_options()
+    assert client.publishes == publishes + 1
+    assert marks(client, STREAM_MARKS) == pytest.approx(rest_marks)
+    assert np.isfinite(list(rest_marks.values())).all()
+    # The mark buffered before the reconnect is older than the snapshot
+    assert not stream.flush()
+
+
+def ticker(symbol, **fields):
+    return json.dumps({'stream': 'BTC@ticker@961101', 'data': [{'e': '24hrTicker', 's': symbol, **fields}]})
+
+
+def test_tick_without_iv_keeps_mark_iv(client):
+    stream = MarketStream(client)
+    symbol = 'BTC-961101-60000-C'
+    row = client.chain.rows_for_symbols([symbol])[0]
+    mark_iv = client.chain.mark_iv[row]
+    assert np.isfinite(mark_iv)
+
+    stream.handle_message(ticker(symbol, mp='2600.0'))
+    assert stream.flush()
+    assert client.chain.mark_price[row] == 2600.0
+    assert client.chain.mark_iv[row] == mark_iv
+
+    # An IV buffered from an earlier tick survives a later price-only tick
+    stream.handle_message(ticker(symbol, mp='2610.0', vo='0.7'))
+    stream.handle_message(ticker(symbol, mp='2620.0'))
+    assert stream.flush()
+    assert client.chain.mark_price[row] == 2620.0
+    assert client.chain.mark_iv[row] == 0.7
+
+
+def test_unchanged_ticks_keep_the_snapshot(client):
+    stream = MarketStream(client)
+    symbol = 'BTC-961101-60000-C'
+    row = client.chain.rows_for_symbols([symbol])[0]
+    chain = client.chain
+    publishes = client.publishes
+
+    stream.handle_message(ticker(symbol, mp=str(chain.mark_price[row]), vo=str(chain.mark_iv[row])))
+    assert not stream.flush()
+    assert client.chain is chain
+    assert client.publishes == publishes
+
+    stream.handle_message(ticker(symbol, mp=str(chain.mark_price[row] + 1)))
+    assert stream.flush()
+    assert client.chain.version == chain.version + 1
+    assert client.publishes == publishes + 1
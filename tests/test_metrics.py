@@ -0,0 +1,22 @@
+import metrics
+
+
+def test_counter_family_matches_samples():
+    registry = metrics.Registry()
+    counter = metrics.Counter('jobs', 'Jobs run', ('kind',), registry=registry)
+    counter.labels('refresh').inc(2)
+    assert registry.render().splitlines() == [
+        '# HELP jobs_total Jobs run',
+        '# TYPE jobs_total counter',
+        'jobs_total{kind="refresh"} 2.0',
+    ]
+
+
+def test_every_sample_belongs_to_its_family():
+    for line in metrics.REGISTRY.render().splitlines():
+        if line.startswith('# TYPE'):
+            _, _, family, kind = line.split()
+        elif line and not line.startswith('#'):
+            name = line.split('{')[0].split(' ')[0]
+            suffixes = ('_bucket', '_sum', '_count') if kind == 'histogram' else ('',)
+            assert any(name == family + suffix for suffix in suffixes), line
@@ -0,0 +1,37 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+import svi_fits
+from svi_parameterizations import raw_to_natural
+
+K = np.linspace(-0.6, 0.4, 25)
+W = svi_fits.raw_svi(K, 0.02, 0.1, -0.4, 0.05, 0.2)
+
+
+def test_multistart_fit_converges():
+    starts = svi_fits.natural_starts(K, W)
+    params, rmse, iterations, converged = svi_fits.multistart_natural_fit(K, W, starts)
+    assert converged
+    assert iterations < svi_fits.NATURAL_MAX_ITER
+    assert rmse < 1e-6
+    np.testing.assert_allclose(params, raw_to_natural([0.02, 0.1, -0.4, 0.05, 0.2]), atol=1e-3)
+
+
+def test_multistart_fit_cut_short_is_not_converged():
+    starts = svi_fits.natural_starts(K, W)[:1] + 0.05
+    params, _, iterations, converged = svi_fits.multistart_natural_fit(K, W, starts, max_iter=1)
+    assert params is not None
+    assert iterations == 1
+    assert not converged
+
+
+def test_report_outcome(monkeypatch):
+    params, report = svi_fits.fit_natural_report(K, W)
+    assert params is not None
+    assert report.outcome == 'converged'
+    monkeypatch.setattr(svi_fits, 'multistart_natural_fit', partial(svi_fits.multistart_natural_fit, max_iter=1))
+    params, report = svi_fits.fit_natural_report(K, W + 0.001 * np.sin(7 * K))
+    assert params is not None
+    assert report.outcome == 'unconverged'
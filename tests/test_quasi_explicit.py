@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import svi_fits
+from chain_store import ChainStore
+from replay import synthetic_fixtures
+from svi_no_arbitrage import QE_MAX_RHO, SVINoArbitrage
+
+NOW = 1_800_000_000_000
+
+
+@pytest.fixture
+def short_slice():
+    """
+    Noisy 2-day ETH call slice on which a vertex outside the quotes used to win
+    """
+    documents = synthetic_fixtures(20, expiry_days=(2,), seed=32, now=NOW)
+    spot = {item['symbol']: float(item['price']) for item in documents['spot']}
+    chain = ChainStore(documents['exchangeInfo']['optionSymbols'], NOW).with_marks(documents['mark'], spot, cur_time=NOW)
+    return chain.svi_slice('ETH', next(iter(chain.slices['ETH'])), 'C')
+
+
+def relative_rmse(k, w, params):
+    return np.sqrt(np.mean((svi_fits.raw_svi(k, *params) - w)**2)) / np.mean(w)
+
+
+def test_fit_matches_slsqp(short_slice):
+    k, w = short_slice
+    params = svi_fits.fit_quasi_explicit(k, w)
+    assert k.min() <= params[3] <= k.max()
+    assert abs(params[2]) <= QE_MAX_RHO
+    assert relative_rmse(k, w, params) <= 1.05 * relative_rmse(k, w, svi_fits.fit_raw(k, w))
+
+
+@pytest.mark.parametrize('m', [-0.5, -0.1, 0.0, 0.3])
+@pytest.mark.parametrize('sigma', [0.01, 0.1, 1.0])
+def test_inner_fit_scores_the_parameters_it_returns(short_slice, m, sigma):
+    k, w = short_slice
+    sse, params = SVINoArbitrage().quasi_explicit_inner_fit(k, w, m, sigma)
+    a, b, rho = params[:3]
+    assert a >= -1e-12 and b >= 0 and abs(rho) <= QE_MAX_RHO
+    assert b * sigma <= 4 * sigma * (1 + 1e-9)
+    assert sse == pytest.approx(np.sum((svi_fits.raw_svi(k, *params) - w)**2), rel=1e-9, abs=1e-18)
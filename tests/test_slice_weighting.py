@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import svi_fits
+from replay import ReplaySource, synthetic_fixtures
+
+HELPERS = {
+    'raw': 'raw_svi_parameterization',
+    'quasi_explicit': 'quasi_explicit_svi_parameterization',
+    'natural': 'natural_svi_parameterization',
+    'jw': 'svi_jw_parameterization',
+}
+
+
+@pytest.fixture
+def client(app):
+    documents = synthetic_fixtures(15, expiry_days=(7, 30))
+    client = app.Binance(source=ReplaySource.from_documents(documents), fit_workers=0, ingestion='rest',
+                         slice_weighting='vega')
+    client.scheduler.shutdown(wait=False)
+    return client
+
+
+def slice_key(client):
+    asset = 'BTC'
+    return asset, client.expiry_dates[asset][0][0], 'A'
+
+
+def test_side_a_has_one_out_of_the_money_option_per_strike(client):
+    asset, expiry, _ = slice_key(client)
+    chain = client.chain
+    rows = chain.otm_rows(asset, expiry)
+    strikes = chain.strike_price[rows]
+    assert len(np.unique(strikes)) == len(strikes)
+    _, forward, _ = chain.expiry_info(asset, expiry)
+    assert (chain.sides[rows] == np.where(strikes > forward, 'C', 'P')).all()
+
+
+def test_vega_weights_favour_the_money(client):
+    k, w, weights = client.fit_inputs(*slice_key(client))
+    assert weights is not None
+    assert weights.mean() == pytest.approx(1.0)
+    assert weights[np.argmin(np.abs(k))] > weights[0] and weights[np.argmin(np.abs(k))] > weights[-1]
+
+
+@pytest.mark.parametrize('parameterization_type', sorted(HELPERS))
+def test_helpers_fit_with_configured_weights(client, parameterization_type):
+    asset, expiry, side = slice_key(client)
+    k, w, weights = client.fit_inputs(asset, expiry, side)
+    time_to_expiry, _, _ = client.chain.expiry_info(asset, expiry)
+    weighted = svi_fits.fit_slice(parameterization_type, k, w, None, time_to_expiry, weights)
+    unweighted = svi_fits.fit_slice(parameterization_type, k, w, None, time_to_expiry)
+    params = getattr(client, HELPERS[parameterization_type])(asset, expiry, side)
+    np.testing.assert_allclose(params, weighted, rtol=1e-6, atol=1e-10)
+    assert not np.allclose(params, unweighted, rtol=1e-6, atol=1e-10)
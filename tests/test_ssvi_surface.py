@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from replay import ReplaySource, synthetic_fixtures
+
+
+@pytest.fixture
+def client(app):
+    """
+    A chain whose middle expiry lists calls only, so its put slice is empty
+    """
+    documents = synthetic_fixtures(10, expiry_days=(7, 30, 90))
+    option_symbols = documents['exchangeInfo']['optionSymbols']
+    expiry = sorted({symbol['symbol'].split('-')[1] for symbol in option_symbols})[1]
+    dropped = {symbol['symbol'] for symbol in option_symbols
+               if symbol['symbol'].split('-')[1] == expiry and symbol['symbol'].endswith('-P')}
+    documents['exchangeInfo']['optionSymbols'] = [symbol for symbol in option_symbols
+                                                  if symbol['symbol'] not in dropped]
+    documents['mark'] = [mark for mark in documents['mark'] if mark['symbol'] not in dropped]
+    client = app.Binance(source=ReplaySource.from_documents(documents), fit_workers=0, ingestion='rest')
+    client.scheduler.shutdown(wait=False)
+    return client
+
+
+@pytest.mark.parametrize('extended', [False, True])
+def test_surface_grid_skips_empty_slices(client, extended):
+    surface = client.get_ssvi_surface('BTC', 'P', extended, n_k=20, n_t=10)
+    assert surface is not None
+    assert len(surface['logMoneyness']) == 20
+    assert np.isfinite(surface['logMoneyness']).all()
+    assert np.isfinite(surface['impliedVolatility']).all()
+
+
+def test_surface_follows_the_snapshot_listing(client):
+    # A listing swap between reading the expiries and the snapshot
+    client.expiry_dates = {'BTC': client.chain.expiry_dates['BTC'][:1]}
+    surface = client.get_ssvi_surface('BTC', 'C', n_k=20, n_t=10)
+    assert len(surface['thetas']) == len(client.chain.expiry_dates['BTC'])
+
+
+@pytest.mark.parametrize('query', ['n_k=0', 'n_t=-1', 'n_k=100000', 'n_t=501'])
+def test_endpoint_rejects_out_of_range_grids(app, query):
+    response = app.app.test_client().get(f'/api/ssvi_surface?asset=BTC&{query}')
+    assert response.status_code == 400
+
+
+def test_endpoint_answers_in_range_grid(app):
+    response = app.app.test_client().get('/api/ssvi_surface?asset=BTC&n_k=500&n_t=2')
+    assert response.status_code == 200
+    assert len(response.get_json()['logMoneyness']) == 500
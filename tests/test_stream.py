@@ -0,0 +1,81 @@
+import json
+import sys
+import threading
+
+import numpy as np
+
+from chain_store import ChainStore
+from replay import synthetic_fixtures
+from stream import UpdateBroadcaster
+
+NOW = 1_800_000_000_000
+
+
+def chains(n):
+    """
+    Successive snapshots, each moving the marks of a few options
+    """
+    documents = synthetic_fixtures(10, expiry_days=(30,), now=NOW)
+    spot = {item['symbol']: float(item['price']) for item in documents['spot']}
+    chain = ChainStore(documents['exchangeInfo']['optionSymbols'], NOW).with_marks(documents['mark'], spot, cur_time=NOW)
+    rng = np.random.default_rng(0)
+    snapshots = []
+    for _ in range(n):
+        rows = rng.choice(chain.size, 3, replace=False)
+        chain = chain.with_mark_updates(chain.symbols[rows], chain.mark_price[rows] * rng.uniform(0.9, 1.1, 3),
+                                        chain.mark_iv[rows], spot, cur_time=NOW)
+        snapshots.append(chain)
+    return snapshots
+
+
+def replay_messages(subscription):
+    """
+    Rebuild a subscriber's view of the slice's mark prices from its snapshot and deltas
+    """
+    marks = None
+    while not subscription.queue.empty():
+        message = subscription.get()
+        event, data = (line.split(': ', 1)[1] for line in message.strip().split('\n'))
+        data = json.loads(data)
+        if event == 'snapshot':
+            marks = dict(zip(data['symbol'], data['markPrice']))
+        else:
+            for update in data['updates']:
+                if 'markPrice' in update:
+                    marks[update['symbol']] = update['markPrice']
+    return marks
+
+
+def test_concurrent_publishes_keep_subscribers_consistent():
+    snapshots = chains(400)
+    # Switch threads as often as possible so unsynchronized publishes would interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(5):
+            run_concurrent_publishes(snapshots)
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def run_concurrent_publishes(snapshots):
+    asset = next(iter(snapshots[0].slices))
+    key = (asset, next(iter(snapshots[0].slices[asset])), 'A')
+    broadcaster = UpdateBroadcaster(queue_size=len(snapshots) + 1)
+    subscription = broadcaster.subscribe(*key)
+    barrier = threading.Barrier(4)
+
+    def publish(part):
+        barrier.wait()
+        for chain in part:
+            broadcaster.publish_chain(chain)
+
+    threads = [threading.Thread(target=publish, args=(snapshots[i::4],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    last = broadcaster._last_sent[key]
+    expected = dict(zip(last['symbol'].tolist(), last['markPrice'].tolist()))
+    assert replay_messages(subscription) == expected
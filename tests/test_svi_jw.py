@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import svi_fits
+import svi_parameterizations as parameterizations
+
+T = 30 / 365.25
+RAW = np.array([
+    [0.004, 0.03, -0.4, 0.02, 0.1],
+    [0.010, 0.05, 0.2, -0.05, 0.3],
+    [0.001, 0.02, -0.9, 0.1, 0.05],
+])
+K = np.linspace(-0.5, 0.4, 25)
+
+
+@pytest.mark.parametrize('target', ['natural', 'jw'])
+def test_conversions_round_trip(target):
+    converted = parameterizations.convert(RAW, 'raw', target, T)
+    assert converted.shape == RAW.shape
+    np.testing.assert_allclose(parameterizations.convert(converted, target, 'raw', T), RAW, atol=1e-12)
+
+
+def test_conversions_keep_the_smile():
+    natural = parameterizations.convert(RAW, 'raw', 'natural')
+    jw = parameterizations.convert(natural, 'natural', 'jw', np.full(len(RAW), T))
+    w = svi_fits.total_variance_grid('raw', RAW, K)
+    np.testing.assert_allclose(svi_fits.total_variance_grid('natural', natural, K), w, rtol=1e-12)
+    np.testing.assert_allclose(svi_fits.total_variance_grid('jw', jw, K, np.full(len(RAW), T)), w, rtol=1e-10)
+
+
+def test_jw_parameters_are_atm_quantities():
+    v, psi, p, c, v_tilde = parameterizations.raw_to_jw(RAW[0], T)
+    w = svi_fits.raw_svi(np.array([-1e-6, 0.0, 1e-6]), *RAW[0])
+    assert v == pytest.approx(w[1] / T)
+    assert psi == pytest.approx((w[2] - w[0]) / 2e-6 / (2 * np.sqrt(w[1])), rel=1e-5)
+    assert v_tilde <= v
+
+
+def test_symmetric_atm_smile_has_no_raw_parameters():
+    jw = parameterizations.raw_to_jw([0.004, 0.03, 0.0, 0.0, 0.1], T)
+    assert np.isnan(parameterizations.jw_to_raw(jw, T)).any()
+
+
+def test_cold_and_warm_fits():
+    w = svi_fits.raw_svi(K, *RAW[0])
+    params, report = svi_fits.fit_jw_report(K, w, T)
+    assert report.outcome == 'converged'
+    np.testing.assert_allclose(svi_fits.total_variance_grid('jw', [params], K, T)[0], w, rtol=1e-3)
+
+    # Warm start from the previous fit after the market moved a little
+    moved = w * 1.01
+    warm, report = svi_fits.fit_jw_report(K, moved, T, params)
+    assert report.outcome == 'converged'
+    fitted = svi_fits.total_variance_grid('jw', [warm], K, T)[0]
+    assert np.sqrt(np.mean((fitted - moved)**2)) < 0.01 * np.mean(moved)
+    # The penalty keeps the parameters close to the previous fit
+    assert np.all(np.abs(warm - params) <= 0.05 * np.maximum(np.abs(params), svi_fits.JW_MIN_SCALE))